@@ -1,16 +1,34 @@
 import os
+import re
+import sys
 from pathlib import Path
 import shutil
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, NamedTuple
 import json
-from openai import OpenAI
+import hashlib
+import random
 import time
 from datetime import datetime
 import logging
-from collections import defaultdict
-import humanize
-from jinja2 import Template
-import matplotlib.pyplot as plt
+import threading
+import argparse
+import sqlite3
+import zlib
+from array import array
+from collections import Counter, defaultdict, deque
+from bisect import bisect_right
+from itertools import accumulate
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; FileTable falls back to plain arrays
+    np = None
+
+from organizer_core import (
+    CategoryIndex, NameRegistry, OperationJournal, ScanIndex, ScanStatistics, SkipMatcher,
+    list_directory, metrics, place_no_clobber, transfer_file
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -94,16 +112,101 @@ Example Output Structure:
     ]
 }"""
 
+class LLMResponseCache:
+    """Persistent SQLite cache of LLM responses.
+
+    Keys are a SHA-256 over the model, prompt and sampling parameters, so an
+    unchanged tree produces the same prompt and is answered without a request.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, prompt: str, **params) -> str:
+        payload = json.dumps({"model": model, "prompt": prompt, **params}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created) VALUES (?, ?, ?)",
+            (key, response, time.time())
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
 class LLMClient:
-    def __init__(self, api_key: str = None):
+    """Asynchronous OpenAI-compatible client for organization proposals.
+
+    One ``AsyncOpenAI`` client (and its connection pool) lives on a private
+    event loop for the lifetime of the object. Requests are limited to
+    ``max_concurrency`` at a time and retried with exponential backoff on
+    connection errors, timeouts, rate limits, server errors and unparseable
+    JSON. Valid responses are stored in the optional response cache.
+    ``base_url`` points the client at any server speaking the OpenAI API.
+    """
+
+    DEFAULT_BASE_URL = "https://integrate.api.nvidia.com/v1"
+    DEFAULT_MODEL = "meta/llama-3.1-8b-instruct"
+
+    def __init__(self, api_key: str = None, base_url: Optional[str] = None,
+                 model: str = DEFAULT_MODEL, cache: Optional[LLMResponseCache] = None,
+                 max_concurrency: int = 4, max_retries: int = 4, backoff: float = 1.0,
+                 temperature: float = 0.5):
         """Initialize the LLM client with API key."""
-        self.client = OpenAI(
-            base_url="https://integrate.api.nvidia.com/v1",
-            api_key=api_key or os.getenv("NVIDIA_API_KEY")
+        import openai  # Heavy; only loaded once an LLM stage actually runs
+        self.retryable_errors = (
+            openai.APIConnectionError, openai.APITimeoutError,
+            openai.RateLimitError, openai.InternalServerError, json.JSONDecodeError
+        )
+        self.model = model
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.temperature = temperature
+        self.requests_sent = 0
+        import asyncio
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = openai.AsyncOpenAI(
+            base_url=base_url or os.getenv("LLM_BASE_URL") or self.DEFAULT_BASE_URL,
+            api_key=api_key or os.getenv("NVIDIA_API_KEY"),
+            max_retries=0  # Retries are handled here, including bad JSON
         )
+
+    def run(self, coroutine):
+        """Run a coroutine on the client's event loop."""
+        return self._loop.run_until_complete(coroutine)
+
+    def close(self) -> None:
+        self.run(self.client.close())
+        self.run(self._loop.shutdown_asyncgens())
+        self._loop.close()
+        if self.cache is not None:
+            self.cache.close()
     
-    def _structure_to_text(self, structure: Dict) -> str:
-        """Convert file structure to concise text description."""
+    def _structure_to_text(self, structure: Dict, stats: Optional['ScanStatistics'] = None) -> str:
+        """Convert file structure to concise text description.
+
+        Uses the scanner's statistics when given instead of walking the tree.
+        """
         def get_file_types(struct):
             extensions = defaultdict(int)
             total_files = 0
@@ -119,57 +222,355 @@ class LLMClient:
                     total_files += sub_total
             return extensions, total_files
 
-        extensions, total_files = get_file_types(structure)
+        if stats is not None:
+            extensions, total_files = stats.extensions, stats.total_files
+        else:
+            extensions, total_files = get_file_types(structure)
         
         # Create concise summary
         summary = f"Directory contains {total_files} files larger than 3MB:\n"
-        for ext, count in sorted(extensions.items(), key=lambda x: x[1], reverse=True):
+        for ext, count in sorted(extensions.items(), key=lambda x: (-x[1], x[0])):
             summary += f"- {count} {ext} files\n"
         
         return summary
 
-    def get_organization_proposal(self, current_structure: Dict) -> Dict:
+    @staticmethod
+    def _parse_json(text: str) -> Dict:
+        """Parse a JSON reply, tolerating a surrounding Markdown code fence."""
+        text = text.strip()
+        if text.startswith("```"):
+            text = text.split("\n", 1)[1] if "\n" in text else ""
+            text = text.rsplit("```", 1)[0]
+        return json.loads(text)
+
+    async def _request(self, prompt: str) -> str:
+        """Send one streaming chat completion and return the joined text.
+
+        Latency and token counts go to ``metrics``; servers that do not
+        report usage get estimates counted under ``*_tokens_estimated``.
+        """
+        self.requests_sent += 1
+        metrics.count("llm_requests")
+        start = time.perf_counter()
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            temperature=self.temperature,
+            top_p=1,
+            max_tokens=2048,
+            stream=True
+        )
+        parts = []
+        usage = None
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content is not None:
+                parts.append(chunk.choices[0].delta.content)
+            usage = getattr(chunk, "usage", None) or usage
+        text = "".join(parts)
+        metrics.observe("llm_request_seconds", time.perf_counter() - start)
+        if usage is not None:
+            metrics.count("llm_prompt_tokens", usage.prompt_tokens or 0)
+            metrics.count("llm_completion_tokens", usage.completion_tokens or 0)
+        else:
+            metrics.count("llm_prompt_tokens_estimated", len(prompt) // ShardedProposer.CHARS_PER_TOKEN)
+            metrics.count("llm_completion_tokens_estimated", len(text) // ShardedProposer.CHARS_PER_TOKEN)
+        return text
+
+    async def complete_json(self, prompt: str) -> Optional[Dict]:
+        """Return the model's JSON reply to ``prompt``, from the cache if possible.
+
+        Returns None once the retries are used up; errors that retrying cannot
+        fix (authentication, bad requests) are raised.
+        """
+        import asyncio
+        key = LLMResponseCache.key(self.model, prompt, temperature=self.temperature,
+                                   top_p=1, max_tokens=2048)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                metrics.count("llm_cache_hits")
+                return json.loads(cached)
+
+        for attempt in range(self.max_retries + 1):
+            response_text = ""
+            try:
+                async with self._semaphore:
+                    response_text = await self._request(prompt)
+                result = self._parse_json(response_text)
+                break
+            except self.retryable_errors as e:
+                if attempt == self.max_retries:
+                    logger.error(f"LLM request failed after {attempt + 1} attempts: {e}")
+                    logger.debug(f"Raw response: {response_text}")
+                    return None
+                delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+                metrics.count("llm_retries")
+                logger.warning(f"LLM request failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        if self.cache is not None:
+            self.cache.put(key, json.dumps(result))
+        return result
+
+    async def complete_many(self, prompts: List[str]) -> List[Optional[Dict]]:
+        """Answer several prompts concurrently, at most ``max_concurrency`` at a time."""
+        import asyncio
+        results = await asyncio.gather(*(self.complete_json(prompt) for prompt in prompts),
+                                       return_exceptions=True)
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"Error getting LLM response: {result}")
+                results[i] = None
+        return results
+
+    def get_organization_proposal(self, current_structure: Dict,
+                                  stats: Optional['ScanStatistics'] = None) -> Dict:
         """Get organization proposal from LLM."""
         # Convert structure to text summary
-        structure_summary = self._structure_to_text(current_structure)
+        structure_summary = self._structure_to_text(current_structure, stats)
         
         prompt = f"""Please organize these files into a logical structure:
 {structure_summary}
 Respond with a JSON structure showing the proposed organization. Group similar file types and create meaningful categories."""
 
         try:
-            completion = self.client.chat.completions.create(
-                model="meta/llama-3.1-8b-instruct",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5,
-                top_p=1,
-                max_tokens=2048,
-                stream=True
-            )
-            
-            response_text = ""
-            for chunk in completion:
-                if chunk.choices[0].delta.content is not None:
-                    response_text += chunk.choices[0].delta.content
-            
-            try:
-                return json.loads(response_text)
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse LLM response as JSON: {e}")
-                logger.debug(f"Raw response: {response_text}")
-                return None
-                
+            return self.run(self.complete_json(prompt))
         except Exception as e:
             logger.error(f"Error getting LLM proposal: {e}")
             return None
 
+class FileTable:
+    """Columnar store for scanned file metadata.
+
+    Directory paths and extensions are interned once and referenced by id;
+    per-file sizes and mtimes live in typed ``array`` columns. A file costs a
+    few dozen bytes plus its name instead of a dict with a full path string.
+    The nested dict structure used by the LLM and the reports is materialized
+    from the table on demand with ``to_structure``.
+    """
+
+    def __init__(self):
+        self.dirs: List[str] = []
+        self.dir_parent = array('i')
+        self._dir_ids: Dict[str, int] = {}
+        self.extensions: List[str] = []
+        self._ext_ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.dir_id = array('I')
+        # Rotated and dated names (log.1 ... log.70000) are distinct extensions,
+        # so the code column must hold more than 65,535 of them
+        self.ext_id = array('I')
+        self.size = array('q')
+        self.mtime = array('q')
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add_directory(self, path: str, parent_id: int = -1) -> int:
+        """Intern a directory path and return its id."""
+        dir_id = self._dir_ids.get(path)
+        if dir_id is None:
+            dir_id = len(self.dirs)
+            self._dir_ids[path] = dir_id
+            self.dirs.append(path)
+            self.dir_parent.append(parent_id)
+        return dir_id
+
+    def extension_code(self, extension: str) -> int:
+        code = self._ext_ids.get(extension)
+        if code is None:
+            code = len(self.extensions)
+            self._ext_ids[extension] = code
+            self.extensions.append(extension)
+        return code
+
+    def add_file(self, dir_id: int, name: str, size: int, mtime_ns: int = 0) -> int:
+        """Append a file row and return its index."""
+        self.names.append(name)
+        self.dir_id.append(dir_id)
+        self.ext_id.append(self.extension_code(os.path.splitext(name)[1].lower()))
+        self.size.append(size)
+        self.mtime.append(mtime_ns)
+        return len(self.names) - 1
+
+    def path(self, row: int) -> str:
+        return os.path.join(self.dirs[self.dir_id[row]], self.names[row])
+
+    def extension(self, row: int) -> str:
+        return self.extensions[self.ext_id[row]]
+
+    def column(self, name: str):
+        """Return a column as a NumPy array when NumPy is installed, else the raw array."""
+        values = getattr(self, name)
+        if np is None:
+            return values
+        return np.frombuffer(values, dtype=values.typecode) if len(values) else np.zeros(0, dtype=values.typecode)
+
+    def file_dict(self, row: int) -> Dict:
+        """Materialize one row in the scanner's file dict format."""
+        return {
+            "type": "file",
+            "name": self.names[row],
+            "path": self.path(row),
+            "size": self.size[row],
+            "extension": self.extension(row)
+        }
+
+    def to_structure(self, root_name: Optional[str] = None) -> Optional[Dict]:
+        """Materialize the nested directory structure, dropping empty directories.
+
+        Directories must have been added parents-first, so every child id is
+        larger than its parent's and one reverse pass builds the tree.
+        """
+        if not self.dirs:
+            return None
+        files_by_dir = defaultdict(list)
+        for row, dir_id in enumerate(self.dir_id):
+            files_by_dir[dir_id].append(row)
+
+        children = defaultdict(list)
+        built = {}
+        for dir_id in range(len(self.dirs) - 1, -1, -1):
+            contents = [child for child in reversed(children.pop(dir_id, [])) if child]
+            contents.extend(self.file_dict(row) for row in files_by_dir.pop(dir_id, []))
+            path = self.dirs[dir_id]
+            node = {
+                "type": "directory",
+                "name": (root_name if dir_id == 0 and root_name is not None
+                         else os.path.basename(path)),
+                "path": path,
+                "contents": contents
+            } if contents else None
+            parent_id = self.dir_parent[dir_id]
+            if parent_id >= 0:
+                children[parent_id].append(node)
+            else:
+                built[dir_id] = node
+        return built.get(0)
+
+    @classmethod
+    def from_structure(cls, structure: Dict) -> 'FileTable':
+        """Build a table from an existing nested structure."""
+        table = cls()
+        stack = [(structure, -1)]
+        while stack:
+            node, parent_id = stack.pop()
+            dir_id = table.add_directory(node.get("path", node["name"]), parent_id)
+            subdirs = []
+            for item in node.get("contents", []):
+                if item["type"] == "file":
+                    table.add_file(dir_id, item["name"], item.get("size", 0))
+                else:
+                    subdirs.append(item)
+            stack.extend((subdir, dir_id) for subdir in reversed(subdirs))
+        return table
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the table, including interned strings."""
+        total = sum(sys.getsizeof(column) for column in
+                    (self.dir_parent, self.dir_id, self.ext_id, self.size, self.mtime))
+        total += sys.getsizeof(self.names) + sum(sys.getsizeof(name) for name in self.names)
+        total += sys.getsizeof(self.dirs) + sum(sys.getsizeof(path) for path in self.dirs)
+        total += sys.getsizeof(self._dir_ids) + sys.getsizeof(self._ext_ids)
+        total += sum(sys.getsizeof(ext) for ext in self.extensions)
+        return total
+
+class ParallelDirectoryWalker:
+    """Walks a directory tree on a bounded thread pool with work-stealing deques.
+
+    Each worker pops directories from the tail of its own deque (depth-first,
+    good locality) and steals from the head of the other workers' deques when
+    it runs dry. ``visit(path)`` is called once per directory and must return
+    ``(result, subdirectories)``; results are collected per path along with
+    the directory depth.
+    """
+
+    def __init__(self, visit, num_workers: Optional[int] = None):
+        self.visit = visit
+        self.num_workers = max(1, num_workers or min(32, (os.cpu_count() or 1) + 4))
+        self._queues = [deque() for _ in range(self.num_workers)]
+        self._cond = threading.Condition()
+        self._pending = 0
+        self.results = {}
+
+    def _next_task(self, index: int):
+        try:
+            return self._queues[index].pop()
+        except IndexError:
+            pass
+        for offset in range(1, self.num_workers):
+            victim = self._queues[(index + offset) % self.num_workers]
+            try:
+                return victim.popleft()
+            except IndexError:
+                continue
+        return None
+
+    def _worker(self, index: int):
+        own_queue = self._queues[index]
+        while True:
+            task = self._next_task(index)
+            if task is None:
+                with self._cond:
+                    if self._pending == 0:
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait(0.05)
+                continue
+
+            path, depth = task
+            try:
+                result, subdirs = self.visit(path)
+            except Exception as e:
+                logger.error(f"Error scanning {path}: {e}")
+                result, subdirs = None, []
+            self.results[path] = (depth, result)
+
+            with self._cond:
+                # Count new work before publishing it so a thief can never
+                # drive the pending counter to zero while we still hold a task.
+                self._pending += len(subdirs)
+            for subdir in subdirs:
+                own_queue.append((subdir, depth + 1))
+            with self._cond:
+                self._pending -= 1
+                if subdirs or self._pending == 0:
+                    self._cond.notify_all()
+
+    def run(self, root: str) -> Dict:
+        """Walk the tree below ``root`` and return ``{path: (depth, result)}``."""
+        self.results = {}
+        self._pending = 1
+        self._queues[0].append((root, 0))
+        threads = [
+            threading.Thread(target=self._worker, args=(i,), daemon=True)
+            for i in range(self.num_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.results
+
 class FileSystemScanner:
-    def __init__(self, root_directory: str):
-        """Initialize scanner with root directory."""
+    def __init__(self, root_directory: str, scan_workers: Optional[int] = None,
+                 scan_index: Optional[ScanIndex] = None,
+                 skip_globs: Optional[List[str]] = None,
+                 skip_matcher: Optional[SkipMatcher] = None):
+        """Initialize scanner with root directory.
+
+        A ``skip_matcher`` from an earlier scanner can be passed in to reuse
+        its compiled patterns; ``skip_globs`` is then ignored.
+        """
         self.root_directory = Path(root_directory)
+        self.scan_workers = scan_workers
+        self.scan_index = scan_index
         self.file_structure = {}
+        self.file_table = FileTable()
+        self.scan_stats = {}
+        self.stats: Optional[ScanStatistics] = None
         self.ignored_patterns = {
             '.git', '__pycache__', 'node_modules', '.env', 'temp', 'tmp',
             '.vscode', '.idea', 'build', 'dist', 'bin', 'obj'
@@ -178,54 +579,109 @@ class FileSystemScanner:
             '.dll', '.sys', '.exe', '.ini', '.cfg', '.log', '.tmp', '.temp',
             '.cache', '.manifest', '.pdb', '.msi', '.dat', '.bin'
         }
+        self.skip_matcher = skip_matcher or SkipMatcher(
+            names=self.ignored_patterns, globs=skip_globs or (),
+            extensions=self.ignored_extensions
+        )
+        self._root_prefix = len(str(self.root_directory)) + 1
         self.MIN_FILE_SIZE = 3 * 1024 * 1024  # 3MB in bytes
     
     def should_ignore(self, path: Path) -> bool:
         """Check if path should be ignored."""
-        return (any(pattern in str(path) for pattern in self.ignored_patterns) or
-                path.suffix.lower() in self.ignored_extensions)
+        return self.skip_matcher.skip(path.name, path.is_dir())
+
+    def _should_ignore_entry(self, path: str, name: str, is_dir: bool) -> bool:
+        """Check a scandir entry by its name; ignored directories are pruned."""
+        rel_path = ''
+        if self.skip_matcher.anchored:
+            rel_path = path[self._root_prefix:].replace(os.sep, '/')
+        return self.skip_matcher.skip(name, is_dir, rel_path)
+
+    def _scan_single_directory(self, path: str):
+        """Scan one directory for the parallel walker.
+
+        Returns ``((files, files_seen), subdirectories)`` where ``files`` holds
+        ``(name, size, mtime_ns)`` tuples for the files that pass the filters.
+        """
+        files = []
+        subdirs = []
+        files_seen = 0
+        try:
+            listing = list_directory(path, self.scan_index)
+        except PermissionError:
+            logger.warning(f"Permission denied: {path}")
+            listing = []
+        except Exception as e:
+            logger.error(f"Error scanning {path}: {e}")
+            listing = []
+
+        for name, is_dir, _, size, mtime_ns in listing:
+            item_path = os.path.join(path, name)
+            if is_dir:
+                if not self._should_ignore_entry(item_path, name, True):
+                    subdirs.append(item_path)
+                continue
+
+            files_seen += 1
+            # Skip files smaller than MIN_FILE_SIZE and system files
+            if size >= self.MIN_FILE_SIZE and not self._should_ignore_entry(item_path, name, False):
+                files.append((name, size, mtime_ns))
+        return (files, files_seen), subdirs
+
+    def _build_table(self, results: Dict) -> FileTable:
+        """Load per-directory scan results into a FileTable, parents first.
+
+        Every file is also fed to ``self.stats`` as it is added.
+        """
+        table = FileTable()
+        stats = self.stats = ScanStatistics(CategoryIndex(AIFileOrganizer.BASIC_CATEGORIES),
+                                            keep_rows=True)
+        for path, (depth, result) in sorted(results.items(), key=lambda kv: kv[1][0]):
+            parent_id = -1 if depth == 0 else table.add_directory(os.path.dirname(path))
+            dir_id = table.add_directory(path, parent_id)
+            for name, size, mtime_ns in (result[0] if result else []):
+                row = table.add_file(dir_id, name, size, mtime_ns)
+                stats.add(table.extensions[table.ext_id[row]], size, row=row)
+        return table
+
+    @metrics.stage("scan")
+    def scan_table(self) -> FileTable:
+        """Scans the directory into a compact FileTable without building dicts."""
+        logger.info(f"Starting directory scan at: {self.root_directory}")
+        start_time = time.perf_counter()
         
+        results = {}
+        misses_before = self.scan_index.misses if self.scan_index else 0
+        if not self.should_ignore(self.root_directory):
+            walker = ParallelDirectoryWalker(self._scan_single_directory, self.scan_workers)
+            results = walker.run(str(self.root_directory))
+        self.file_table = self._build_table(results)
+        if not self.file_table.dirs:
+            self.file_table.add_directory(str(self.root_directory))
+
+        if self.scan_index is not None:
+            self.scan_index.commit()
+
+        elapsed = time.perf_counter() - start_time
+        files_seen = sum(result[1] for _, result in results.values() if result)
+        self.scan_stats = {
+            "directories": len(results),
+            "directories_rescanned": (self.scan_index.misses - misses_before
+                                      if self.scan_index else len(results)),
+            "files": files_seen,
+            "seconds": elapsed,
+            "files_per_second": files_seen / elapsed if elapsed > 0 else 0.0
+        }
+        logger.info(
+            f"Directory scan completed: {files_seen} files in {len(results)} directories "
+            f"in {elapsed:.2f}s ({self.scan_stats['files_per_second']:.0f} files/sec)"
+        )
+        return self.file_table
+
     def scan_directory(self) -> Dict:
         """Scans the directory and creates a hierarchical structure."""
-        logger.info(f"Starting directory scan at: {self.root_directory}")
-        
-        def scan_recursive(current_path: Path) -> Dict:
-            if self.should_ignore(current_path):
-                return None
-                
-            structure = {
-                "type": "directory",
-                "name": current_path.name,
-                "path": str(current_path),  # Add full path
-                "contents": []
-            }
-            
-            try:
-                for item in current_path.iterdir():
-                    if item.is_file():
-                        # Skip files smaller than MIN_FILE_SIZE and system files
-                        if (item.stat().st_size >= self.MIN_FILE_SIZE and 
-                            not self.should_ignore(item)):
-                            file_info = {
-                                "type": "file",
-                                "name": item.name,
-                                "path": str(item),  # Add full path
-                                "size": item.stat().st_size,
-                                "extension": item.suffix.lower()
-                            }
-                            structure["contents"].append(file_info)
-                    elif item.is_dir() and not self.should_ignore(item):
-                        subdir_structure = scan_recursive(item)
-                        if subdir_structure and subdir_structure["contents"]:  # Only add non-empty directories
-                            structure["contents"].append(subdir_structure)
-            except PermissionError:
-                logger.warning(f"Permission denied: {current_path}")
-            except Exception as e:
-                logger.error(f"Error scanning {current_path}: {e}")
-                
-            return structure if structure["contents"] else None
-        
-        self.file_structure = scan_recursive(self.root_directory)
+        self.scan_table()
+        self.file_structure = self.file_table.to_structure(self.root_directory.name)
         if not self.file_structure:
             # Create empty root structure if no files found
             self.file_structure = {
@@ -234,66 +690,124 @@ class FileSystemScanner:
                 "path": str(self.root_directory),
                 "contents": []
             }
-        logger.info("Directory scan completed")
         return self.file_structure
 
 class AIFileOrganizer:
-    def __init__(self, file_structure: Dict, llm_client: LLMClient):
-        """Initialize organizer with file structure and LLM client."""
+    # Categories based on common file types, used by the basic fallback
+    BASIC_CATEGORIES = {
+        "documents": [".pdf", ".doc", ".docx", ".txt", ".xlsx", ".ppt", ".pptx"],
+        "media": [".jpg", ".jpeg", ".png", ".gif", ".mp4", ".avi", ".mov"],
+        "archives": [".zip", ".rar", ".7z", ".tar", ".gz"],
+        "code": [".py", ".js", ".java", ".cpp", ".html", ".css"]
+    }
+
+    SIZE_BUCKETS = ("small", "medium", "large")  # < 1MB, < 100MB, larger
+    # Dates (2023-01-31, 20230131, 2023_01) and versions (v2, v1.2.3, 1.2) in file names
+    NAME_PATTERN_RE = re.compile(
+        r"(?<!\d)(?P<year>(?:19|20)\d{2})[-_.]?(?P<month>0[1-9]|1[0-2])(?:[-_.]?(?:0[1-9]|[12]\d|3[01]))?(?!\d)"
+        r"|(?i:(?<![a-z0-9])v(?P<version>\d+(?:\.\d+)*))"
+        r"|(?<![\d.])(?P<dotted>\d+\.\d+(?:\.\d+)*)(?![\d])"
+    )
+
+    def __init__(self, file_structure: Dict, llm_client: LLMClient,
+                 file_table: Optional[FileTable] = None, shard_tokens: Optional[int] = None,
+                 cluster_mode: str = "off", stats: Optional[ScanStatistics] = None):
+        """Initialize organizer with file structure and LLM client.
+
+        With ``shard_tokens`` the proposal is built per subtree shard of at
+        most that many prompt tokens (see ShardedProposer). ``cluster_mode``
+        "local" groups files offline with LocalClusterer, "named" does the
+        same but lets the LLM name the groups. A ``stats`` passed in must keep
+        rows (``keep_rows=True``), as the scanner's do.
+        """
         self.file_structure = file_structure
+        self.file_table = file_table if file_table is not None else FileTable.from_structure(file_structure)
         self.llm_client = llm_client
+        self.shard_tokens = shard_tokens
+        self.cluster_mode = cluster_mode
+        self.stats = stats if stats is not None else ScanStatistics.from_table(
+            self.file_table, CategoryIndex(self.BASIC_CATEGORIES)
+        )
         self.proposed_structure = {}
         self.file_patterns = self._extract_patterns()
         
+    @metrics.stage("patterns")
     def _extract_patterns(self) -> Dict:
-        """Extracts patterns from file names and extensions."""
-        patterns = {
-            "extensions": {},
-            "prefixes": {},
-            "date_patterns": [],
-            "version_patterns": [],
-            "size_categories": {
-                "small": [],
-                "medium": [],
-                "large": []
-            }
-        }
+        """Extracts patterns from file names and extensions.
+
+        Extension counts and size buckets come from the scan statistics; the
+        names are mined in one batched pass. Only counts and row indexes are
+        kept: ``size_categories`` maps each bucket to the rows in it,
+        ``date_patterns`` counts files per year-month found in their names
+        and ``version_patterns`` counts files per versioned base name.
+        """
+        table = self.file_table
+        names = table.names
         
-        def analyze_recursive(structure: Dict):
-            for item in structure["contents"]:
-                if item["type"] == "file":
-                    # Analyze extensions
-                    ext = item["extension"]
-                    patterns["extensions"][ext] = patterns["extensions"].get(ext, 0) + 1
-                    
-                    # Analyze name patterns
-                    name_without_ext = Path(item["name"]).stem
-                    prefix = name_without_ext.split('_')[0]
-                    patterns["prefixes"][prefix] = patterns["prefixes"].get(prefix, 0) + 1
-                    
-                    # Analyze file sizes
-                    size = item["size"]
-                    if size < 1024 * 1024:  # < 1MB
-                        patterns["size_categories"]["small"].append(item["path"])
-                    elif size < 100 * 1024 * 1024:  # < 100MB
-                        patterns["size_categories"]["medium"].append(item["path"])
-                    else:
-                        patterns["size_categories"]["large"].append(item["path"])
-                    
-                elif item["type"] == "directory":
-                    analyze_recursive(item)
+        # Analyze extensions
+        extensions = dict(self.stats.extensions)
         
-        analyze_recursive(self.file_structure)
-        return patterns
+        # Analyze name patterns: prefixes from the stems, dates and versions
+        # from one regex scan over all names joined by newlines
+        prefixes = Counter(
+            name[:len(name) - len(table.extensions[code])].split('_', 1)[0]
+            for name, code in zip(names, table.ext_id)
+        )
+        buffer = "\n".join(names)
+        offsets = list(accumulate((len(name) + 1 for name in names), initial=0))
+        date_patterns = Counter()
+        version_patterns = Counter()
+        dated_row = versioned_row = -1
+        for match in self.NAME_PATTERN_RE.finditer(buffer):
+            row = bisect_right(offsets, match.start()) - 1
+            if match["year"] is not None:
+                if row != dated_row:
+                    date_patterns[f"{match['year']}-{match['month']}"] += 1
+                    dated_row = row
+            elif row != versioned_row:
+                base = buffer[offsets[row]:match.start()].rstrip(" _-.").lower()
+                version_patterns[base or names[row].lower()] += 1
+                versioned_row = row
+        
+        # Analyze file sizes; the statistics already hold the rows of each
+        # bucket (< 1MB, 1-10MB, 10-100MB and > 100MB)
+        small, medium_low, medium_high, large = self.stats.bucket_rows
+        rows_by_bucket = [small, medium_low + medium_high, large]
+        
+        return {
+            "extensions": extensions,
+            "prefixes": dict(prefixes),
+            "date_patterns": dict(sorted(date_patterns.items())),
+            "version_patterns": {base: count for base, count in version_patterns.most_common()
+                                 if count > 1},
+            "size_categories": dict(zip(self.SIZE_BUCKETS, rows_by_bucket))
+        }
         
+    @metrics.stage("propose")
     def analyze_structure(self) -> Dict:
         """Analyzes the file structure and generates a proposed organization."""
         logger.info("Starting structure analysis")
         
         # Get proposal from LLM
-        self.proposed_structure = self.llm_client.get_organization_proposal(self.file_structure)
+        if self.cluster_mode != "off":
+            clusterer = LocalClusterer(self.file_table, CategoryIndex(self.BASIC_CATEGORIES))
+            self.proposed_structure = clusterer.propose(
+                self.llm_client if self.cluster_mode == "named" else None
+            )
+        elif self.shard_tokens:
+            proposer = ShardedProposer(self.llm_client, self.file_table, self.shard_tokens,
+                                       fallback=CategoryIndex(self.BASIC_CATEGORIES))
+            self.proposed_structure = proposer.propose()
+            if not self.proposed_structure["contents"]:
+                self.proposed_structure = None
+        else:
+            self.proposed_structure = self.llm_client.get_organization_proposal(self.file_structure,
+                                                                                self.stats)
         
         if not self.proposed_structure:
+            if np is not None and len(self.file_table):
+                logger.warning("LLM proposal failed, falling back to local clustering")
+                return LocalClusterer(self.file_table, CategoryIndex(self.BASIC_CATEGORIES)).propose()
             logger.warning("LLM proposal failed, falling back to basic organization")
             return self._generate_basic_structure()
         
@@ -308,25 +822,19 @@ class AIFileOrganizer:
             "contents": []
         }
         
-        # Create categories based on common file types
-        categories = {
-            "documents": [".pdf", ".doc", ".docx", ".txt", ".xlsx", ".ppt", ".pptx"],
-            "media": [".jpg", ".jpeg", ".png", ".gif", ".mp4", ".avi", ".mov"],
-            "archives": [".zip", ".rar", ".7z", ".tar", ".gz"],
-            "code": [".py", ".js", ".java", ".cpp", ".html", ".css"]
-        }
+        categories = self.BASIC_CATEGORIES
+        index = CategoryIndex(categories)
+        rows_by_code = defaultdict(list)
+        for row, code in enumerate(index.classify_table(self.file_table)):
+            rows_by_code[code].append(row)
         
-        for category, extensions in categories.items():
-            category_files = []
-            for item in self._get_all_files(self.file_structure):
-                if item["extension"] in extensions:
-                    category_files.append(item)
-            
-            if category_files:  # Only add category if it has files
+        for code, category in enumerate(index.categories):
+            rows = rows_by_code.get(code)
+            if rows and category in categories:  # Only add category if it has files
                 basic_structure["contents"].append({
                     "type": "directory",
                     "name": category,
-                    "contents": category_files
+                    "contents": [self.file_table.file_dict(row) for row in rows]
                 })
         
         return basic_structure
@@ -341,29 +849,643 @@ class AIFileOrganizer:
                 files.extend(self._get_all_files(item))
         return files
     
+class ShardedProposer:
+    """Map-reduce organization proposals for trees too large for one prompt.
+
+    The file table is cut into shards of whole subtrees, in path order,
+    that fit a token budget. Each shard lists its files by relative path and
+    is classified by the LLM concurrently (bounded by the client). The
+    per-shard answers, ``{"Folder/Subfolder": [file numbers]}``, are then
+    merged case-insensitively into a single proposed hierarchy whose file
+    entries carry their source ``path``. Files a shard did not place fall
+    back to the basic extension categories.
+    """
+
+    CHARS_PER_TOKEN = 4
+    MAX_FOLDER_DEPTH = 3
+
+    def __init__(self, llm_client: LLMClient, file_table: FileTable,
+                 token_budget: int = 1500, fallback: Optional[CategoryIndex] = None):
+        self.llm_client = llm_client
+        self.file_table = file_table
+        self.token_budget = token_budget
+        self.fallback = fallback
+        self.stats = {}
+
+    def _relative_path(self, row: int) -> str:
+        root = self.file_table.dirs[0]
+        return os.path.relpath(self.file_table.path(row), root).replace(os.sep, "/")
+
+    def shard(self) -> List[List[int]]:
+        """Group table rows into token-budgeted shards of whole subtrees.
+
+        Subtrees are visited depth first with siblings in name order, so a
+        directory's files stay next to its subdirectories. A subtree that
+        fits the budget is never split; one that does not is broken up at
+        its child directories, and only a directory whose own files exceed
+        the budget is cut between files. Consecutive pieces are packed into
+        shards up to the budget.
+        """
+        table = self.file_table
+        rows_by_dir = defaultdict(list)
+        for row, dir_id in enumerate(table.dir_id):
+            rows_by_dir[dir_id].append(row)
+        children = defaultdict(list)
+        for dir_id, parent_id in enumerate(table.dir_parent):
+            children[parent_id].append(dir_id)
+        for siblings in children.values():
+            siblings.sort(key=lambda d: os.path.basename(table.dirs[d]))
+
+        cost = {}
+        own_cost = [0] * len(table.dirs)
+        for dir_id, rows in rows_by_dir.items():
+            rows.sort(key=lambda r: table.names[r])
+            for row in rows:
+                cost[row] = len(self._relative_path(row)) // self.CHARS_PER_TOKEN + 2
+            own_cost[dir_id] = sum(cost[row] for row in rows)
+        # Directories are added parents first, so children are summed before parents
+        subtree_cost = own_cost[:]
+        for dir_id in range(len(table.dirs) - 1, -1, -1):
+            subtree_cost[dir_id] += sum(subtree_cost[child] for child in children[dir_id])
+
+        def subtree_rows(dir_id: int) -> List[int]:
+            rows, stack = [], [dir_id]
+            while stack:
+                current = stack.pop()
+                rows.extend(rows_by_dir.get(current, ()))
+                stack.extend(reversed(children[current]))
+            return rows
+
+        # Pieces that must not be split, in depth-first order
+        pieces = []
+        stack = list(reversed(children[-1]))
+        while stack:
+            dir_id = stack.pop()
+            if subtree_cost[dir_id] <= self.token_budget:
+                pieces.append((subtree_rows(dir_id), subtree_cost[dir_id]))
+                continue
+            piece, used = [], 0
+            for row in rows_by_dir.get(dir_id, ()):
+                if piece and used + cost[row] > self.token_budget:
+                    pieces.append((piece, used))
+                    piece, used = [], 0
+                piece.append(row)
+                used += cost[row]
+            if piece:
+                pieces.append((piece, used))
+            stack.extend(reversed(children[dir_id]))
+
+        shards, current, used = [], [], 0
+        for rows, rows_cost in pieces:
+            if current and used + rows_cost > self.token_budget:
+                shards.append(current)
+                current, used = [], 0
+            current.extend(rows)
+            used += rows_cost
+        if current:
+            shards.append(current)
+        return shards
+
+    def _shard_prompt(self, rows: List[int]) -> str:
+        categories = ", ".join(sorted(AIFileOrganizer.BASIC_CATEGORIES))
+        listing = "\n".join(f"{i}: {self._relative_path(row)}" for i, row in enumerate(rows))
+        return f"""Sort these files into folders. Use short folder paths such as "documents/invoices", at most {self.MAX_FOLDER_DEPTH} levels deep, and reuse these top-level folders where they fit: {categories}.
+Files (number: relative path):
+{listing}
+Respond with JSON only, mapping each folder path to the numbers of its files, e.g. {{"documents/invoices": [0, 3]}}."""
+
+    def _folder_parts(self, folder) -> List[str]:
+        """Sanitize a folder path from the model into safe path components."""
+        if not isinstance(folder, str):
+            return []
+        parts = [part.strip() for part in folder.replace("\\", "/").split("/")]
+        parts = [part for part in parts if part and part not in (".", "..") and ":" not in part]
+        return parts[:self.MAX_FOLDER_DEPTH]
+
+    async def _classify_all(self, shards: List[List[int]]) -> List[tuple]:
+        done = 0
+
+        async def classify(rows):
+            nonlocal done
+            start = time.perf_counter()
+            try:
+                result = await self.llm_client.complete_json(self._shard_prompt(rows))
+            except Exception as e:
+                logger.error(f"Error classifying shard: {e}")
+                result = None
+            latency = time.perf_counter() - start
+            done += 1
+            status = "classified" if isinstance(result, dict) else "failed"
+            logger.info(f"Shard {done}/{len(shards)} ({len(rows)} files) {status} in {latency:.2f}s")
+            return result if isinstance(result, dict) else None, latency
+
+        import asyncio
+        return await asyncio.gather(*(classify(rows) for rows in shards))
+
+    def propose(self) -> Dict:
+        """Classify every shard and merge the answers into one hierarchy."""
+        start = time.perf_counter()
+        shards = self.shard()
+        results = self.llm_client.run(self._classify_all(shards))
+
+        # Reduce: folder nodes keyed by lower-cased name, first spelling wins
+        root = {"type": "directory", "name": "organized_files", "contents": []}
+        nodes = {(): root}
+        unplaced = 0
+
+        def folder(parts: List[str]) -> Dict:
+            key = ()
+            node = root
+            for part in parts:
+                key += (part.lower(),)
+                child = nodes.get(key)
+                if child is None:
+                    child = nodes[key] = {"type": "directory", "name": part, "contents": []}
+                    node["contents"].append(child)
+                node = child
+            return node
+
+        for rows, (result, _) in zip(shards, results):
+            placed = set()
+            for folder_path, numbers in (result or {}).items():
+                parts = self._folder_parts(folder_path)
+                if not parts or not isinstance(numbers, list):
+                    continue
+                node = folder(parts)
+                for number in numbers:
+                    if isinstance(number, int) and 0 <= number < len(rows) and number not in placed:
+                        placed.add(number)
+                        node["contents"].append(self.file_table.file_dict(rows[number]))
+            for number, row in enumerate(rows):
+                if number in placed:
+                    continue
+                unplaced += 1
+                category = (self.fallback.classify_name(self.file_table.names[row])
+                            if self.fallback is not None else None)
+                if category is not None:
+                    folder([category])["contents"].append(self.file_table.file_dict(row))
+
+        latencies = sorted(latency for _, latency in results)
+        self.stats = {
+            "shards": len(shards),
+            "failed_shards": sum(1 for result, _ in results if result is None),
+            "unplaced_files": unplaced,
+            "seconds": time.perf_counter() - start,
+            "median_shard_seconds": latencies[len(latencies) // 2] if latencies else 0.0,
+            "max_shard_seconds": latencies[-1] if latencies else 0.0
+        }
+        logger.info(
+            f"Sharded proposal: {self.stats['shards']} shards "
+            f"({self.stats['failed_shards']} failed) in {self.stats['seconds']:.2f}s, "
+            f"median shard {self.stats['median_shard_seconds']:.2f}s, "
+            f"slowest {self.stats['max_shard_seconds']:.2f}s"
+        )
+        return root
+
+class LocalClusterer:
+    """Offline grouping of files by name similarity, no network required.
+
+    Names are normalized (dates become ``\\x01``, versions ``\\x02``, other
+    digit runs ``0``) and de-duplicated first, so IMG_0001 … IMG_9999 cost a
+    single feature row. Each unique name is feature-hashed into a signed
+    vector of character trigrams (IDF-weighted), its prefix, its extension
+    and date/version flags, then L2-normalized. Files are split by extension
+    category and every category is clustered with count-weighted mini-batch
+    spherical k-means. Clusters are named after their most common name token,
+    or by the LLM in one request when ``name_clusters`` gets a client.
+    Requires NumPy.
+    """
+
+    DATE_RE = re.compile(r'(?:19|20)\d{2}[-_.]?(?:0[1-9]|1[0-2])[-_.]?(?:0[1-9]|[12]\d|3[01])')
+    VERSION_RE = re.compile(r'v\d+(?:\.\d+)*|\d+(?:\.\d+){1,3}')
+    DIGITS_RE = re.compile(r'\d+')
+    PREFIX_RE = re.compile(r'[\s_\-.]+')
+    TOKEN_RE = re.compile(r'[a-z]{3,}')
+    NAME_LENGTH = 32
+    NGRAM_DIMS = 64
+    PREFIX_DIMS = 16
+    EXT_DIMS = 8
+    PREFIX_WEIGHT = 2.0
+    EXT_WEIGHT = 1.5
+    CHUNK_ROWS = 65536
+
+    def __init__(self, file_table: FileTable, categories: Optional[CategoryIndex] = None,
+                 max_clusters: int = 12, batch_size: int = 4096, iterations: int = 60,
+                 seed: int = 0):
+        if np is None:
+            raise RuntimeError("LocalClusterer requires NumPy")
+        self.file_table = file_table
+        self.categories = categories or CategoryIndex(AIFileOrganizer.BASIC_CATEGORIES)
+        self.max_clusters = max_clusters
+        self.batch_size = batch_size
+        self.iterations = iterations
+        self.rng = np.random.default_rng(seed)
+        self.stats = {}
+
+    def _normalize(self):
+        """Return unique (stem, ext) keys, the key index of every row, and counts."""
+        table = self.file_table
+        date_sub, version_sub, digits_sub = self.DATE_RE.sub, self.VERSION_RE.sub, self.DIGITS_RE.sub
+        key_ids: Dict[tuple, int] = {}
+        inverse = array('I')
+        for name, ext_code in zip(table.names, table.ext_id):
+            ext = table.extensions[ext_code]
+            stem = name[:len(name) - len(ext)].lower() if ext else name.lower()
+            stem = digits_sub('0', version_sub('\x02', date_sub('\x01', stem)))
+            key = (stem, ext)
+            key_id = key_ids.get(key)
+            if key_id is None:
+                key_id = key_ids[key] = len(key_ids)
+            inverse.append(key_id)
+        inverse = np.frombuffer(inverse, dtype=np.uint32) if len(inverse) else np.zeros(0, np.uint32)
+        counts = np.bincount(inverse, minlength=len(key_ids)).astype(np.float64)
+        return list(key_ids), inverse, counts
+
+    @staticmethod
+    def _bucket(text: str, dims: int) -> int:
+        return zlib.crc32(text.encode('utf-8')) % dims
+
+    def _features(self, keys: List[tuple], counts) -> "np.ndarray":
+        """Feature-hash the unique keys into an L2-normalized float32 matrix."""
+        n, length, ngram_dims = len(keys), self.NAME_LENGTH, self.NGRAM_DIMS
+        width = ngram_dims + self.PREFIX_DIMS + self.EXT_DIMS + 2
+        features = np.zeros((n, width), dtype=np.float32)
+
+        # Character trigrams, hashed with a multiplicative hash; the top bits
+        # pick the column and the next bit the sign
+        for start in range(0, n, self.CHUNK_ROWS):
+            chunk = keys[start:start + self.CHUNK_ROWS]
+            raw = b''.join(stem.encode('utf-8')[:length].ljust(length, b'\0') for stem, _ in chunk)
+            chars = np.frombuffer(raw, dtype=np.uint8).reshape(len(chunk), length).astype(np.uint32)
+            trigrams = chars[:, :-2] * np.uint32(961) + chars[:, 1:-1] * np.uint32(31) + chars[:, 2:]
+            hashed = trigrams * np.uint32(2654435761)
+            valid = chars[:, 2:] != 0
+            columns = (hashed >> np.uint32(26)) % ngram_dims
+            signs = np.where((hashed >> np.uint32(25)) & np.uint32(1), 1.0, -1.0)
+            rows = np.broadcast_to(np.arange(len(chunk))[:, None], columns.shape)
+            flat = (rows * ngram_dims + columns)[valid]
+            block = np.bincount(flat, weights=signs[valid], minlength=len(chunk) * ngram_dims)
+            features[start:start + len(chunk), :ngram_dims] = block.reshape(len(chunk), ngram_dims)
+
+        # IDF over the trigram columns, weighted by how many files share a key
+        document_frequency = (features[:, :ngram_dims] != 0).T @ counts
+        total = counts.sum()
+        features[:, :ngram_dims] *= (np.log((1 + total) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        prefix_base = ngram_dims
+        ext_base = prefix_base + self.PREFIX_DIMS
+        flag_base = ext_base + self.EXT_DIMS
+        ext_columns = {}
+        for i, (stem, ext) in enumerate(keys):
+            prefix = self.PREFIX_RE.split(stem, 1)[0]
+            if prefix:
+                features[i, prefix_base + self._bucket(prefix, self.PREFIX_DIMS)] += self.PREFIX_WEIGHT
+            column = ext_columns.get(ext)
+            if column is None:
+                column = ext_columns[ext] = ext_base + self._bucket(ext, self.EXT_DIMS)
+            features[i, column] += self.EXT_WEIGHT
+            features[i, flag_base] = '\x01' in stem
+            features[i, flag_base + 1] = '\x02' in stem
+
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        features /= np.maximum(norms, 1e-6)
+        return features
+
+    def _kmeans(self, features, weights, k: int):
+        """Weighted mini-batch spherical k-means; returns a label per row."""
+        n = len(features)
+        if k <= 1 or n <= k:
+            return np.zeros(n, dtype=np.intp) if k <= 1 else np.arange(n)
+        p = weights / weights.sum()
+        centers = features[self.rng.choice(n, k, replace=False, p=p)].copy()
+        seen = np.zeros(k)
+        for _ in range(self.iterations):
+            batch = features[self.rng.choice(n, min(self.batch_size, n), p=p)]
+            nearest = np.argmax(batch @ centers.T, axis=1)
+            batch_counts = np.bincount(nearest, minlength=k)
+            sums = np.zeros_like(centers)
+            np.add.at(sums, nearest, batch)
+            seen += batch_counts
+            moved = batch_counts > 0
+            rate = (batch_counts[moved] / seen[moved])[:, None]
+            centers[moved] += rate * (sums[moved] / batch_counts[moved][:, None] - centers[moved])
+            centers /= np.maximum(np.linalg.norm(centers, axis=1, keepdims=True), 1e-6)
+        labels = np.empty(n, dtype=np.intp)
+        for start in range(0, n, self.CHUNK_ROWS):
+            labels[start:start + self.CHUNK_ROWS] = np.argmax(
+                features[start:start + self.CHUNK_ROWS] @ centers.T, axis=1
+            )
+        return labels
+
+    def cluster(self) -> Dict[str, List[List[int]]]:
+        """Group the table's rows: ``{category: [[row, ...] per cluster]}``."""
+        start = time.perf_counter()
+        keys, inverse, counts = self._normalize()
+        features = self._features(keys, counts)
+
+        key_category = np.array(
+            [self.categories.classify_name('x' + ext) or self.categories.default for _, ext in keys],
+            dtype=object
+        )
+        # Rows of each key, via one stable sort of the inverse index
+        order = np.argsort(inverse, kind='stable')
+        boundaries = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+
+        groups = {}
+        for category in self.categories.categories:
+            members = np.flatnonzero(key_category == category)
+            if not len(members):
+                continue
+            weights = counts[members]
+            k = int(min(self.max_clusters, max(1, round(np.sqrt(len(members) / 2)))))
+            labels = self._kmeans(features[members], weights, k)
+            clusters = []
+            for label in range(labels.max() + 1):
+                cluster_keys = members[labels == label]
+                rows = [int(row) for key in cluster_keys
+                        for row in order[boundaries[key]:boundaries[key + 1]]]
+                if rows:
+                    clusters.append(rows)
+            groups[category] = clusters
+
+        self.stats = {
+            "files": len(inverse),
+            "unique_names": len(keys),
+            "clusters": sum(len(clusters) for clusters in groups.values()),
+            "seconds": time.perf_counter() - start
+        }
+        logger.info(
+            f"Clustered {self.stats['files']} files ({self.stats['unique_names']} unique names) "
+            f"into {self.stats['clusters']} groups in {self.stats['seconds']:.2f}s"
+        )
+        return groups
+
+    def _local_name(self, rows: List[int], taken: set, fallback: str) -> str:
+        """Most common name token of a cluster that its category has not used yet."""
+        table = self.file_table
+        tokens = defaultdict(int)
+        for row in rows[:2000]:
+            stem = table.names[row][:len(table.names[row]) - len(table.extension(row))]
+            for token in self.TOKEN_RE.findall(stem.lower()):
+                tokens[token] += 1
+        for token, _ in sorted(tokens.items(), key=lambda item: (-item[1], item[0])):
+            if token not in taken:
+                return token
+        return fallback
+
+    def name_clusters(self, groups: Dict[str, List[List[int]]],
+                      llm_client: Optional[LLMClient] = None) -> Dict[str, List[str]]:
+        """Folder name for every cluster; asks the LLM once when a client is given."""
+        names = {}
+        for category, clusters in groups.items():
+            taken = {category}
+            names[category] = []
+            for i, rows in enumerate(clusters):
+                name = self._local_name(rows, taken, f"{category}_{i + 1}")
+                taken.add(name)
+                names[category].append(name)
+
+        if llm_client is None:
+            return names
+        labels = [(category, i) for category, clusters in groups.items()
+                  for i in range(len(clusters)) if len(clusters) > 1]
+        if not labels:
+            return names
+        listing = "\n".join(
+            f"{n}: " + ", ".join(self.file_table.names[row] for row in groups[category][i][:6])
+            for n, (category, i) in enumerate(labels)
+        )
+        prompt = f"""Give each numbered group of files a short, descriptive folder name (lowercase, no slashes).
+{listing}
+Respond with JSON only, mapping each group number to its folder name, e.g. {{"0": "invoices"}}."""
+        try:
+            reply = llm_client.run(llm_client.complete_json(prompt)) or {}
+        except Exception as e:
+            logger.error(f"Error naming clusters: {e}")
+            reply = {}
+        for n, (category, i) in enumerate(labels):
+            name = reply.get(str(n))
+            if isinstance(name, str):
+                name = name.strip().replace("/", "-").replace("\\", "-")
+                if name and name not in (".", "..") and name not in names[category]:
+                    names[category][i] = name
+        return names
+
+    def propose(self, llm_client: Optional[LLMClient] = None) -> Dict:
+        """Cluster the table into a proposed structure in the usual dict format."""
+        groups = self.cluster()
+        names = self.name_clusters(groups, llm_client)
+        root = {"type": "directory", "name": "organized_files", "contents": []}
+        for category, clusters in groups.items():
+            node = {"type": "directory", "name": category, "contents": []}
+            root["contents"].append(node)
+            if len(clusters) == 1:
+                node["contents"].extend(self.file_table.file_dict(row) for row in clusters[0])
+                continue
+            for name, rows in zip(names[category], clusters):
+                node["contents"].append({
+                    "type": "directory",
+                    "name": name,
+                    "contents": [self.file_table.file_dict(row) for row in rows]
+                })
+        return root
+
+class PlanOperation(NamedTuple):
+    """One planned operation; ``source`` is None for CREATE_DIR."""
+    op: str
+    source: Optional[str]
+    target: str
+
+    def __str__(self) -> str:
+        if self.op == OperationPlan.MOVE:
+            return f"{self.op}: {self.source} → {self.target}"
+        return f"{self.op}: {self.target}"
+
+class OperationPlan:
+    """Compact, typed reorganization plan.
+
+    Each operation is an op code plus directory ids and file names; directory
+    paths are interned once. Plans are saved as JSONL (directory definitions
+    first, then one operation per line) so they can be diffed, shipped to
+    another host and executed later with ``PlanFile``.
+    """
+
+    CREATE_DIR = "CREATE_DIR"
+    MOVE = "MOVE"
+    OP_CODES = (CREATE_DIR, MOVE)
+    FORMAT = "ai-file-manager-plan"
+    VERSION = 1
+
+    def __init__(self):
+        self.dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self.op_code = array('B')
+        self.source_dir = array('i')
+        self.target_dir = array('i')
+        self.source_name: List[Optional[str]] = []
+        self.target_name: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        return len(self.op_code)
+
+    def _dir_id(self, path: str) -> int:
+        dir_id = self._dir_ids.get(path)
+        if dir_id is None:
+            dir_id = self._dir_ids[path] = len(self.dirs)
+            self.dirs.append(path)
+        return dir_id
+
+    def add_create_dir(self, path: str) -> None:
+        self.op_code.append(0)
+        self.source_dir.append(-1)
+        self.target_dir.append(self._dir_id(path))
+        self.source_name.append(None)
+        self.target_name.append(None)
+
+    def add_move(self, source_dir: str, source_name: str, target_dir: str, target_name: str) -> None:
+        self.op_code.append(1)
+        self.source_dir.append(self._dir_id(source_dir))
+        self.target_dir.append(self._dir_id(target_dir))
+        self.source_name.append(source_name)
+        self.target_name.append(target_name)
+
+    def operation(self, index: int) -> PlanOperation:
+        op = self.OP_CODES[self.op_code[index]]
+        target = self.dirs[self.target_dir[index]]
+        if op == self.CREATE_DIR:
+            return PlanOperation(op, None, target)
+        return PlanOperation(
+            op,
+            os.path.join(self.dirs[self.source_dir[index]], self.source_name[index]),
+            os.path.join(target, self.target_name[index])
+        )
+
+    def __iter__(self):
+        return (self.operation(index) for index in range(len(self)))
+
+    def target_directories(self) -> set:
+        """Every directory an operation creates or moves a file into."""
+        return {self.dirs[dir_id] for dir_id in set(self.target_dir)}
+
+    def moves(self):
+        """Yield (source, target) path pairs for MOVE operations."""
+        for operation in self:
+            if operation.op == self.MOVE:
+                yield operation.source, operation.target
+
+    def save(self, path: str) -> None:
+        """Write the plan as JSONL."""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"format": self.FORMAT, "version": self.VERSION}) + "\n")
+            for dir_id, dir_path in enumerate(self.dirs):
+                f.write(json.dumps({"dir": dir_id, "path": dir_path}, ensure_ascii=False) + "\n")
+            for index in range(len(self)):
+                record = {"op": self.OP_CODES[self.op_code[index]]}
+                if self.op_code[index]:
+                    record["source"] = [self.source_dir[index], self.source_name[index]]
+                    record["target"] = [self.target_dir[index], self.target_name[index]]
+                else:
+                    record["target"] = self.target_dir[index]
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        logger.info(f"Saved plan with {len(self)} operations to {path}")
+
+class PlanFile:
+    """A saved OperationPlan streamed from disk.
+
+    Only the directory table is held in memory; operations are decoded one
+    line at a time, so million-operation plans execute in constant memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dirs: List[str] = []
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("format") != OperationPlan.FORMAT:
+                raise ValueError(f"{path} is not an operation plan")
+            if header.get("version") != OperationPlan.VERSION:
+                raise ValueError(f"Unsupported plan version {header.get('version')} in {path}")
+            for line in f:
+                record = json.loads(line)
+                if "dir" not in record:
+                    break
+                self.dirs.append(record["path"])
+
+    def _records(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if "op" in record:
+                    yield record
+
+    def __iter__(self):
+        for record in self._records():
+            if record["op"] == OperationPlan.MOVE:
+                (source_dir, source_name), (target_dir, target_name) = record["source"], record["target"]
+                yield PlanOperation(
+                    OperationPlan.MOVE,
+                    os.path.join(self.dirs[source_dir], source_name),
+                    os.path.join(self.dirs[target_dir], target_name)
+                )
+            else:
+                yield PlanOperation(record["op"], None, self.dirs[record["target"]])
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._records())
+
+    def __bool__(self) -> bool:
+        # A saved plan is never re-planned; avoid a full read just to test truthiness
+        return True
+
+    def target_directories(self) -> set:
+        targets = set()
+        for record in self._records():
+            target = record["target"]
+            targets.add(self.dirs[target[0] if isinstance(target, list) else target])
+        return targets
+
+    def moves(self):
+        for operation in self:
+            if operation.op == OperationPlan.MOVE:
+                yield operation.source, operation.target
+
 class FileSystemReorganizer:
-    def __init__(self, original_structure: Dict, proposed_structure: Dict):
+    def __init__(self, original_structure: Dict, proposed_structure: Dict,
+                 file_table: Optional[FileTable] = None,
+                 rename_workers: Optional[int] = None, copy_workers: int = 2,
+                 max_in_flight: int = 10000):
         """Initialize reorganizer with original and proposed structures."""
+        self.rename_workers = rename_workers
+        self.copy_workers = copy_workers
+        self.max_in_flight = max_in_flight
         self.original_structure = original_structure
         self.proposed_structure = proposed_structure
-        self.operations = []
+        if file_table is None and original_structure is not None:
+            file_table = FileTable.from_structure(original_structure)
+        self.file_table = file_table
+        self.operations = OperationPlan()
         self.executed_operations = []
+        self.journal: Optional[OperationJournal] = None
+        self.completed: Dict[str, str] = {}
+        self.resuming = False
+        self.names = NameRegistry()
     
     def _determine_target_location(self, file_item: Dict, target_structure: Dict, target_path: Path) -> Optional[Path]:
         """Determines the target location for a file based on the proposed structure."""
-        file_name = file_item["name"]
-        file_ext = file_item["extension"]
-        
+        return self._determine_target_directory(file_item["extension"], target_structure, target_path) / file_item["name"]
+    
+    def _determine_target_directory(self, file_ext: str, target_structure: Dict, target_path: Path) -> Path:
+        """Determines the target directory for an extension based on the proposed structure."""
         # Look for an appropriate directory in the target structure
         for item in target_structure.get("contents", []):
             if item["type"] == "directory":
                 # Check if this directory is meant for this type of file
                 if (file_ext in item["name"].lower() or  # Extension-based directory
                     any(category in item["name"].lower() for category in ["documents", "media", "archives", "code"])):
-                    return target_path / item["name"] / file_name
+                    return target_path / item["name"]
         
         # If no specific directory found, place in target root
-        return target_path / file_name
+        return target_path
     
     def _find_matching_target_dir(self, source_dir: Dict, target_contents: List[Dict]) -> Optional[Dict]:
         """Finds matching target directory for source directory."""
@@ -378,262 +1500,441 @@ class FileSystemReorganizer:
         
         return None
     
-    def plan_reorganization(self) -> List[str]:
-        """Plans the reorganization and returns list of operations."""
+    def _explicit_assignments(self, root_path: Path) -> Dict[str, str]:
+        """Map the source ``path`` of each file entry in the proposal to its target directory."""
+        assigned = {}
+        stack = [(self.proposed_structure, root_path)]
+        while stack:
+            node, node_path = stack.pop()
+            for item in node.get("contents", []):
+                if item.get("type") == "directory" and item.get("name"):
+                    stack.append((item, node_path / item["name"]))
+                elif item.get("type") == "file" and item.get("path"):
+                    assigned[item["path"]] = str(node_path)
+        return assigned
+    
+    @metrics.stage("plan")
+    def plan_reorganization(self) -> OperationPlan:
+        """Plans the reorganization and returns the operation plan."""
         logger.info("Planning reorganization")
-        self.operations = []
+        self.operations = OperationPlan()
         
         # Start with creating the root directory of proposed structure
         root_path = Path(self.original_structure["path"]).parent / "organized_files"
-        self.operations.append(f"CREATE_DIR: {root_path}")
+        self.operations.add_create_dir(str(root_path))
+        
+        table = self.file_table
         
-        def plan_recursive(current: Dict, target: Dict, current_path: Path, target_path: Path):
+        # Only directories with files somewhere below them get a target
+        has_files = bytearray(len(table.dirs))
+        for dir_id in set(table.dir_id):
+            while dir_id >= 0 and not has_files[dir_id]:
+                has_files[dir_id] = 1
+                dir_id = table.dir_parent[dir_id]
+        
+        # Match source directories to target directories, parents first
+        targets: List[Optional[tuple]] = [None] * len(table.dirs)
+        for dir_id in range(len(table.dirs)):
+            if not has_files[dir_id]:
+                continue
+            if dir_id == 0:
+                target, target_path = self.proposed_structure, root_path
+            else:
+                parent_target = targets[table.dir_parent[dir_id]]
+                if parent_target is None:
+                    continue
+                matching_target = self._find_matching_target_dir(
+                    {"name": os.path.basename(table.dirs[dir_id])},
+                    parent_target[0].get("contents", [])
+                )
+                if not matching_target:
+                    continue
+                target, target_path = matching_target, parent_target[1] / matching_target["name"]
+            targets[dir_id] = (target, target_path)
             # Create target directory if it doesn't exist
             if target["type"] == "directory":
-                self.operations.append(f"CREATE_DIR: {target_path}")
-            
-            # Process all items in current structure
-            for item in current.get("contents", []):
-                if item["type"] == "file":
-                    # Determine where this file should go in new structure
-                    new_location = self._determine_target_location(item, target, target_path)
-                    if new_location:
-                        self.operations.append(f"MOVE: {item['path']} → {new_location}")
-                
-                elif item["type"] == "directory":
-                    # Find matching directory in target structure
-                    matching_target = self._find_matching_target_dir(item, target.get("contents", []))
-                    if matching_target:
-                        new_target_path = target_path / matching_target["name"]
-                        plan_recursive(item, matching_target, 
-                                    Path(item["path"]),
-                                    new_target_path)
-        
-        # Start planning from root
-        plan_recursive(
-            self.original_structure,
-            self.proposed_structure,
-            Path(self.original_structure["path"]),
-            root_path
-        )
+                self.operations.add_create_dir(str(target_path))
+        
+        # File entries of the proposal that name a scanned source path are
+        # moved exactly where the proposal lists them
+        explicit = {}
+        assigned = self._explicit_assignments(root_path)
+        if assigned:
+            for row in range(len(table)):
+                dest_dir = assigned.get(table.path(row))
+                if dest_dir is not None:
+                    explicit[row] = dest_dir
+            for dest_dir in sorted(set(explicit.values())):
+                self.operations.add_create_dir(dest_dir)
+        
+        # Determine where each other file should go; the answer only depends on
+        # the target directory and the extension, so it is computed once per pair
+        destinations = {}
+        for row in range(len(table)):
+            dir_id = table.dir_id[row]
+            if row in explicit:
+                name = table.names[row]
+                self.operations.add_move(table.dirs[dir_id], name, explicit[row], name)
+                continue
+            if targets[dir_id] is None:
+                continue
+            key = (dir_id, table.ext_id[row])
+            dest_dir = destinations.get(key)
+            if dest_dir is None:
+                target, target_path = targets[dir_id]
+                dest_dir = destinations[key] = str(
+                    self._determine_target_directory(table.extension(row), target, target_path)
+                )
+            name = table.names[row]
+            self.operations.add_move(table.dirs[dir_id], name, dest_dir, name)
         
         logger.info(f"Planned {len(self.operations)} operations")
         return self.operations
     
-    def execute_reorganization(self, dry_run: bool = True) -> List[str]:
-        """Executes the reorganization based on planned operations."""
-        if not self.operations:
-            self.plan_reorganization()
+    def _create_directories(self, directories) -> None:
+        """Create every target directory in one pass, parents first."""
+        for path in sorted(directories):
+            try:
+                os.mkdir(path)
+            except FileExistsError:
+                continue
+            except FileNotFoundError:
+                os.makedirs(path, exist_ok=True)
+            except PermissionError:
+                logger.error(f"Permission denied when creating directory: {path}")
+                raise
+            self.executed_operations.append(f"Created directory: {path}")
+            if self.journal:
+                self.journal.record("mkdir", path=path)
+        logger.info(f"Prepared {len(directories)} target directories")
+    
+    def _route_moves(self, moves):
+        """Resolve name collisions and tag each move as same-device or cross-device.
         
-        if dry_run:
-            return self.operations
+        Yields ``(source, target, same_device)``; device numbers are cached per
+        directory so each directory is stat'ed once.
+        """
+        devices = {}
         
-        logger.info("Executing reorganization")
-        self.executed_operations = []
+        def device(directory: str) -> int:
+            dev = devices.get(directory)
+            if dev is None:
+                dev = devices[directory] = os.stat(directory).st_dev
+            return dev
         
-        for operation in self.operations:
+        for source, target in moves:
+            # Work finished by an earlier, interrupted run of this operation
+            if source in self.completed:
+                continue
+            if self.resuming and not os.path.exists(source):
+                logger.info(f"Skipping {source}: already moved by the interrupted run")
+                continue
             try:
-                op_type, paths = operation.split(": ", 1)
-                
-                if op_type == "CREATE_DIR":
-                    path = Path(paths)
-                    try:
-                        # Check if directory already exists
-                        if not path.exists():
-                            path.mkdir(parents=True, exist_ok=True)
-                            logger.info(f"Created directory: {path}")
-                            self.executed_operations.append(f"Created directory: {path}")
-                        else:
-                            logger.info(f"Directory already exists: {path}")
-                    except PermissionError:
-                        logger.error(f"Permission denied when creating directory: {path}")
-                        raise
-                    except Exception as e:
-                        logger.error(f"Error creating directory {path}: {e}")
-                        raise
-                
-                elif op_type == "MOVE":
-                    source, target = map(str.strip, paths.split(" → "))
-                    source_path = Path(source)
-                    target_path = Path(target)
-                    
-                    try:
-                        # Validate source exists
-                        if not source_path.exists():
-                            logger.error(f"Source file not found: {source}")
-                            continue
-                        
-                        # Create target directory if it doesn't exist
-                        target_path.parent.mkdir(parents=True, exist_ok=True)
-                        
-                        # Check if target already exists
-                        if target_path.exists():
-                            logger.warning(f"Target file already exists: {target}")
-                            # Generate unique name
-                            base = target_path.stem
-                            suffix = target_path.suffix
-                            counter = 1
-                            while target_path.exists():
-                                target_path = target_path.with_name(f"{base}_{counter}{suffix}")
-                                counter += 1
-                            logger.info(f"Using alternative target path: {target_path}")
-                        
-                        # Attempt to move the file
-                        try:
-                            shutil.move(str(source_path), str(target_path))
-                            logger.info(f"Successfully moved: {source} → {target_path}")
-                            self.executed_operations.append(f"Moved: {source} → {target_path}")
-                        except PermissionError:
-                            logger.error(f"Permission denied when moving file: {source}")
-                            # Try copy and delete as fallback
-                            try:
-                                shutil.copy2(str(source_path), str(target_path))
-                                source_path.unlink()
-                                logger.info(f"Successfully copied and deleted: {source} → {target_path}")
-                                self.executed_operations.append(f"Copied and deleted: {source} → {target_path}")
-                            except Exception as e:
-                                logger.error(f"Fallback copy-delete failed for {source}: {e}")
-                                raise
-                        except Exception as e:
-                            logger.error(f"Error moving file {source}: {e}")
-                            raise
-                    
-                    except Exception as e:
-                        logger.error(f"Error processing move operation {source} → {target}: {e}")
-                        raise
-            
-            except Exception as e:
-                logger.error(f"Error during operation '{operation}': {e}")
-                # Optionally, you might want to raise the exception here to stop the process
-                # raise
+                source_dev = device(os.path.dirname(source))
+                target_dev = device(os.path.dirname(target))
+            except OSError as e:
+                logger.error(f"Error processing move operation {source} → {target}: {e}")
+                yield source, None, False
                 continue
+            
+            # Reserve a free name in the target directory; no exists() probing
+            target_dir, target_name = os.path.split(target)
+            unique_name = self.names.reserve(target_dir, target_name)
+            if unique_name != target_name:
+                target = os.path.join(target_dir, unique_name)
+                logger.debug(f"Target file already exists, using alternative target path: {target}")
+            
+            yield source, target, source_dev == target_dev
+    
+    def _retarget(self, target: str) -> str:
+        """Pick the next free name after ``target`` turned out to exist on disk."""
+        target_dir, target_name = os.path.split(target)
+        return os.path.join(target_dir, self.names.reserve(target_dir, target_name))
+    
+    def _rename(self, source: str, target: str) -> bool:
+        """Same-device move: a single no-clobber rename, no data copied.
         
-        # Verify operations
-        success_count = len([op for op in self.executed_operations if op.startswith("Moved") or op.startswith("Copied")])
-        total_moves = len([op for op in self.operations if op.startswith("MOVE")])
-        
-        if success_count < total_moves:
-            logger.warning(f"Only {success_count} out of {total_moves} move operations completed successfully")
-        else:
-            logger.info("All move operations completed successfully")
+        With a journal, each attempt's intent is on disk before it starts.
+        """
+        try:
+            identity = os.lstat(source)
+            while True:
+                if self.journal:
+                    self.journal.intend(source, target, identity)
+                try:
+                    place_no_clobber(source, target)
+                    break
+                except FileExistsError:
+                    target = self._retarget(target)
+            metrics.count("renames")
+            self.executed_operations.append(f"Moved: {source} → {target}")
+            if self.journal:
+                self.journal.record("done", src=source, dst=target)
+            return True
+        except FileNotFoundError:
+            logger.error(f"Source file not found: {source}")
+        except PermissionError:
+            logger.error(f"Permission denied when moving file: {source}")
+            return self._copy_move(source, target)
+        except OSError as e:
+            logger.error(f"Error moving file {source}: {e}")
+        return False
+    
+    def _copy_move(self, source: str, target: str) -> bool:
+        """Cross-device move (or rename fallback): copy the data, then remove the source.
         
-        return self.executed_operations
+        The copy goes through transfer_file (reflink, then in-kernel copies)
+        and the target is created with O_EXCL, so an existing file is never
+        overwritten. With a journal, the intent is on disk as soon as the
+        target exists, before any data is copied or the source removed.
+        """
+        try:
+            while True:
+                try:
+                    method = transfer_file(
+                        Path(source), Path(target), exclusive=True,
+                        on_create=(lambda target_stat: self.journal.intend(source, target, target_stat))
+                        if self.journal else None
+                    )
+                    break
+                except FileExistsError:
+                    target = self._retarget(target)
+            os.unlink(source)
+            self.executed_operations.append(f"Copied and deleted: {source} → {target} [{method}]")
+            if self.journal:
+                self.journal.record("done", src=source, dst=target, method=method)
+            return True
+        except FileNotFoundError:
+            logger.error(f"Source file not found: {source}")
+        except Exception as e:
+            logger.error(f"Fallback copy-delete failed for {source}: {e}")
+        return False
+    
+    @classmethod
+    def from_plan_file(cls, path: str, **kwargs) -> 'FileSystemReorganizer':
+        """Create a reorganizer that executes a previously saved plan."""
+        reorganizer = cls(None, None, **kwargs)
+        reorganizer.operations = PlanFile(path)
+        return reorganizer
+    
+    @classmethod
+    def resume(cls, journal_dir: str, operation_id: str, **kwargs) -> 'FileSystemReorganizer':
+        """Create a reorganizer that finishes an interrupted operation.
 
-def main():
-    """Main function to run the file organization system."""
-    try:
-        # Get user inputs
-        root_dir = input("Enter the directory path to organize: ")
-        api_key = input("Enter your NVIDIA API key (press Enter to use environment variable): ") or None
-        
-        # Initialize components
-        scanner = FileSystemScanner(root_dir)
-        llm_client = LLMClient(api_key)
+        The plan saved when the operation started is replayed, skipping every
+        move its journal records as done. Moves the interrupted run had
+        started are reconciled against the disk first.
+        """
+        records = OperationJournal.read(journal_dir, operation_id)
+        begin = next((record for record in records if record["t"] == "begin"), None)
+        if begin is None or not begin.get("plan"):
+            raise ValueError(f"Journal for operation {operation_id} has no saved plan")
+        journal = OperationJournal(journal_dir, operation_id)
+        try:
+            records = journal.reconcile(records)
+        finally:
+            journal.close()
+        reorganizer = cls.from_plan_file(begin["plan"], **kwargs)
+        reorganizer.completed = OperationJournal.completed_moves(records)
+        reorganizer.resuming = True
+        logger.info(f"Resuming operation {operation_id}: "
+                    f"{len(reorganizer.completed)} moves already done")
+        return reorganizer
+    
+    @metrics.stage("undo")
+    def undo_reorganization(self, journal_dir: str, operation_id: str) -> List[str]:
+        """Move every file of a journaled operation back, newest move first."""
+        records = OperationJournal.read(journal_dir, operation_id)
+        self.journal = OperationJournal(journal_dir, operation_id)
+        self.executed_operations = []
+        try:
+            records = self.journal.reconcile(records)
+            for source, target in reversed(list(OperationJournal.completed_moves(records).items())):
+                if os.path.exists(source):
+                    logger.warning(f"Cannot restore {target}: {source} exists again")
+                    continue
+                try:
+                    os.makedirs(os.path.dirname(source), exist_ok=True)
+                    shutil.move(target, source)
+                except OSError as e:
+                    logger.error(f"Failed to restore {target} → {source}: {e}")
+                    continue
+                self.journal.record("undone", src=source, dst=target)
+                self.executed_operations.append(f"Restored: {target} → {source}")
+            
+            # Remove directories the operation created, deepest first, if now empty
+            created = [record["path"] for record in records if record["t"] == "mkdir"]
+            for path in sorted(created, reverse=True):
+                try:
+                    os.rmdir(path)
+                    self.executed_operations.append(f"Removed directory: {path}")
+                except OSError:
+                    pass
+            self.journal.record("undo_end")
+        finally:
+            self.journal.close()
+        return self.executed_operations
+    
+    @metrics.stage("execute")
+    def execute_reorganization(self, dry_run: bool = True,
+                               journal: Optional[OperationJournal] = None) -> List[str]:
+        """Executes the reorganization based on planned operations.
         
-        # Scan directory
-        print("\nScanning directory structure...")
-        current_structure = scanner.scan_directory()
+        Target directories are created up front, then same-device renames run
+        on one thread pool while cross-device copies run on a second, smaller
+        pool so that a few large copies cannot hold up cheap renames. With a
+        journal, every created directory and every move's intent and
+        completion are recorded so the run can be resumed or undone. The number of queued moves and how busy
+        each pool was are reported through ``metrics``. A dry run moves
+        nothing and returns the planned operations as descriptions; use
+        ``plan_reorganization`` for the structured plan.
+        """
+        if not self.operations:
+            self.plan_reorganization()
         
-        # Analyze and get proposal
-        print("\nAnalyzing files and generating organization proposal...")
-        organizer = AIFileOrganizer(current_structure, llm_client)
-        proposed_structure = organizer.analyze_structure()
+        if dry_run:
+            return [str(operation) for operation in self.operations]
         
-        if not proposed_structure:
-            print("\nFalling back to basic organization structure...")
-            proposed_structure = organizer._generate_basic_structure()
+        logger.info("Executing reorganization")
+        self.executed_operations = []
+        self.journal = journal
+        self.names = NameRegistry()
         
-        # Generate report
-        print("\nGenerating comprehensive report...")
-        report_generator = ReportGenerator(current_structure, proposed_structure, organizer.file_patterns)
-        report = report_generator.generate_report()
+        plan = self.operations
+        self._create_directories(plan.target_directories())
         
-        print(f"\nReport generated successfully! Check the 'report' directory for details.")
+        # Moves are streamed from the plan; at most max_in_flight of them are
+        # queued on the pools at once
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        counts = {"rename": 0, "copy": 0, "success": 0}
+        busy = {"rename": 0.0, "copy": 0.0}  # Seconds the workers spent moving
+        counts_lock = threading.Lock()
         
-        # Ask for confirmation
-        print("\nPlease review the report in the 'report' directory.")
-        if input("\nDo you want to proceed with the file reorganization? (y/n): ").lower() == 'y':
+        def timed(kind, move, source, target):
+            start = time.perf_counter()
             try:
-                reorganizer = FileSystemReorganizer(current_structure, proposed_structure)
-                operations = reorganizer.plan_reorganization()
-                
-                print("\nProposed Operations:")
-                for operation in operations:
-                    print(f"- {operation}")
-                
-                if input("\nConfirm execution of these operations? (y/n): ").lower() == 'y':
-                    print("\nExecuting reorganization...")
-                    executed_ops = reorganizer.execute_reorganization(dry_run=False)
-                    print("\nExecuted Operations:")
-                    for op in executed_ops:
-                        print(f"- {op}")
-                    print("\nReorganization completed successfully!")
+                return move(source, target)
+            finally:
+                elapsed = time.perf_counter() - start
+                with counts_lock:
+                    busy[kind] += elapsed
+        
+        def on_done(future):
+            slots.release()
+            metrics.track("moves_in_flight", -1)
+            if future.result():
+                with counts_lock:
+                    counts["success"] += 1
+        
+        total_moves = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.rename_workers) as rename_pool, \
+                ThreadPoolExecutor(self.copy_workers) as copy_pool:
+            for source, target, same_device in self._route_moves(plan.moves()):
+                total_moves += 1
+                if target is None:
+                    continue
+                slots.acquire()
+                metrics.track("moves_in_flight", 1)
+                if same_device:
+                    counts["rename"] += 1
+                    future = rename_pool.submit(timed, "rename", self._rename, source, target)
                 else:
-                    print("\nReorganization cancelled.")
-            except Exception as e:
-                logger.error(f"Error during reorganization: {e}")
-                print(f"\nError during reorganization: {e}")
-                return 1
+                    counts["copy"] += 1
+                    future = copy_pool.submit(timed, "copy", self._copy_move, source, target)
+                future.add_done_callback(on_done)
+        wall = time.perf_counter() - started
+        workers = {"rename": self.rename_workers or min(32, (os.cpu_count() or 1) + 4),
+                   "copy": self.copy_workers}
+        for kind in busy:
+            metrics.gauge(f"{kind}_worker_utilization",
+                          busy[kind] / (workers[kind] * wall) if wall > 0 else 0.0)
+        success_count = counts["success"]
+        logger.info(f"Routed {counts['rename']} moves to rename workers and "
+                    f"{counts['copy']} cross-device moves to copy workers")
+        
+        # Verify operations
+        if success_count < total_moves:
+            logger.warning(f"Only {success_count} out of {total_moves} move operations completed successfully")
         else:
-            print("\nProcess cancelled.")
-            
-    except Exception as e:
-        logger.error(f"Error in main execution: {e}")
-        print(f"\nError: {e}")
-        return 1
-    
-    return 0
+            logger.info("All move operations completed successfully")
+        
+        if journal:
+            journal.record("end", moved=success_count, total=total_moves)
+            journal.sync()
+        return self.executed_operations
 
 # Additional imports for report generation
 
 class ReportGenerator:
-    def __init__(self, current_structure: Dict, proposed_structure: Dict, file_patterns: Dict):
-        """Initialize report generator with structures and patterns."""
+    def __init__(self, current_structure: Dict, proposed_structure: Dict, file_patterns: Dict,
+                 file_table: Optional[FileTable] = None, tree_depth: Optional[int] = None,
+                 tree_fanout: Optional[int] = None, stats: Optional[ScanStatistics] = None,
+                 report_dir: str = "report"):
+        """Initialize report generator with structures and patterns.
+
+        ``tree_depth`` and ``tree_fanout`` truncate the rendered trees below
+        that depth and after that many entries per directory (None, the
+        default: no limit).
+        """
+        self.tree_depth = tree_depth
+        self.tree_fanout = tree_fanout
         self.current_structure = current_structure
+        self.file_table = file_table if file_table is not None else FileTable.from_structure(current_structure)
+        self.stats = stats if stats is not None else ScanStatistics.from_table(self.file_table)
         self.proposed_structure = proposed_structure
         self.file_patterns = file_patterns
-        self.report_dir = Path("report")
-        self.report_dir.mkdir(exist_ok=True)
+        self.report_dir = Path(report_dir)
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        self.report_path = self.report_dir / "analysis_report.md"
         
+    def iter_tree_lines(self, structure: Dict, prefix: str = "", is_last: bool = True,
+                        max_depth: Optional[int] = None, max_children: Optional[int] = None):
+        """Yield a tree-like representation of ``structure`` one line at a time.
+
+        Iterative, so deep trees cannot hit the recursion limit. Directories
+        deeper than ``max_depth`` collapse to "… N items" and only the first
+        ``max_children`` entries of a directory are listed, followed by
+        "… and N more".
+        """
+        stack = [(structure, prefix, is_last, 0)]
+        while stack:
+            item, prefix, is_last, depth = stack.pop()
+            connector = "└── " if is_last else "├── "
+            if isinstance(item, str):  # Truncation marker
+                yield prefix + connector + item + "\n"
+                continue
+            yield prefix + connector + item["name"] + "\n"
+            
+            contents = item.get("contents", []) if item["type"] == "directory" else []
+            if not contents:
+                continue
+            child_prefix = prefix + ("    " if is_last else "│   ")
+            if max_depth is not None and depth >= max_depth:
+                stack.append((f"… {len(contents)} items", child_prefix, True, depth + 1))
+                continue
+            
+            shown = contents if max_children is None else contents[:max_children]
+            children = [(child, child_prefix, False, depth + 1) for child in shown]
+            hidden = len(contents) - len(shown)
+            if hidden:
+                children.append((f"… and {hidden} more", child_prefix, True, depth + 1))
+            else:
+                children[-1] = (children[-1][0], child_prefix, True, depth + 1)
+            stack.extend(reversed(children))
+    
     def generate_tree_structure(self, structure: Dict, prefix="", is_last=True) -> str:
         """Generate tree-like structure representation."""
-        tree = ""
-        connector = "└── " if is_last else "├── "
-        tree += prefix + connector + structure["name"] + "\n"
-        
-        if structure["type"] == "directory":
-            new_prefix = prefix + ("    " if is_last else "│   ")
-            contents = structure.get("contents", [])
-            
-            for i, item in enumerate(contents):
-                tree += self.generate_tree_structure(
-                    item,
-                    new_prefix,
-                    i == len(contents) - 1
-                )
-        
-        return tree
+        return "".join(self.iter_tree_lines(structure, prefix, is_last,
+                                            self.tree_depth, self.tree_fanout))
     
     def create_size_distribution_chart(self):
         """Create and save size distribution chart."""
-        sizes = defaultdict(int)
-        
-        def collect_sizes(structure):
-            if structure["type"] == "file":
-                size = structure.get("size", 0)
-                if size < 1024 * 1024:  # < 1MB
-                    sizes["< 1MB"] += 1
-                elif size < 10 * 1024 * 1024:  # < 10MB
-                    sizes["1-10MB"] += 1
-                elif size < 100 * 1024 * 1024:  # < 100MB
-                    sizes["10-100MB"] += 1
-                else:
-                    sizes["> 100MB"] += 1
-            elif structure["type"] == "directory":
-                for item in structure.get("contents", []):
-                    collect_sizes(item)
+        sizes = self.stats.size_distribution()
         
-        collect_sizes(self.current_structure)
+        import matplotlib
+        matplotlib.use("Agg")  # Headless backend; the chart is only saved to a file
+        import matplotlib.pyplot as plt
         
         plt.figure(figsize=(10, 6))
         plt.bar(sizes.keys(), sizes.values())
@@ -644,31 +1945,22 @@ class ReportGenerator:
         plt.savefig(self.report_dir / "size_distribution.png")
         plt.close()
     
+    @metrics.stage("report")
     def generate_report(self) -> str:
-        """Generate comprehensive report."""
+        """Generate comprehensive report, save it to ``report_path`` and return it."""
         # Create size distribution chart
         self.create_size_distribution_chart()
         
-        # Generate tree structures
-        current_tree = self.generate_tree_structure(self.current_structure)
-        proposed_tree = self.generate_tree_structure(self.proposed_structure)
-        
-        # Calculate statistics
-        total_files = 0
-        total_size = 0
-        extension_stats = defaultdict(int)
+        # Tree structures are rendered lazily while the report is written
+        current_tree = self.iter_tree_lines(self.current_structure, max_depth=self.tree_depth,
+                                            max_children=self.tree_fanout)
+        proposed_tree = self.iter_tree_lines(self.proposed_structure, max_depth=self.tree_depth,
+                                             max_children=self.tree_fanout)
         
-        def collect_stats(structure):
-            nonlocal total_files, total_size
-            if structure["type"] == "file":
-                total_files += 1
-                total_size += structure.get("size", 0)
-                extension_stats[structure.get("extension", "no_ext")] += 1
-            elif structure["type"] == "directory":
-                for item in structure.get("contents", []):
-                    collect_stats(item)
-        
-        collect_stats(self.current_structure)
+        # Statistics were aggregated during the scan
+        total_files = self.stats.total_files
+        total_size = self.stats.total_size
+        extension_stats = self.stats.extensions
         
         # Create report template
         template_str = """# File System Analysis Report
@@ -685,30 +1977,42 @@ class ReportGenerator:
 
     ## Current Directory Structure
     ```
-    {{ current_tree }}
+    {% for line in current_tree %}{{ line }}{% endfor %}
     ```
 
     ## Proposed Directory Structure
     ```
-    {{ proposed_tree }}
+    {% for line in proposed_tree %}{{ line }}{% endfor %}
     ```
 
     ## Size Distribution
     ![Size Distribution](size_distribution.png)
 
     ## Organization Analysis
-    {% for category, files in file_patterns['size_categories'].items() %}
+    {% for category, rows in file_patterns['size_categories'].items() %}
     ### {{ category.title() }} Files:
-    {% for file in files[:5] %}
-    - {{ Path(file).name }}
+    {% for row in rows[:5] %}
+    - {{ file_names[row] }}
     {% endfor %}
-    {% if files|length > 5 %}
-    ... and {{ files|length - 5 }} more
+    {% if rows|length > 5 %}
+    ... and {{ rows|length - 5 }} more
     {% endif %}
     {% endfor %}
+
+    ## Name Patterns
+    - Files with a date in the name: {{ file_patterns['date_patterns'].values()|sum }}
+    {% for month, count in (file_patterns['date_patterns'].items()|list)[:12] %}
+    - {{ month }}: {{ count }} files
+    {% endfor %}
+    - Versioned series: {{ file_patterns['version_patterns']|length }}
+    {% for base, count in (file_patterns['version_patterns'].items()|list)[:10] %}
+    - {{ base }}: {{ count }} versions
+    {% endfor %}
     """
         
         # Render template
+        import humanize
+        from jinja2 import Template
         template = Template(template_str)
         report = template.render(
             datetime=datetime,
@@ -719,46 +2023,548 @@ class ReportGenerator:
             current_tree=current_tree,
             proposed_tree=proposed_tree,
             file_patterns=self.file_patterns,
+            file_names=self.file_table.names,
             Path=Path
         )
         
-        # Save report with UTF-8 encoding
-        report_path = self.report_dir / "analysis_report.md"
-        try:
-            with open(report_path, "w", encoding='utf-8') as f:
-                f.write(report)
-        except Exception as e:
-            logger.error(f"Error writing report: {e}")
-            # Fallback to ASCII-only output if UTF-8 fails
-            report = report.encode('ascii', 'replace').decode('ascii')
-            with open(report_path, "w") as f:
-                f.write(report)
+        # Save report with UTF-8 encoding; unencodable characters are replaced
+        with open(self.report_path, "w", encoding='utf-8', errors='replace') as f:
+            f.write(report)
         
         return report
 
+class OrganizerService:
+    """Non-interactive API over the scan, plan, apply and report steps.
+
+    One service keeps the scan index, the LLM client with its response cache
+    and the compiled skip matcher open across calls, so organizing many
+    directories from one process (or the ``serve`` daemon) pays that setup
+    once. The state of the last scan and proposal is kept per root. Every
+    method returns a JSON-serializable dict.
+    """
+
+    COMMANDS = ("scan", "plan", "apply", "report", "organize", "resume", "undo", "metrics")
+
+    def __init__(self, api_key: Optional[str] = None, scan_workers: Optional[int] = None,
+                 scan_index: Optional[str] = None, skip_globs: Optional[List[str]] = None,
+                 llm_base_url: Optional[str] = None, llm_cache: Optional[str] = "llm_cache.db",
+                 llm_concurrency: int = 4, shard_tokens: Optional[int] = None,
+                 cluster_mode: str = "off", move_workers: Optional[int] = None,
+                 copy_workers: int = 2, journal_dir: str = "journals",
+                 report_dir: str = "report", tree_depth: Optional[int] = None,
+                 tree_fanout: Optional[int] = None):
+        self.api_key = api_key
+        self.scan_workers = scan_workers
+        self.scan_index = ScanIndex(scan_index) if scan_index else None
+        self.skip_globs = skip_globs or []
+        self.llm_base_url = llm_base_url
+        self.llm_cache = LLMResponseCache(llm_cache) if llm_cache else None
+        self.llm_concurrency = llm_concurrency
+        self.shard_tokens = shard_tokens
+        self.cluster_mode = cluster_mode
+        self.move_workers = move_workers
+        self.copy_workers = copy_workers
+        self.journal_dir = journal_dir
+        self.report_dir = report_dir
+        self.tree_depth = tree_depth
+        self.tree_fanout = tree_fanout
+        self._llm_client: Optional[LLMClient] = None
+        self._skip_matcher: Optional[SkipMatcher] = None
+        self._runs: Dict[str, Dict] = {}
+
+    @property
+    def llm_client(self) -> LLMClient:
+        """The shared LLM client, created on first use."""
+        if self._llm_client is None:
+            self._llm_client = LLMClient(self.api_key, base_url=self.llm_base_url,
+                                         cache=self.llm_cache,
+                                         max_concurrency=self.llm_concurrency)
+        return self._llm_client
+
+    def _run(self, root: str) -> Dict:
+        key = str(Path(root).resolve())
+        return self._runs.setdefault(key, {"root": key})
+
+    def scan(self, root: str) -> Dict:
+        """Scan ``root`` and return scan timings plus file statistics."""
+        run = self._run(root)
+        run.clear()
+        run["root"] = str(Path(root).resolve())
+        if not os.path.isdir(run["root"]):
+            raise NotADirectoryError(f"Not a directory: {root}")
+        scanner = FileSystemScanner(run["root"], scan_workers=self.scan_workers,
+                                    scan_index=self.scan_index, skip_globs=self.skip_globs,
+                                    skip_matcher=self._skip_matcher)
+        self._skip_matcher = scanner.skip_matcher
+        run["structure"] = scanner.scan_directory()
+        run["scanner"] = scanner
+        stats = scanner.stats
+        return {
+            "root": run["root"],
+            **scanner.scan_stats,
+            "organizable_files": stats.total_files,
+            "total_size": stats.total_size,
+            "extensions": dict(stats.extensions.most_common()),
+            "size_distribution": stats.size_distribution()
+        }
+
+    def _propose(self, root: str) -> Dict:
+        """Scan if needed, then ask for (or reuse) a proposal for ``root``."""
+        run = self._run(root)
+        if "scanner" not in run:
+            self.scan(root)
+        if "proposal" not in run:
+            scanner = run["scanner"]
+            llm_client = None if self.cluster_mode == "local" else self.llm_client
+            organizer = AIFileOrganizer(run["structure"], llm_client, scanner.file_table,
+                                        shard_tokens=self.shard_tokens,
+                                        cluster_mode=self.cluster_mode, stats=scanner.stats)
+            run["proposal"] = organizer.analyze_structure()
+            run["organizer"] = organizer
+        return run
+
+    def plan(self, root: str, output: Optional[str] = None) -> Dict:
+        """Plan the reorganization of ``root``; optionally save it as a plan file."""
+        run = self._propose(root)
+        scanner = run["scanner"]
+        reorganizer = FileSystemReorganizer(run["structure"], run["proposal"], scanner.file_table,
+                                            rename_workers=self.move_workers,
+                                            copy_workers=self.copy_workers)
+        plan = reorganizer.plan_reorganization()
+        run["reorganizer"] = reorganizer
+        if output:
+            plan.save(output)
+        return {
+            "root": run["root"],
+            "operations": len(plan),
+            "directories": len(plan.target_directories()),
+            "moves": sum(1 for _ in plan.moves()),
+            "plan": output
+        }
+
+    def apply(self, root: Optional[str] = None, plan: Optional[str] = None,
+              dry_run: bool = False) -> Dict:
+        """Execute a saved ``plan`` file, or plan and execute ``root``, under a journal."""
+        if plan:
+            reorganizer = FileSystemReorganizer.from_plan_file(
+                plan, rename_workers=self.move_workers, copy_workers=self.copy_workers
+            )
+        elif root:
+            run = self._run(root)
+            if "reorganizer" not in run:
+                self.plan(root)
+            reorganizer = run["reorganizer"]
+        else:
+            raise ValueError("apply needs a root directory or a plan file")
+
+        if dry_run:
+            return {"dry_run": True, "operations": reorganizer.execute_reorganization(dry_run=True)}
+
+        journal = OperationJournal(self.journal_dir)
+        plan_path = str(journal.path.with_suffix(".plan.jsonl"))
+        if plan:
+            shutil.copyfile(plan, plan_path)
+        else:
+            reorganizer.operations.save(plan_path)
+        journal.record("begin", plan=plan_path, root=root or "")
+        journal.sync()
+        try:
+            executed = reorganizer.execute_reorganization(dry_run=False, journal=journal)
+        finally:
+            journal.close()
+        if root:
+            # The tree has changed; the next call for this root scans again
+            self._runs.pop(str(Path(root).resolve()), None)
+        return {"operation_id": journal.operation_id, "executed": len(executed), "plan": plan_path}
+
+    def report(self, root: str) -> Dict:
+        """Write the Markdown analysis report for ``root`` and return its path."""
+        run = self._propose(root)
+        scanner = run["scanner"]
+        generator = ReportGenerator(run["structure"], run["proposal"],
+                                    run["organizer"].file_patterns, scanner.file_table,
+                                    tree_depth=self.tree_depth, tree_fanout=self.tree_fanout,
+                                    stats=scanner.stats, report_dir=self.report_dir)
+        generator.generate_report()
+        return {"root": run["root"], "report": str(generator.report_path.resolve())}
+
+    def organize(self, root: str, dry_run: bool = False, report: bool = False) -> Dict:
+        """Scan, propose, plan and apply ``root`` in one call."""
+        result = {"scan": self.scan(root), "plan": self.plan(root)}
+        if report:
+            result["report"] = self.report(root)["report"]
+        result["apply"] = self.apply(root, dry_run=dry_run)
+        return result
+
+    def resume(self, operation_id: str) -> Dict:
+        """Finish an interrupted operation from its journal."""
+        reorganizer = FileSystemReorganizer.resume(
+            self.journal_dir, operation_id,
+            rename_workers=self.move_workers, copy_workers=self.copy_workers
+        )
+        journal = OperationJournal(self.journal_dir, operation_id)
+        try:
+            executed = reorganizer.execute_reorganization(dry_run=False, journal=journal)
+        finally:
+            journal.close()
+        return {"operation_id": operation_id, "executed": len(executed)}
+
+    def undo(self, operation_id: str) -> Dict:
+        """Move the files of a journaled operation back."""
+        restored = FileSystemReorganizer(None, None).undo_reorganization(self.journal_dir,
+                                                                         operation_id)
+        return {"operation_id": operation_id, "reverted": len(restored)}
+
+    def metrics(self) -> Dict:
+        """Stage timings and counters accumulated since the process started."""
+        return metrics.summary()
+
+    def handle(self, request: Dict) -> Dict:
+        """Dispatch one ``{"command": ..., **arguments}`` request."""
+        arguments = dict(request)
+        command = arguments.pop("command", None)
+        arguments.pop("id", None)
+        if command not in self.COMMANDS:
+            raise ValueError(f"Unknown command: {command!r}")
+        return getattr(self, command)(**arguments)
+
+    def respond(self, line: str) -> str:
+        """Answer one JSON request line with one JSON response line."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            request_id = request.get("id")
+            response = {"ok": True, "result": self.handle(request)}
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        if request_id is not None:
+            response["id"] = request_id
+        return json.dumps(response, ensure_ascii=False) + "\n"
+
+    def close(self) -> None:
+        if self._llm_client is not None:
+            self._llm_client.close()  # Also closes the response cache
+            self._llm_client = None
+        elif self.llm_cache is not None:
+            self.llm_cache.close()
+        if self.scan_index is not None:
+            self.scan_index.close()
+        self._runs.clear()
+
+
+def serve(service: OrganizerService, socket_path: Optional[str] = None) -> None:
+    """Answer JSON-lines requests until stdin closes, or forever on a Unix socket.
+
+    Requests are handled one at a time, so the shared scan index and LLM
+    cache are never used from two requests at once.
+    """
+    if socket_path is None:
+        for line in sys.stdin:
+            if line.strip():
+                sys.stdout.write(service.respond(line))
+                sys.stdout.flush()
+        return
+
+    import signal
+    import socketserver
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write(service.respond(line.decode("utf-8")).encode("utf-8"))
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    # Exit through the finally blocks on SIGTERM so the socket and caches are closed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with socketserver.UnixStreamServer(socket_path, RequestHandler) as server:
+        logger.info(f"Serving requests on {socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+
+def send_request(socket_path: str, request: Dict) -> Dict:
+    """Send one request to a running ``serve --socket`` daemon and return its response."""
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("r", encoding="utf-8") as reader:
+            return json.loads(reader.readline())
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="AI-powered file organization system")
+    parser.add_argument(
+        "--scan-workers", type=int, default=None,
+        help="Number of threads used to list directories (default: CPU count + 4, max 32)"
+    )
+    parser.add_argument(
+        "--scan-index", metavar="PATH", default=None,
+        help="SQLite scan index; unchanged directories are not re-listed on later runs"
+    )
+    parser.add_argument(
+        "--skip-glob", action="append", default=[], metavar="GLOB",
+        help="gitignore-style glob to skip while scanning; may be repeated"
+    )
+    parser.add_argument(
+        "--llm-base-url", default=None,
+        help="OpenAI-compatible endpoint (default: $LLM_BASE_URL or the NVIDIA API)"
+    )
+    parser.add_argument(
+        "--llm-cache", metavar="PATH", default="llm_cache.db",
+        help="SQLite cache of LLM responses; pass an empty string to disable (default: llm_cache.db)"
+    )
+    parser.add_argument(
+        "--llm-concurrency", type=int, default=4,
+        help="Maximum concurrent LLM requests (default: 4)"
+    )
+    parser.add_argument(
+        "--shard-tokens", type=int, default=None, metavar="N",
+        help="Classify the tree in subtree shards of about N prompt tokens, concurrently, "
+             "and merge the proposals (default: one summary prompt)"
+    )
+    parser.add_argument(
+        "--cluster", choices=["off", "local", "named"], default="off",
+        help="Group files offline by name similarity instead of asking the LLM for a plan; "
+             "'named' still asks the LLM to name the groups (default: off)"
+    )
+    parser.add_argument(
+        "--tree-depth", type=int, default=0, metavar="N",
+        help="Collapse directories below depth N in the report trees (default: 0, no limit)"
+    )
+    parser.add_argument(
+        "--tree-fanout", type=int, default=0, metavar="N",
+        help="List at most N entries per directory in the report trees (default: 0, no limit)"
+    )
+    parser.add_argument(
+        "--move-workers", type=int, default=None,
+        help="Threads for same-device renames (default: CPU count + 4, max 32)"
+    )
+    parser.add_argument(
+        "--copy-workers", type=int, default=2,
+        help="Threads for cross-device copies (default: 2)"
+    )
+    parser.add_argument(
+        "--save-plan", metavar="PATH", default=None,
+        help="Write the planned operations to a JSONL plan file"
+    )
+    parser.add_argument(
+        "--execute-plan", metavar="PATH", default=None,
+        help="Execute a previously saved plan file and exit (no scan or LLM call)"
+    )
+    parser.add_argument(
+        "--journal-dir", default="journals",
+        help="Directory for operation journals and their plans (default: journals)"
+    )
+    parser.add_argument(
+        "--resume", metavar="OPERATION_ID", default=None,
+        help="Finish an interrupted reorganization, skipping moves already done"
+    )
+    parser.add_argument(
+        "--undo", metavar="OPERATION_ID", default=None,
+        help="Move the files of a journaled reorganization back, newest first"
+    )
+    parser.add_argument(
+        "--daemon", metavar="SOCKET", default=None,
+        help="Send the command to a daemon started with 'serve --socket SOCKET' instead of "
+             "running it in this process"
+    )
+    parser.add_argument(
+        "--metrics-json", metavar="PATH", default=None,
+        help="Write stage timings, counters and gauges of the run as JSON"
+    )
+    parser.add_argument(
+        "--metrics-prom", metavar="PATH", default=None,
+        help="Write the same metrics in the Prometheus text format, e.g. for "
+             "node_exporter's textfile collector"
+    )
+    parser.add_argument(
+        "--profile", action="append", default=[], metavar="STAGE",
+        help="Run a stage (scan, patterns, propose, report, plan, execute, undo or all) "
+             "under cProfile and save the stats to --profile-dir; may be repeated"
+    )
+    parser.add_argument(
+        "--trace-memory", action="append", default=[], metavar="STAGE",
+        help="Record the peak and top allocations of a stage with tracemalloc; may be repeated"
+    )
+    parser.add_argument(
+        "--profile-dir", default="profiles",
+        help="Directory for --profile output (default: profiles)"
+    )
+    
+    commands = parser.add_subparsers(
+        dest="command", metavar="COMMAND",
+        help="Run one step without prompts and print the result as JSON "
+             "(default: interactive session)"
+    )
+    scan = commands.add_parser("scan", help="Scan a directory and print file statistics")
+    scan.add_argument("root")
+    scan.set_defaults(arguments=("root",))
+    plan = commands.add_parser("plan", help="Propose and plan a reorganization")
+    plan.add_argument("root")
+    plan.add_argument("--output", metavar="PATH", default=None, help="Save the plan as a JSONL plan file")
+    plan.set_defaults(arguments=("root", "output"))
+    apply = commands.add_parser("apply", help="Plan and execute a directory, or execute a saved plan")
+    apply.add_argument("root", nargs="?", default=None)
+    apply.add_argument("--plan", metavar="PATH", default=None, help="Plan file to execute")
+    apply.add_argument("--dry-run", action="store_true", help="List the operations without moving files")
+    apply.set_defaults(arguments=("root", "plan", "dry_run"))
+    report = commands.add_parser("report", help="Write the analysis report for a directory")
+    report.add_argument("root")
+    report.set_defaults(arguments=("root",))
+    organize = commands.add_parser("organize", help="Scan, plan and apply a directory in one step")
+    organize.add_argument("root")
+    organize.add_argument("--dry-run", action="store_true", help="List the operations without moving files")
+    organize.add_argument("--report", action="store_true", help="Also write the analysis report")
+    organize.set_defaults(arguments=("root", "dry_run", "report"))
+    serve_parser = commands.add_parser(
+        "serve", help="Answer JSON-lines requests on stdin, or on a Unix socket, "
+                      "keeping the scan index, LLM cache and matchers warm"
+    )
+    serve_parser.add_argument("--socket", metavar="PATH", default=None,
+                              help="Listen on this Unix socket instead of stdin/stdout")
+    metrics_parser = commands.add_parser(
+        "metrics", help="Print the stage timings and counters of a daemon (use with --daemon)"
+    )
+    metrics_parser.set_defaults(arguments=())
+    return parser.parse_args(argv)
+
+def service_from_args(args: argparse.Namespace) -> OrganizerService:
+    """Build an OrganizerService from the command line options."""
+    return OrganizerService(
+        scan_workers=args.scan_workers, scan_index=args.scan_index, skip_globs=args.skip_glob,
+        llm_base_url=args.llm_base_url, llm_cache=args.llm_cache,
+        llm_concurrency=args.llm_concurrency, shard_tokens=args.shard_tokens,
+        cluster_mode=args.cluster, move_workers=args.move_workers, copy_workers=args.copy_workers,
+        journal_dir=args.journal_dir, tree_depth=args.tree_depth or None,
+        tree_fanout=args.tree_fanout or None
+    )
+
+def run_command(args: argparse.Namespace) -> int:
+    """Run one non-interactive command, printing the JSON response."""
+    if args.command == "serve":
+        service = service_from_args(args)
+        try:
+            serve(service, args.socket)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
+        return 0
+    
+    request = {"command": args.command}
+    for name in args.arguments:
+        value = getattr(args, name)
+        # Paths are resolved here since a daemon may run in another directory
+        request[name] = os.path.abspath(value) if isinstance(value, str) else value
+    if args.daemon:
+        response = send_request(args.daemon, request)
+    else:
+        service = service_from_args(args)
+        try:
+            response = json.loads(service.respond(json.dumps(request)))
+        finally:
+            service.close()
+    print(json.dumps(response, indent=2, ensure_ascii=False))
+    return 0 if response["ok"] else 1
+
+def write_metrics(args: argparse.Namespace) -> None:
+    """Write the run's metrics where the command line asked for them."""
+    try:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
+    except OSError as e:
+        logger.error(f"Could not write metrics: {e}")
+
 def main():
     """Main function to run the file organization system."""
+    args = parse_args()
+    metrics.namespace = "ai_file_manager"
+    metrics.profile.update(args.profile)
+    metrics.trace_memory.update(args.trace_memory)
+    metrics.profile_dir = Path(args.profile_dir)
+    try:
+        return run_session(args)
+    finally:
+        write_metrics(args)
+
+def run_session(args: argparse.Namespace) -> int:
+    """Run the command, or the interactive session, selected by ``args``."""
+    if args.command:
+        return run_command(args)
+    
+    if args.undo:
+        restored = FileSystemReorganizer(None, None).undo_reorganization(args.journal_dir, args.undo)
+        print(f"\nUndo of {args.undo} finished: {len(restored)} operations reverted")
+        return 0
+    
+    if args.resume:
+        reorganizer = FileSystemReorganizer.resume(
+            args.journal_dir, args.resume,
+            rename_workers=args.move_workers, copy_workers=args.copy_workers
+        )
+        journal = OperationJournal(args.journal_dir, args.resume)
+        try:
+            executed_ops = reorganizer.execute_reorganization(dry_run=False, journal=journal)
+        finally:
+            journal.close()
+        print(f"\nResumed {args.resume}: executed {len(executed_ops)} remaining operations")
+        return 0
+    
+    if args.execute_plan:
+        reorganizer = FileSystemReorganizer.from_plan_file(
+            args.execute_plan, rename_workers=args.move_workers, copy_workers=args.copy_workers
+        )
+        executed_ops = reorganizer.execute_reorganization(dry_run=False)
+        print(f"\nExecuted {len(executed_ops)} operations from {args.execute_plan}")
+        return 0
+    
     try:
         # Get user inputs
         root_dir = input("Enter the directory path to organize: ")
         api_key = input("Enter your NVIDIA API key (press Enter to use environment variable): ") or None
         
         # Initialize components
-        scanner = FileSystemScanner(root_dir)
-        llm_client = LLMClient(api_key)
+        scan_index = ScanIndex(args.scan_index) if args.scan_index else None
+        scanner = FileSystemScanner(root_dir, scan_workers=args.scan_workers, scan_index=scan_index,
+                                    skip_globs=args.skip_glob)
+        llm_cache = LLMResponseCache(args.llm_cache) if args.llm_cache else None
+        llm_client = LLMClient(api_key, base_url=args.llm_base_url, cache=llm_cache,
+                               max_concurrency=args.llm_concurrency)
         
         # Scan directory
         print("\nScanning directory structure...")
         current_structure = scanner.scan_directory()
+        stats = scanner.scan_stats
+        print(f"Scanned {stats['files']} files in {stats['seconds']:.2f}s "
+              f"({stats['files_per_second']:,.0f} files/sec, "
+              f"{stats['directories_rescanned']}/{stats['directories']} directories re-listed)")
         
         # Analyze and get proposal
         print("\nAnalyzing files and generating organization proposal...")
-        organizer = AIFileOrganizer(current_structure, llm_client)
+        organizer = AIFileOrganizer(current_structure, llm_client, scanner.file_table,
+                                    shard_tokens=args.shard_tokens, cluster_mode=args.cluster,
+                                    stats=scanner.stats)
         proposed_structure = organizer.analyze_structure()
+        if llm_cache is not None:
+            print(f"LLM requests: {llm_client.requests_sent} sent, {llm_cache.hits} answered from cache")
+        llm_client.close()
         
         # Generate report
         print("\nGenerating comprehensive report...")
-        report_generator = ReportGenerator(current_structure, proposed_structure, organizer.file_patterns)
+        report_generator = ReportGenerator(current_structure, proposed_structure, organizer.file_patterns,
+                                           scanner.file_table, tree_depth=args.tree_depth or None,
+                                           tree_fanout=args.tree_fanout or None, stats=scanner.stats)
         report = report_generator.generate_report()
         
         print(f"\nReport generated successfully! Check the 'report' directory for details.")
@@ -766,8 +2572,13 @@ def main():
         # Ask for confirmation
         print("\nPlease review the report in the 'report' directory.")
         if input("\nDo you want to proceed with the file reorganization? (y/n): ").lower() == 'y':
-            reorganizer = FileSystemReorganizer(current_structure, proposed_structure)
+            reorganizer = FileSystemReorganizer(current_structure, proposed_structure, scanner.file_table,
+                                                rename_workers=args.move_workers,
+                                                copy_workers=args.copy_workers)
             operations = reorganizer.plan_reorganization()
+            if args.save_plan:
+                operations.save(args.save_plan)
+                print(f"\nPlan saved to {args.save_plan}")
             
             print("\nProposed Operations:")
             for operation in operations:
@@ -775,11 +2586,21 @@ def main():
             
             if input("\nConfirm execution of these operations? (y/n): ").lower() == 'y':
                 print("\nExecuting reorganization...")
-                executed_ops = reorganizer.execute_reorganization(dry_run=False)
+                journal = OperationJournal(args.journal_dir)
+                plan_path = str(journal.path.with_suffix(".plan.jsonl"))
+                operations.save(plan_path)
+                journal.record("begin", plan=plan_path, root=str(scanner.root_directory))
+                journal.sync()
+                try:
+                    executed_ops = reorganizer.execute_reorganization(dry_run=False, journal=journal)
+                finally:
+                    journal.close()
                 print("\nExecuted Operations:")
                 for op in executed_ops:
                     print(f"- {op}")
                 print("\nReorganization completed successfully!")
+                print(f"Operation ID: {journal.operation_id} "
+                      f"(use --resume or --undo with this ID)")
             else:
                 print("\nReorganization cancelled.")
         else:
@@ -0,0 +1,57 @@
+"""Time extension → category lookups: linear mapping scan vs CategoryIndex.
+
+Usage: python benchmarks/category_lookup.py [--lookups N]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai import CategoryIndex  # noqa: E402
+
+CONFIG = Path(__file__).resolve().parent.parent / "file_organizer_config.yaml"
+NAMES = [
+    "report.pdf", "holiday.JPG", "backup.tar.gz", "setup.exe", "notes.txt",
+    "clip.mkv", "main.py", "unknown.bin", "README", "data.csv",
+]
+
+
+def linear_category(mapping, name: str) -> str:
+    """The lookup SmartFileOrganizer.get_file_category used to do."""
+    ext = Path(name).suffix.lower()
+    for category, extensions in mapping.items():
+        if ext in extensions:
+            return category
+    return "others"
+
+
+def timed(label: str, lookup, names) -> float:
+    start = time.perf_counter()
+    for name in names:
+        lookup(name)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16}{elapsed:8.2f}s  {len(names) / elapsed / 1e6:6.2f}M lookups/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=10_000_000)
+    args = parser.parse_args()
+
+    mapping = yaml.safe_load(CONFIG.read_text())["category_mapping"]
+    index = CategoryIndex(mapping)
+    names = NAMES * (args.lookups // len(NAMES))
+
+    print(f"lookups:        {len(names):,}")
+    linear = timed("linear scan:", lambda name: linear_category(mapping, name), names)
+    indexed = timed("CategoryIndex:", index.classify_name, names)
+    print(f"speedup:        {linear / indexed:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare memory per scanned file: nested dict structure vs FileTable.
+
+Usage: python benchmarks/file_table_memory.py [--files N] [--per-dir N]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai import FileTable  # noqa: E402
+
+EXTENSIONS = [".pdf", ".mkv", ".zip", ".jpg", ".docx", ".mp4", ".iso", ".py"]
+
+
+def synthetic_rows(num_files: int, files_per_dir: int):
+    """Yield (directory, name, size) rows for a deterministic synthetic tree."""
+    root = os.path.join(os.sep, "mnt", "share", "ingest")
+    for i in range(num_files):
+        dir_index = i // files_per_dir
+        directory = os.path.join(root, f"batch_{dir_index // 100:04d}", f"dir_{dir_index:06d}")
+        name = f"IMG_{i:08d}_v{i % 7}{EXTENSIONS[i % len(EXTENSIONS)]}"
+        yield directory, name, 3 * 1024 * 1024 + i
+
+
+def build_dicts(rows):
+    """Build the scanner's per-file dicts grouped per directory, as the tree holds them."""
+    directories = {}
+    for directory, name, size in rows:
+        directories.setdefault(directory, []).append({
+            "type": "file",
+            "name": name,
+            "path": os.path.join(directory, name),
+            "size": size,
+            "extension": os.path.splitext(name)[1].lower()
+        })
+    return directories
+
+
+def build_table(rows):
+    table = FileTable()
+    for directory, name, size in rows:
+        table.add_file(table.add_directory(directory), name, size)
+    return table
+
+
+def measure(builder, rows) -> int:
+    tracemalloc.start()
+    result = builder(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200_000)
+    parser.add_argument("--per-dir", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = list(synthetic_rows(args.files, args.per_dir))
+    dict_bytes = measure(build_dicts, rows)
+    table_bytes = measure(build_table, rows)
+
+    print(f"files:            {args.files:,}")
+    print(f"dict tree:        {dict_bytes / args.files:8.1f} bytes/file")
+    print(f"FileTable:        {table_bytes / args.files:8.1f} bytes/file")
+    print(f"reduction:        {dict_bytes / max(table_bytes, 1):8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Cold-start import budget for the organizer entry points.
+
+Imports each module in a fresh interpreter with ``-X importtime``, keeps the
+best of several runs and exits non-zero when a module exceeds its budget or
+eagerly loads a dependency that should only load with its stage.
+
+Usage: python benchmarks/import_time.py [--runs N] [--scale F]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# module: (directory to import from, budget in milliseconds, modules that must stay unloaded)
+BUDGETS = {
+    "ai": (ROOT, 200, ["matplotlib", "jinja2", "humanize", "openai", "asyncio"]),
+    "file_sort": (ROOT / "new_fm", 120, ["yaml", "rich.progress", "rich.table", "rich.prompt"]),
+}
+
+
+def measure(module: str, directory: Path):
+    """Return (cumulative microseconds, [(microseconds, name)] of top-level imports, loaded lazies)."""
+    code = f"import sys, {module}; print(' '.join(sorted(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=directory, capture_output=True, text=True, check=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    total, children = 0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        if name.strip() == module and not name.startswith("  "):
+            total = int(cumulative)
+        elif name.startswith("   ") and not name.startswith("    "):
+            children.append((int(cumulative), name.strip()))
+    return total, sorted(children, reverse=True), set(result.stdout.split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="best of N fresh interpreters (default: 5)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="multiply every budget, e.g. 2.0 on slow CI machines")
+    args = parser.parse_args()
+
+    failed = False
+    for module, (directory, budget_ms, lazy) in BUDGETS.items():
+        runs = [measure(module, directory) for _ in range(args.runs)]
+        total, children, loaded = min(runs, key=lambda run: run[0])
+        elapsed_ms = total / 1000
+        limit = budget_ms * args.scale
+        eager = [name for name in lazy if name in loaded]
+        ok = elapsed_ms <= limit and not eager
+        failed |= not ok
+        print(f"{module:<10} {elapsed_ms:7.1f} ms (budget {limit:.0f} ms)  {'OK' if ok else 'FAIL'}")
+        for micros, name in children[:5]:
+            print(f"    {micros / 1000:7.1f} ms  {name}")
+        if eager:
+            print(f"    loaded eagerly: {', '.join(eager)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
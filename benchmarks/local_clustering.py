@@ -0,0 +1,62 @@
+"""Time LocalClusterer on a synthetic table of realistic and random names.
+
+Usage: python benchmarks/local_clustering.py [--files N] [--unique]
+"""
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai import FileTable, LocalClusterer  # noqa: E402
+
+WORDS = ["invoice", "report", "holiday", "IMG", "DSC", "backup", "setup", "lecture",
+         "song", "movie", "scan", "contract", "thesis", "budget", "draft"]
+EXTENSIONS = [".pdf", ".jpg", ".mp4", ".zip", ".docx", ".py", ".mkv", ".txt", ".png", ".iso"]
+
+
+def synthetic_table(num_files: int, unique: bool) -> FileTable:
+    """Names with counters, dates and versions; ``unique`` makes every name distinct."""
+    rng = random.Random(0)
+    table = FileTable()
+    root = table.add_directory("/data")
+    dirs = [table.add_directory(f"/data/dir_{i:04d}", root) for i in range(max(1, num_files // 500))]
+    for i in range(num_files):
+        word, ext = rng.choice(WORDS), rng.choice(EXTENSIONS)
+        if unique:
+            name = "".join(rng.choices(string.ascii_lowercase, k=12)) + ext
+        elif i % 3 == 0:
+            name = f"{word}_{i:06d}{ext}"
+        elif i % 3 == 1:
+            name = f"{word}_2023-{1 + i % 12:02d}-{1 + i % 28:02d}{ext}"
+        else:
+            name = f"{word}_v{i % 5}.{i % 3}{ext}"
+        table.add_file(dirs[i % len(dirs)], name, 4 * 1024 * 1024)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--unique", action="store_true", help="every file name distinct (worst case)")
+    args = parser.parse_args()
+
+    table = synthetic_table(args.files, args.unique)
+    start = time.perf_counter()
+    clusterer = LocalClusterer(table)
+    structure = clusterer.propose()
+    elapsed = time.perf_counter() - start
+
+    print(f"files:            {clusterer.stats['files']:,}")
+    print(f"unique names:     {clusterer.stats['unique_names']:,}")
+    print(f"clusters:         {clusterer.stats['clusters']}")
+    print(f"categories:       {', '.join(item['name'] for item in structure['contents'])}")
+    print(f"cluster time:     {clusterer.stats['seconds']:8.2f}s")
+    print(f"total time:       {elapsed:8.2f}s (including the proposed structure)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Time every stage of both pipelines on a synthetic tree and check regressions.
+
+ai.py stages: FileSystemScanner.scan_directory, AIFileOrganizer._extract_patterns,
+ReportGenerator.generate_report, FileSystemReorganizer.plan_reorganization and
+execute_reorganization. The proposal is the offline basic structure, so no
+LLM is called. file_sort.py stages: SmartFileOrganizer.scan_directory and
+organize_files, on a second copy of the tree generated from the same seed.
+
+Results are written as JSON. Each stage gets seconds and microseconds per
+file. With --thresholds, a stage fails if it exceeds its max_us_per_file
+(per layout if the file says so). With --baseline, it fails if it is more
+than --tolerance times slower than in an earlier result. Any failure exits
+with status 1.
+
+Usage: python benchmarks/pipeline_stages.py [--files N] [--layout NAME] [--mix MIX]
+           [--workdir DIR] [--output PATH] [--thresholds PATH] [--baseline PATH]
+"""
+import argparse
+import json
+import logging
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS.parent))
+sys.path.insert(0, str(BENCHMARKS.parent / "new_fm"))
+
+import ai  # noqa: E402
+import file_sort  # noqa: E402
+from synthetic_tree import LAYOUTS, generate  # noqa: E402
+
+DEFAULT_THRESHOLDS = BENCHMARKS / "thresholds.json"
+
+
+class StageTimer:
+    """Collects wall time per named stage."""
+
+    def __init__(self, files: int):
+        self.files = files
+        self.stages = {}
+
+    def __call__(self, name: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        self.stages[name] = {
+            "seconds": round(seconds, 4),
+            "us_per_file": round(seconds * 1e6 / max(self.files, 1), 2)
+        }
+        print(f"  {name:<34}{seconds:9.2f}s {self.stages[name]['us_per_file']:10.1f} us/file",
+              file=sys.stderr)
+        return result
+
+
+def run_ai(root: Path, work: Path, timer: StageTimer) -> None:
+    scanner = ai.FileSystemScanner(str(root))
+    structure = timer("ai.scan_directory", scanner.scan_directory)
+    organizer = ai.AIFileOrganizer(structure, None, scanner.file_table, stats=scanner.stats)
+    organizer.file_patterns = timer("ai.extract_patterns", organizer._extract_patterns)
+    proposal = organizer._generate_basic_structure()
+    generator = ai.ReportGenerator(structure, proposal, organizer.file_patterns, scanner.file_table,
+                                   stats=scanner.stats, report_dir=str(work / "report"))
+    timer("ai.generate_report", generator.generate_report)
+    reorganizer = ai.FileSystemReorganizer(structure, proposal, scanner.file_table)
+    timer("ai.plan_reorganization", reorganizer.plan_reorganization)
+    journal = ai.OperationJournal(str(work / "ai_journals"))
+    try:
+        timer("ai.execute_reorganization", reorganizer.execute_reorganization,
+              dry_run=False, journal=journal)
+    finally:
+        journal.close()
+
+
+def run_file_sort(root: Path, work: Path, timer: StageTimer) -> None:
+    import yaml
+    config_path = work / "file_sort_config.yaml"
+    config_path.write_text(yaml.safe_dump({
+        "scan_index": "", "max_depth": 64, "journal_dir": str(work / "file_sort_journals")
+    }))
+    organizer = file_sort.SmartFileOrganizer(config_path, console=file_sort.Console(quiet=True))
+    timer("file_sort.scan_directory", lambda: sum(1 for _ in organizer.scan_directory(root)))
+    timer("file_sort.organize_files", organizer.organize_files, root)
+
+
+def check(result: dict, thresholds: dict, baseline: dict, tolerance: float) -> list:
+    """Return a message for every stage over its threshold or slower than the baseline."""
+    failures = []
+    limits = {**thresholds.get("stages", {}),
+              **thresholds.get("layouts", {}).get(result["layout"], {})}
+    for name, stage in result["stages"].items():
+        limit = limits.get(name, {}).get("max_us_per_file")
+        if limit is not None and stage["us_per_file"] > limit:
+            failures.append(f"{name}: {stage['us_per_file']} us/file > threshold {limit}")
+        previous = baseline.get("stages", {}).get(name)
+        if previous and stage["us_per_file"] > previous["us_per_file"] * tolerance:
+            failures.append(f"{name}: {stage['us_per_file']} us/file > {tolerance}x baseline "
+                            f"{previous['us_per_file']}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="many-small")
+    parser.add_argument("--mix", default="mixed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pipelines", default="ai,file_sort", help="comma-separated (default: both)")
+    parser.add_argument("--workdir", type=Path, default=None,
+                        help="where trees are generated (default: a temporary directory)")
+    parser.add_argument("--output", type=Path, default=None, help="write the JSON result here")
+    parser.add_argument("--thresholds", type=Path, default=DEFAULT_THRESHOLDS,
+                        help="JSON regression thresholds (default: benchmarks/thresholds.json)")
+    parser.add_argument("--baseline", type=Path, default=None, help="earlier JSON result to compare with")
+    parser.add_argument("--tolerance", type=float, default=1.25,
+                        help="allowed slowdown against --baseline (default: 1.25)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)  # Per-file log lines would dominate the timings
+
+    pipelines = {"ai": run_ai, "file_sort": run_file_sort}
+    timer = StageTimer(args.files)
+    result = {
+        "benchmark": "pipeline_stages",
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "layout": args.layout,
+        "files": args.files,
+        "mix": args.mix,
+        "seed": args.seed,
+        "trees": {},
+        "stages": timer.stages
+    }
+    work = Path(tempfile.mkdtemp(prefix="pipeline_stages_", dir=args.workdir))
+    try:
+        for name in args.pipelines.split(","):
+            root = work / name / "tree"
+            print(f"{name}: generating {args.files:,} files ({args.layout})", file=sys.stderr)
+            tree = generate(root, args.files, args.layout, args.mix, args.seed)
+            result["trees"][name] = {"directories": tree["directories"],
+                                     "seconds": round(tree["seconds"], 2)}
+            pipelines[name](root, work / name, timer)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    print(output)
+
+    thresholds = json.loads(args.thresholds.read_text()) if args.thresholds.exists() else {}
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+    if baseline and (baseline.get("layout"), baseline.get("files")) != (args.layout, args.files):
+        print(f"warning: baseline was a {baseline.get('files'):,}-file {baseline.get('layout')} tree",
+              file=sys.stderr)
+    failures = check(result, thresholds, baseline, args.tolerance)
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
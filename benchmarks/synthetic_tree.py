@@ -0,0 +1,131 @@
+"""Deterministic synthetic directory trees for the benchmarks.
+
+The same seed, layout, mix and file count always give the same tree. Files
+are sparse by default: each gets its logical size with one truncate and
+uses almost no disk, so million-file trees fit anywhere. Sizes start at
+3 MB because ai.py's scanner skips smaller files. Pass --dense to write
+real data instead, for benchmarks that read or copy it.
+
+Usage: python benchmarks/synthetic_tree.py ROOT [--files N] [--layout NAME]
+                                           [--mix NAME|ext=weight,...] [--seed N] [--dense]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+# layout: directory depth, subdirectories per directory, file size range in bytes
+LAYOUTS = {
+    "wide": {"depth": 1, "fanout": 20, "sizes": (3 * MB, 64 * MB)},
+    "deep": {"depth": 12, "fanout": 2, "sizes": (3 * MB, 64 * MB)},
+    "many-small": {"depth": 3, "fanout": 16, "sizes": (3 * MB, 4 * MB)},
+    "few-huge": {"depth": 2, "fanout": 4, "sizes": (1 * GB, 40 * GB)},
+}
+
+# mix: extension -> relative weight
+MIXES = {
+    "mixed": {".pdf": 4, ".docx": 2, ".jpg": 6, ".png": 2, ".mp4": 3, ".mkv": 2, ".mp3": 3,
+              ".zip": 2, ".tar.gz": 1, ".py": 1, ".csv": 1, ".iso": 1},
+    "documents": {".pdf": 6, ".docx": 4, ".xlsx": 2, ".txt": 2, ".csv": 1},
+    "media": {".jpg": 8, ".png": 3, ".mp4": 4, ".mkv": 3, ".mp3": 4, ".wav": 1},
+    "archives": {".zip": 4, ".rar": 2, ".7z": 1, ".tar.gz": 2, ".iso": 1},
+}
+
+WORDS = ["invoice", "report", "holiday", "IMG", "DSC", "backup", "setup", "lecture",
+         "song", "movie", "scan", "contract", "thesis", "budget", "draft"]
+
+
+def parse_mix(spec: str) -> dict:
+    """A preset name from MIXES, or ``ext=weight`` pairs such as ``pdf=3,jpg=5``."""
+    if spec in MIXES:
+        return MIXES[spec]
+    mix = {}
+    for item in spec.split(","):
+        ext, _, weight = item.partition("=")
+        ext = ext.strip()
+        mix[ext if ext.startswith(".") else f".{ext}"] = float(weight or 1)
+    return mix
+
+
+def directories(root: Path, depth: int, fanout: int) -> list:
+    """Every directory of a full ``fanout``-ary tree of ``depth`` levels below ``root``."""
+    level = [root]
+    result = [root]
+    for d in range(depth):
+        level = [parent / f"folder_{d}_{i:03d}" for parent in level for i in range(fanout)]
+        result.extend(level)
+    return result
+
+
+def file_name(rng: random.Random, i: int, ext: str) -> str:
+    """Names with counters, dates and versions, like real ingest directories."""
+    word = rng.choice(WORDS)
+    kind = i % 3
+    if kind == 0:
+        return f"{word}_{i:07d}{ext}"
+    if kind == 1:
+        return f"{word}_{2015 + i % 10}-{1 + i % 12:02d}-{1 + i % 28:02d}_{i}{ext}"
+    return f"{word}_{i}_v{i % 5}.{i % 3}{ext}"
+
+
+def generate(root: Path, files: int, layout: str = "many-small", mix="mixed",
+             seed: int = 0, dense: bool = False) -> dict:
+    """Create the tree under ``root`` and return a summary of what was written."""
+    spec = LAYOUTS[layout]
+    mix = parse_mix(mix) if isinstance(mix, str) else mix
+    rng = random.Random(seed)
+    extensions, weights = list(mix), list(mix.values())
+    low, high = spec["sizes"]
+
+    start = time.perf_counter()
+    dirs = directories(Path(root), spec["depth"], spec["fanout"])
+    for directory in dirs:
+        directory.mkdir(parents=True, exist_ok=True)
+    # Leaves get most files, every directory gets some
+    leaves = dirs[-spec["fanout"] ** spec["depth"]:] if spec["depth"] else dirs
+    total_size = 0
+    chunk = os.urandom(MB) if dense else None
+    for i in range(files):
+        directory = leaves[i % len(leaves)] if i % 4 else dirs[i % len(dirs)]
+        size = rng.randint(low, high)
+        path = directory / file_name(rng, i, rng.choices(extensions, weights)[0])
+        with open(path, "wb") as f:
+            if dense:
+                for _ in range(size // MB):
+                    f.write(chunk)
+                f.write(chunk[:size % MB])
+            else:
+                f.truncate(size)
+        total_size += size
+    return {
+        "root": str(root), "layout": layout, "files": files, "directories": len(dirs),
+        "mix": mix, "seed": seed, "dense": dense, "total_size": total_size,
+        "seconds": time.perf_counter() - start
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", type=Path)
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--layout", choices=sorted(LAYOUTS), default="many-small")
+    parser.add_argument("--mix", default="mixed",
+                        help=f"one of {', '.join(MIXES)} or ext=weight pairs (default: mixed)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dense", action="store_true", help="write real data instead of sparse files")
+    args = parser.parse_args()
+
+    if args.root.exists() and any(args.root.iterdir()):
+        sys.exit(f"{args.root} is not empty")
+    summary = generate(args.root, args.files, args.layout, args.mix, args.seed, args.dense)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,45 @@
 import os
 from pathlib import Path
-from typing import Dict, List, Set, Optional, Generator, Any
+from typing import Dict, List, Set, Optional, Generator, Any, Iterable
 from dataclasses import dataclass
-from collections import defaultdict
+from collections import Counter, defaultdict, deque
 import shutil
 import uuid
 import datetime
 import csv
 import hashlib
-from rich import print as rprint
-from rich.tree import Tree
-from rich.table import Table
-from rich.prompt import Prompt, Confirm
-from rich.progress import track
-from rich.panel import Panel
 from rich.console import Console
-from rich.style import Style
-import yaml
 from queue import Queue
 import logging
 from logging.handlers import RotatingFileHandler
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import re
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from functools import partial
+import select
 import signal
+import stat
+import struct
 import sys
+import argparse
+import json
+import time
+import threading
 
-@dataclass
+try:
+    import xxhash
+except ImportError:  # Optional; BLAKE2 from hashlib is used otherwise
+    xxhash = None
+
+# The machinery shared with ai.py lives in organizer_core.py, one level up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from organizer_core import (  # noqa: E402
+    CategoryIndex, NameRegistry, OperationJournal, ScanIndex, ScanStatistics, SkipMatcher,
+    TokenBucket, list_directory, metrics, place_no_clobber, transfer_file
+)
+
+HASH_BUFFER_SIZE = 1024 * 1024
+PARTIAL_HASH_SIZE = 64 * 1024
+
+@dataclass(slots=True)
 class FileInfo:
     path: Path
     size: int
@@ -54,17 +67,436 @@ class FileInfo:
             return None
     
     def calculate_hash(self) -> None:
-        """Calculate SHA-256 hash of file content."""
+        """Calculate content hash of the file."""
         try:
-            sha256_hash = hashlib.sha256()
-            with self.path.open('rb') as f:
-                for chunk in iter(lambda: f.read(4096), b''):
-                    sha256_hash.update(chunk)
-            self.hash = sha256_hash.hexdigest()
+            self.hash = hash_file(self.path)
         except Exception as e:
             logging.error(f"Failed to calculate hash for {self.path}: {e}")
             self.hash = ""
 
+def new_hasher():
+    """Return the fastest available content hasher (xxHash if installed, else BLAKE2)."""
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=32)
+
+def hash_file(path: Path) -> str:
+    """Hash a whole file through one reusable 1 MB buffer."""
+    hasher = new_hasher()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    total = 0
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hasher.update(view[:read])
+            total += read
+    metrics.count('bytes_hashed', total)
+    return hasher.hexdigest()
+
+def hash_file_ends(path: Path, size: int) -> str:
+    """Hash the first and last PARTIAL_HASH_SIZE bytes of a file.
+
+    Files no larger than two chunks are read whole, so for them the result is
+    already a full content hash.
+    """
+    hasher = new_hasher()
+    with open(path, 'rb') as f:
+        if size <= 2 * PARTIAL_HASH_SIZE:
+            hasher.update(f.read())
+        else:
+            hasher.update(f.read(PARTIAL_HASH_SIZE))
+            f.seek(size - PARTIAL_HASH_SIZE)
+            hasher.update(f.read(PARTIAL_HASH_SIZE))
+    metrics.count('bytes_hashed', min(size, 2 * PARTIAL_HASH_SIZE))
+    return hasher.hexdigest()
+
+def copy_with_hash(source: Path, dest: Path, exclusive: bool = False,
+                   throttle: Optional['TokenBucket'] = None, on_create=None) -> str:
+    """Copy a file with transfer_file while hashing the bytes it copies.
+
+    Returns the content hash, so a cross-device move reads the data exactly
+    once. Metadata is copied too and a partial destination is removed if
+    the copy fails. With ``exclusive`` the destination is created with
+    O_EXCL and an existing file raises FileExistsError untouched.
+    ``on_create`` is passed on to transfer_file.
+    """
+    hasher = new_hasher()
+    method = transfer_file(source, dest, exclusive, hasher, throttle=throttle, on_create=on_create)
+    logging.debug(f"Copied {source} → {dest} [{method}]")
+    return hasher.hexdigest()
+
+class IOScheduler:
+    """Runs file moves on separate queues for renames and data copies.
+
+    Renames only touch metadata and run on a wide pool of their own, so
+    thousands of them are never stuck behind a few huge copies. Copies
+    wait in one queue per set of devices they touch and start only while
+    each of those devices runs fewer than ``per_device`` copies (and fewer
+    than ``copy_workers`` run overall), so a spinning disk sees a bounded
+    number of streams. ``ops_per_second`` optionally caps how many jobs
+    start per second. ``submit`` blocks once ``max_in_flight`` jobs are
+    queued or running. Queue depths and, at shutdown, how busy each pool
+    was are reported through ``metrics``. Leaving the ``with`` block on an
+    exception cancels the jobs that have not started and waits only for
+    the running ones.
+    """
+
+    def __init__(self, rename_workers: Optional[int] = None, copy_workers: int = 4,
+                 per_device: int = 2, max_in_flight: int = 1000,
+                 ops_per_second: float = 0):
+        # A limit of zero would leave queued copies waiting forever
+        if copy_workers < 1 or per_device < 1:
+            raise ValueError(f"copy_workers and per_device must be at least 1 "
+                             f"(got {copy_workers} and {per_device})")
+        self.rename_workers = rename_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.copy_workers = copy_workers
+        self.per_device = per_device
+        self._renames = ThreadPoolExecutor(self.rename_workers)
+        self._copies = ThreadPoolExecutor(copy_workers)
+        self._ops = TokenBucket(ops_per_second) if ops_per_second else None
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._waiting: Dict[tuple, deque] = {}  # Device set -> queued copies
+        self._running = Counter()  # Device -> running copies
+        self._copies_running = 0
+        self._busy = {'rename': 0.0, 'copy': 0.0}  # Seconds the workers spent in jobs
+        self._started = time.perf_counter()
+        self._cancelled = False
+
+    def submit(self, kind: str, devices: Iterable[int], fn, *args) -> Future:
+        """Queue ``fn(*args)`` as a ``'rename'`` or ``'copy'`` job on ``devices``."""
+        self._slots.acquire()
+        future = Future()
+        future.add_done_callback(lambda _: self._slots.release())
+        metrics.track(f'{kind}_queue_depth', 1)
+        if kind == 'rename':
+            self._renames.submit(self._run, 'rename', future, fn, args)
+            return future
+        key = tuple(sorted(set(devices)))
+        with self._lock:
+            self._waiting.setdefault(key, deque()).append((future, fn, args))
+            self._dispatch()
+        return future
+
+    def _dispatch(self) -> None:
+        """Start queued copies whose devices have a free slot; called under the lock."""
+        for key in list(self._waiting):
+            queue = self._waiting[key]
+            while (queue and self._copies_running < self.copy_workers
+                   and all(self._running[device] < self.per_device for device in key)):
+                future, fn, args = queue.popleft()
+                for device in key:
+                    self._running[device] += 1
+                self._copies_running += 1
+                self._copies.submit(self._run_copy, key, future, fn, args)
+            if not queue:
+                del self._waiting[key]
+
+    def _run(self, kind: str, future: Future, fn, args) -> None:
+        metrics.track(f'{kind}_queue_depth', -1)
+        if self._cancelled:
+            future.cancel()
+        if not future.set_running_or_notify_cancel():
+            return
+        start = time.perf_counter()
+        try:
+            if self._ops is not None:
+                self._ops.consume(1)
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._busy[kind] += elapsed
+
+    def _run_copy(self, key: tuple, future: Future, fn, args) -> None:
+        try:
+            self._run('copy', future, fn, args)
+        finally:
+            with self._lock:
+                for device in key:
+                    self._running[device] -= 1
+                self._copies_running -= 1
+                self._dispatch()
+                if not self._copies_running:
+                    self._idle.notify_all()
+
+    def cancel(self) -> None:
+        """Drop every job that has not started; running jobs still finish."""
+        with self._lock:
+            self._cancelled = True
+            waiting = [job for queue in self._waiting.values() for job in queue]
+            self._waiting.clear()
+            self._idle.notify_all()
+        for future, _, _ in waiting:
+            metrics.track('copy_queue_depth', -1)
+            future.cancel()
+
+    def shutdown(self) -> None:
+        """Wait for every submitted job, then stop the pools."""
+        with self._idle:
+            self._idle.wait_for(lambda: not self._waiting and not self._copies_running)
+        self._copies.shutdown()
+        self._renames.shutdown()
+        wall = time.perf_counter() - self._started
+        workers = {'rename': self.rename_workers, 'copy': self.copy_workers}
+        for kind, busy in self._busy.items():
+            metrics.gauge(f'{kind}_worker_utilization',
+                          busy / (workers[kind] * wall) if wall > 0 else 0.0)
+
+    def __enter__(self) -> 'IOScheduler':
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is not None:
+            self.cancel()
+        try:
+            self.shutdown()
+        except KeyboardInterrupt:
+            # Interrupted while draining: drop what has not started, finish the rest
+            self.cancel()
+            self.shutdown()
+            raise
+
+class DuplicateFinder:
+    """Finds files with identical content in three increasingly expensive stages.
+
+    1. Group by size; a file with a unique size cannot have a duplicate.
+    2. Hash the first and last 64 KB of each same-size file.
+    3. Fully hash only the files whose partial hashes still collide.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self.stats = {}
+
+    @staticmethod
+    def _try(func, *args) -> Optional[str]:
+        try:
+            return func(*args)
+        except OSError as e:
+            logging.error(f"Failed to calculate hash for {args[0]}: {e}")
+            return None
+
+    def _regroup(self, groups: List[List[FileInfo]], func) -> Dict[tuple, List[FileInfo]]:
+        """Split each group by ``func(file_info)``, hashing on a thread pool."""
+        files = [file_info for group in groups for file_info in group]
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            digests = executor.map(func, files)
+            regrouped = defaultdict(list)
+            for file_info, digest in zip(files, digests):
+                if digest is not None:
+                    regrouped[(file_info.size, digest)].append(file_info)
+        return regrouped
+
+    def find(self, files: Iterable[FileInfo]) -> List[List[FileInfo]]:
+        """Return groups of identical files, largest reclaimable space first."""
+        by_size = defaultdict(list)
+        total = 0
+        for file_info in files:
+            by_size[file_info.size].append(file_info)
+            total += 1
+        size_groups = [group for group in by_size.values() if len(group) > 1]
+        del by_size
+
+        partial_groups = self._regroup(
+            size_groups,
+            lambda f: self._try(hash_file_ends, f.path, f.size)
+        )
+        duplicates = []
+        full_candidates = []
+        for (size, digest), group in partial_groups.items():
+            if len(group) < 2:
+                continue
+            if size <= 2 * PARTIAL_HASH_SIZE:
+                for file_info in group:
+                    file_info.hash = digest
+                duplicates.append(group)
+            else:
+                full_candidates.append(group)
+
+        full = self._regroup(full_candidates, lambda f: self._try(hash_file, f.path))
+        for (_, digest), group in full.items():
+            if len(group) < 2:
+                continue
+            for file_info in group:
+                file_info.hash = digest
+            duplicates.append(group)
+
+        self.stats = {
+            'files': total,
+            'size_candidates': sum(len(group) for group in size_groups),
+            'full_hash_candidates': sum(len(group) for group in full_candidates),
+            'bytes_hashed': (
+                sum(min(f.size, 2 * PARTIAL_HASH_SIZE) for group in size_groups for f in group) +
+                sum(f.size for group in full_candidates for f in group)
+            ),
+            'groups': len(duplicates),
+            'reclaimable_bytes': sum(group[0].size * (len(group) - 1) for group in duplicates)
+        }
+        duplicates.sort(key=lambda group: group[0].size * (len(group) - 1), reverse=True)
+        return duplicates
+
+    @staticmethod
+    def identical(first: Path, second: Path) -> bool:
+        """Compare two files' contents, cheapest check first."""
+        size = first.stat().st_size
+        if size != second.stat().st_size:
+            return False
+        if hash_file_ends(first, size) != hash_file_ends(second, size):
+            return False
+        return size <= 2 * PARTIAL_HASH_SIZE or hash_file(first) == hash_file(second)
+
+class InotifyWatcher:
+    """Linux inotify watches on directories, called through ctypes.
+
+    ``events`` waits up to ``timeout`` seconds and returns ``(kind, path)``
+    tuples: ``'ready'`` for a file closed after writing or moved in,
+    ``'changed'`` for a file that was created or written but is not closed
+    yet, ``'dir'`` for a new subdirectory, and ``'overflow'`` (path None)
+    when the kernel queue overflowed and events were lost.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    EVENT = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._ctypes = ctypes
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1: {os.strerror(error)}")
+        self._directories: Dict[int, str] = {}
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform.startswith('linux')
+
+    def add(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            error = self._ctypes.get_errno()
+            raise OSError(error, f"inotify_add_watch {directory}: {os.strerror(error)}")
+        self._directories[wd] = directory
+
+    def events(self, timeout: float) -> List[tuple]:
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                events.append(('overflow', None))
+                continue
+            if mask & self.IN_IGNORED:
+                self._directories.pop(wd, None)  # Directory deleted or moved away
+                continue
+            directory = self._directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    events.append(('dir', path))
+            elif mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                events.append(('ready', path))
+            else:
+                events.append(('changed', path))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Portable fallback for InotifyWatcher that re-lists the watched directories.
+
+    Every ``interval`` seconds each watched directory (not the whole tree)
+    is listed once and compared with the previous listing. New or resized
+    files are reported as ``'changed'`` since polling cannot see a file
+    being closed; the caller waits for the size to settle instead.
+    """
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self._listings: Dict[str, Dict[str, tuple]] = {}
+        self._next_poll = time.monotonic() + interval
+
+    @staticmethod
+    def _list(directory: str) -> Dict[str, tuple]:
+        listing = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        listing[entry.name] = (True, 0, 0)
+                    else:
+                        entry_stat = entry.stat(follow_symlinks=False)
+                        listing[entry.name] = (False, entry_stat.st_size, entry_stat.st_mtime_ns)
+                except OSError:
+                    continue
+        return listing
+
+    def add(self, directory: str) -> None:
+        self._listings[directory] = self._list(directory)
+
+    def events(self, timeout: float) -> List[tuple]:
+        delay = self._next_poll - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return []
+        if delay > 0:
+            time.sleep(delay)
+        self._next_poll = time.monotonic() + self.interval
+        
+        events = []
+        for directory, previous in list(self._listings.items()):
+            try:
+                current = self._list(directory)
+            except OSError:
+                del self._listings[directory]  # Directory deleted or moved away
+                continue
+            self._listings[directory] = current
+            for name, entry in current.items():
+                if previous.get(name) == entry:
+                    continue
+                path = os.path.join(directory, name)
+                if entry[0]:
+                    if name not in previous:
+                        events.append(('dir', path))
+                else:
+                    events.append(('changed', path))
+        return events
+
+    def close(self) -> None:
+        self._listings.clear()
+
 class FileOrganizerConfig:
     def __init__(self, config_path: Path):
         self.config_path = config_path
@@ -72,11 +504,13 @@ class FileOrganizerConfig:
             'category_mapping': {
                 'documents': ['.pdf', '.docx', '.doc', '.txt', '.pptx', '.xlsx', '.csv'],
                 'media': ['.mp4', '.avi', '.mkv', '.jpg', '.jpeg', '.png', '.gif'],
-                'archives': ['.zip', '.rar', '.tar', '.gz', '.7z'],
+                'archives': ['.zip', '.rar', '.tar', '.gz', '.7z', '.tar.gz', '.tgz'],
                 'code': ['.py', '.js', '.java', '.cpp', '.h', '.css', '.html'],
                 'executables': ['.exe', '.msi', '.apk'],
                 'others': []
             },
+            # Classify files with unknown suffixes by their magic bytes
+            'sniff_content': False,
             'min_file_size': 3 * 1024,  # 3KB
             'max_depth': 3,
             'skip_patterns': [
@@ -89,7 +523,37 @@ class FileOrganizerConfig:
                 r'dist',
                 r'build'
             ],
-            'duplicate_handling': 'rename',  # Options: rename, skip, overwrite
+            # gitignore-style globs, e.g. "*.part", "logs/", "/archive/**/*.iso"
+            'skip_globs': [],
+            'duplicate_handling': 'rename',  # Options: rename, skip, overwrite, skip-identical, hardlink
+            # auto: plain rename on the same device, inline-hashed copy across
+            # devices; full: hash source and destination around every move
+            'verification': 'auto',
+            'scan_index': 'file_organizer_index.db',  # Empty to disable
+            'streaming': True,  # Move files while the scan is still running
+            'max_in_flight': 1000,  # Files queued for the move workers at once
+            # Move scheduling: renames and copies run on separate pools; copies
+            # are limited per device and, optionally, in MB/s. max_ops_per_second
+            # caps moves started per second. 0 means unlimited.
+            'io': {
+                'rename_workers': 16,
+                'copy_workers': 4,
+                'per_device_copies': 2,
+                'max_mb_per_second': 0,
+                'max_ops_per_second': 0
+            },
+            'journal_dir': 'journals',  # Per-operation journals for resume/undo
+            # Watch mode: a file moves once closed and quiet for debounce_seconds,
+            # or, when no close is seen (polling), unchanged for settle_seconds.
+            # backend: auto uses inotify on Linux; poll lists watched directories
+            # every poll_interval. Skip partial downloads with skip_globs
+            # such as "*.part" or "*.crdownload".
+            'watch': {
+                'backend': 'auto',
+                'debounce_seconds': 0.1,
+                'settle_seconds': 0.5,
+                'poll_interval': 0.25
+            },
             'logging': {
                 'max_size': 5 * 1024 * 1024,  # 5MB
                 'backup_count': 3,
@@ -97,9 +561,12 @@ class FileOrganizerConfig:
             }
         }
         self.config = self.load_config()
+        self.categories = CategoryIndex(self.config['category_mapping'],
+                                        sniff=self.config.get('sniff_content', False))
 
     def load_config(self) -> dict:
         """Load or create configuration file."""
+        import yaml  # Only needed while the config is loaded
         try:
             if not self.config_path.exists():
                 self.config_path.write_text(yaml.dump(self.default_config))
@@ -128,11 +595,25 @@ class FileOrganizerConfig:
         return validated
 
 class SmartFileOrganizer:
-    def __init__(self, config_path: Path = Path('file_organizer_config.yaml')):
-        self.console = Console()
+    COMMANDS = ('scan', 'organize', 'report', 'duplicates', 'resume', 'undo', 'metrics')
+    
+    def __init__(self, config_path: Path = Path('file_organizer_config.yaml'),
+                 console: Optional[Console] = None):
+        self.console = console or Console()
         self.config = FileOrganizerConfig(config_path)
         self.setup_logging()
         self._setup_signal_handlers()
+        index_path = self.config.config.get('scan_index')
+        self.scan_index = ScanIndex(index_path) if index_path else None
+        self.policy_counts = defaultdict(int)
+        self._policy_lock = threading.Lock()
+        self.journal: Optional[OperationJournal] = None
+        self._interrupted = False
+        self.names = NameRegistry()
+        self._statistics: Dict[str, ScanStatistics] = {}  # Last complete scan per root
+        self._skip_matcher: Optional[SkipMatcher] = None
+        max_mb_per_second = self.config.config['io']['max_mb_per_second']
+        self.throttle = TokenBucket(max_mb_per_second * 1024 * 1024) if max_mb_per_second else None
         
     def _setup_signal_handlers(self):
         """Setup handlers for graceful shutdown."""
@@ -140,10 +621,20 @@ class SmartFileOrganizer:
         signal.signal(signal.SIGTERM, self._handle_interrupt)
     
     def _handle_interrupt(self, signum, frame):
-        """Handle interrupt signals gracefully."""
+        """Handle interrupt signals gracefully.
+        
+        Outside a journaled run the process exits at once. During one, the
+        run is unwound with KeyboardInterrupt: queued moves are cancelled,
+        running moves finish and are journaled, and only then is the journal
+        closed. Further signals while that happens are ignored.
+        """
+        if self._interrupted:
+            return
         self.console.print("\n[yellow]Received interrupt signal. Cleaning up...[/]")
-        # Implement cleanup logic here if needed
-        sys.exit(0)
+        if self.journal is None:
+            sys.exit(0)
+        self._interrupted = True
+        raise KeyboardInterrupt
     
     def setup_logging(self):
         """Setup rotating log handler."""
@@ -163,73 +654,196 @@ class SmartFileOrganizer:
             handlers=handlers
         )
     
-    def scan_directory(self, root_path: Path) -> Generator[FileInfo, None, None]:
-        """Scan directory using generator-based approach."""
-        base_depth = len(root_path.resolve().parts)
+    @property
+    def skip_matcher(self) -> SkipMatcher:
+        """The configured skip patterns, compiled once per organizer."""
+        if self._skip_matcher is None:
+            self._skip_matcher = SkipMatcher(patterns=self.config.config['skip_patterns'],
+                                             globs=self.config.config.get('skip_globs', []))
+        return self._skip_matcher
+    
+    def scan_directory(self, root_path: Path,
+                       exclude: Optional[Set[Path]] = None) -> Generator[FileInfo, None, None]:
+        """Scan directory using generator-based approach.
+
+        Directories listed in ``exclude`` are not descended into. A complete
+        scan without exclusions also leaves its statistics for ``statistics``.
+        """
+        root = root_path.resolve()
+        excluded = {str(path.resolve()) for path in exclude or ()}
+        min_file_size = self.config.config['min_file_size']
+        max_depth = self.config.config['max_depth']
         
-        def should_process(path: Path) -> bool:
-            """Check if path should be processed."""
-            if path.is_symlink():
-                return False
-            return not any(re.search(pattern, str(path)) 
-                         for pattern in self.config.config['skip_patterns'])
+        matcher = self.skip_matcher
+        anchored = matcher.anchored
+        categories = self.config.categories
+        stats = ScanStatistics(categories) if not excluded else None
         
-        def scan_recursive(current_path: Path) -> Generator[FileInfo, None, None]:
+        def scan_recursive(current_path: str, rel: str, depth: int) -> Generator[FileInfo, None, None]:
             try:
-                if current_path.is_file():
-                    file_info = FileInfo.from_path(current_path, base_depth)
-                    if (file_info and 
-                        file_info.size >= self.config.config['min_file_size']):
-                        yield file_info
-                elif current_path.is_dir() and should_process(current_path):
-                    # Check depth before processing
-                    depth = len(current_path.parts) - base_depth
-                    if depth <= self.config.config['max_depth']:
-                        for path in current_path.iterdir():
-                            yield from scan_recursive(path)
+                listing = list_directory(current_path, self.scan_index)
             except PermissionError:
                 self.console.print(f"[red]Permission denied: {current_path}[/]")
+                return
             except Exception as e:
                 logging.error(f"Error processing {current_path}: {e}")
+                return
+
+            for name, is_dir, is_link, size, _ in listing:
+                path = os.path.join(current_path, name)
+                rel_path = (f"{rel}/{name}" if rel else name) if anchored else ''
+                if is_link:
+                    logging.warning(f"Skipping symbolic link: {path}")
+                elif not is_dir:
+                    if size >= min_file_size and not matcher.skip(name, False, rel_path):
+                        category = ''
+                        if stats is not None:
+                            category = categories.classify(path)
+                            stats.add(os.path.splitext(name)[1].lower(), size, category)
+                        yield FileInfo(path=Path(path), size=size,
+                                       category=category, depth=depth + 1)
+                # Check depth before processing; skipped directories are pruned whole
+                elif (depth + 1 <= max_depth and path not in excluded
+                      and not matcher.skip(name, True, rel_path)):
+                    yield from scan_recursive(path, rel_path, depth + 1)
         
-        yield from scan_recursive(root_path.resolve())
+        try:
+            if root.is_dir() and not matcher.skip(root.name, True):
+                yield from scan_recursive(str(root), '', 0)
+            if stats is not None:
+                self._statistics[str(root)] = stats
+        finally:
+            if self.scan_index is not None:
+                self.scan_index.commit()
+    
+    @metrics.stage('scan')
+    def statistics(self, directory: Path) -> ScanStatistics:
+        """Statistics of ``directory``, reusing the last complete scan of it."""
+        stats = self._statistics.get(str(directory.resolve()))
+        if stats is None:
+            for _ in self.scan_directory(directory):
+                pass
+            stats = self._statistics[str(directory.resolve())]
+        return stats
     
     def get_file_category(self, file_info: FileInfo) -> str:
         """Determine file category based on extension."""
-        ext = file_info.path.suffix.lower()
-        for category, extensions in self.config.config['category_mapping'].items():
-            if ext in extensions:
-                return category
-        return 'others'
-    
-    def handle_duplicate(self, dest_path: Path) -> Path:
-        """Handle duplicate files based on configuration."""
-        if not dest_path.exists():
-            return dest_path
-            
+        return self.config.categories.classify(file_info.path)
+    
+    def handle_duplicate(self, dest_path: Path, source: Optional[FileInfo] = None) -> Path:
+        """Handle duplicate files based on configuration.
+        
+        Names are reserved in the per-directory registry, so concurrent
+        workers never choose the same destination and nothing probes the disk.
+        """
         handling = self.config.config['duplicate_handling']
+        if handling == 'overwrite':
+            return dest_path
+        
+        directory, name = str(dest_path.parent), dest_path.name
+        if self.names.reserve(directory, name, unique=False) is not None:
+            return dest_path
+        
         if handling == 'skip':
             return None
-        elif handling == 'overwrite':
-            return dest_path
-        else:  # rename
-            counter = 1
-            while True:
-                new_path = dest_path.with_name(
-                    f"{dest_path.stem}_{counter}{dest_path.suffix}"
-                )
-                if not new_path.exists():
-                    return new_path
-                counter += 1
+        elif handling == 'skip-identical' and source is not None:
+            try:
+                if DuplicateFinder.identical(source.path, dest_path):
+                    return None
+            except OSError:
+                pass  # Reserved by another worker but not written yet
+        # rename (also used by hardlink and skip-identical for differing files)
+        return dest_path.with_name(self.names.reserve(directory, name))
+    
+    def _same_device(self, source: Path, dest_dir: Path) -> bool:
+        return os.stat(source).st_dev == os.stat(dest_dir).st_dev
+    
+    def choose_move_policy(self, source: Path, dest_dir: Path) -> str:
+        """Pick how a move is performed and verified.
+
+        - ``rename``: source and destination share a device, so the move is an
+          atomic rename and the data is never read.
+        - ``copy-hash``: the data crosses devices and is hashed once while it
+          is copied.
+        - ``full-verify``: hash the source, move, then hash the destination.
+        """
+        if self.config.config['verification'] == 'full':
+            return 'full-verify'
+        if self._same_device(source, dest_dir):
+            return 'rename'
+        return 'copy-hash'
+    
+    @staticmethod
+    def _device_of(path: Path) -> int:
+        """Device of ``path``, or of its nearest existing parent."""
+        while True:
+            try:
+                return os.stat(path).st_dev
+            except FileNotFoundError:
+                if path.parent == path:
+                    raise
+                path = path.parent
+    
+    def _move_scheduler(self) -> IOScheduler:
+        io = self.config.config['io']
+        return IOScheduler(rename_workers=io['rename_workers'], copy_workers=io['copy_workers'],
+                           per_device=io['per_device_copies'],
+                           max_in_flight=self.config.config['max_in_flight'],
+                           ops_per_second=io['max_ops_per_second'])
+    
+    def _submit_move(self, scheduler: IOScheduler, file_info: FileInfo, dest_dir: Path) -> Future:
+        """Queue ``move_file`` as a rename or, if the data has to be read, as a copy."""
+        try:
+            source_device = file_info.path.stat().st_dev
+            dest_device = self._device_of(dest_dir)
+        except OSError:
+            # move_file reports the failure; no point holding a copy slot for it
+            return scheduler.submit('rename', (), self.move_file, file_info, dest_dir)
+        if source_device == dest_device and self.config.config['verification'] != 'full':
+            kind = 'rename'
+        else:
+            kind = 'copy'
+        return scheduler.submit(kind, (source_device, dest_device), self.move_file, file_info, dest_dir)
+    
+    def _place(self, file_info: FileInfo, dest_path: Path, copy: bool) -> tuple:
+        """Put the file at ``dest_path`` without clobbering anything on disk.
+        
+        Same-device moves use link + unlink and copies use O_EXCL; if the name
+        turns out to be taken, the next free one is taken from the registry.
+        Each attempt is journaled as an intent before the source is touched:
+        a rename's before it starts, a copy's as soon as its target exists.
+        Returns ``(final_path, content_hash or None)``.
+        """
+        overwrite = self.config.config['duplicate_handling'] == 'overwrite'
+        name = dest_path.name
+        while True:
+            try:
+                if copy:
+                    digest = copy_with_hash(
+                        file_info.path, dest_path, exclusive=not overwrite, throttle=self.throttle,
+                        on_create=lambda target_stat: self._journal_intent(file_info.path, dest_path,
+                                                                           target_stat)
+                    )
+                    file_info.path.unlink()
+                    return dest_path, digest
+                self._journal_intent(file_info.path, dest_path, os.lstat(file_info.path))
+                if overwrite:
+                    os.replace(file_info.path, dest_path)
+                else:
+                    place_no_clobber(str(file_info.path), str(dest_path))
+                return dest_path, None
+            except FileExistsError:
+                dest_path = dest_path.with_name(self.names.reserve(str(dest_path.parent), name))
+    
+    def _journal_intent(self, source: Path, target: Path, identity: os.stat_result) -> None:
+        """Make ``source → target`` durable in the journal before the move goes on."""
+        if self.journal is not None:
+            self.journal.intend(source, target, identity)
     
     def move_file(self, file_info: FileInfo, dest_dir: Path) -> bool:
         """Move a single file with verification."""
         try:
-            # Calculate source hash if not already done
-            if not file_info.hash:
-                file_info.calculate_hash()
-                
-            dest_path = self.handle_duplicate(dest_dir / file_info.path.name)
+            dest_path = self.handle_duplicate(dest_dir / file_info.path.name, file_info)
             if not dest_path:
                 logging.info(f"Skipping duplicate file: {file_info.path}")
                 return False
@@ -237,16 +851,38 @@ class SmartFileOrganizer:
             # Ensure destination directory exists
             dest_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # Move file
-            shutil.move(str(file_info.path), str(dest_path))
-            
-            # Verify move
-            moved_info = FileInfo.from_path(dest_path, len(dest_path.parts))
-            if moved_info:
-                moved_info.calculate_hash()
-                if moved_info.hash != file_info.hash:
-                    raise ValueError("File verification failed")
+            policy = self.choose_move_policy(file_info.path, dest_path.parent)
+            if policy == 'rename':
+                dest_path, _ = self._place(file_info, dest_path, copy=False)
+            elif policy == 'copy-hash':
+                dest_path, file_info.hash = self._place(file_info, dest_path, copy=True)
+            else:
+                # Calculate source hash if not already done
+                if not file_info.hash:
+                    file_info.calculate_hash()
+                
+                # Move file
+                source_hash = file_info.hash
+                dest_path, _ = self._place(
+                    file_info, dest_path,
+                    copy=not self._same_device(file_info.path, dest_path.parent)
+                )
+                
+                # Verify move
+                moved_info = FileInfo.from_path(dest_path, len(dest_path.parts))
+                if moved_info:
+                    moved_info.calculate_hash()
+                    if moved_info.hash != source_hash:
+                        raise ValueError("File verification failed")
             
+            logging.info(f"Moved {file_info.path} → {dest_path} [{policy}]")
+            with self._policy_lock:
+                self.policy_counts[policy] += 1
+            metrics.count(f'moves_{policy}')
+            metrics.count('bytes_moved', file_info.size)
+            if self.journal is not None:
+                self.journal.record("done", src=str(file_info.path), dst=str(dest_path), policy=policy)
+            file_info.path = dest_path
             return True
             
         except Exception as e:
@@ -254,58 +890,382 @@ class SmartFileOrganizer:
             logging.error(f"Move failed: {e}")
             return False
     
-    def organize_files(self, source_dir: Path, operation_type: str = 'category') -> str:
-        """Organize files with progress tracking and error handling."""
-        operation_id = str(uuid.uuid4())
+    def link_duplicate(self, file_info: FileInfo, canonical: FileInfo, dest_dir: Path) -> bool:
+        """Replace a content duplicate with a hard link to its canonical copy."""
+        try:
+            dest_path = self.handle_duplicate(dest_dir / file_info.path.name, file_info)
+            if not dest_path:
+                logging.info(f"Skipping duplicate file: {file_info.path}")
+                return False
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            canonical_stat = os.stat(canonical.path)
+            while True:
+                self._journal_intent(file_info.path, dest_path, canonical_stat)
+                try:
+                    os.link(canonical.path, dest_path)
+                    break
+                except FileExistsError:
+                    dest_path = dest_path.with_name(
+                        self.names.reserve(str(dest_path.parent), file_info.path.name)
+                    )
+        except OSError as e:
+            logging.warning(f"Hard link failed for {file_info.path} ({e}), moving instead")
+            return self.move_file(file_info, dest_dir)
+        
+        try:
+            file_info.path.unlink()
+        except OSError as e:
+            logging.error(f"Linked {dest_path} but failed to remove {file_info.path}: {e}")
+            return False
+        metrics.count('moves_hardlink')
+        if self.journal is not None:
+            self.journal.record("done", src=str(file_info.path), dst=str(dest_path), policy='hardlink')
+        file_info.path = dest_path
+        return True
+    
+    def _category_for(self, file_info: FileInfo, operation_type: str) -> str:
+        if operation_type == 'extension':
+            return file_info.path.suffix.lstrip('.') or 'others'
+        file_info.category = self.get_file_category(file_info)
+        return file_info.category
+    
+    @metrics.stage('organize')
+    def organize_files(self, source_dir: Path, operation_type: str = 'category',
+                       operation_id: Optional[str] = None) -> str:
+        """Organize files with progress tracking and error handling.
+        
+        Every move is journaled under the returned operation id, as an intent
+        before it starts and as done once it completed. Passing the id of an
+        interrupted operation continues it: intents without a completion are
+        reconciled with the disk first, files it already moved live under
+        organized_files, which the scan skips, and sources its journal lists
+        as moved are not touched again.
+        """
+        resuming = operation_id is not None
+        operation_id = operation_id or str(uuid.uuid4())
+        organized_dir = source_dir / 'organized_files'
+        organized_dir.mkdir(exist_ok=True)
+        self.policy_counts.clear()
+        self.names = NameRegistry()
+        
+        completed = set()
+        records = OperationJournal.read(self.config.config['journal_dir'], operation_id) if resuming else []
+        self.journal = OperationJournal(self.config.config['journal_dir'], operation_id)
+        if resuming:
+            records = self.journal.reconcile(records)
+            completed = set(OperationJournal.completed_moves(records))
+        else:
+            self.journal.record("begin", source=str(source_dir), operation_type=operation_type)
+            self.journal.sync()
+        try:
+            self._organize(source_dir, organized_dir, operation_type, completed)
+            self.journal.record("end")
+        except KeyboardInterrupt:
+            # The move scheduler has drained, so every finished move is journaled
+            self.journal.close()
+            self.console.print(f"[yellow]Progress saved. Resume with --resume {operation_id}[/]")
+            sys.exit(0)
+        finally:
+            self._interrupted = False
+            self.journal.close()
+            self.journal = None
+            self._statistics.clear()  # Files have moved
+            if self.policy_counts:
+                summary = ", ".join(f"{count} {policy}" for policy, count in sorted(self.policy_counts.items()))
+                self.console.print(f"[blue]Moves by verification policy: {summary}[/]")
+                logging.info(f"Operation {operation_id} moves by policy: {summary}")
+        return operation_id
+    
+    def resume_operation(self, operation_id: str) -> str:
+        """Continue an interrupted organize operation from its journal."""
+        records = OperationJournal.read(self.config.config['journal_dir'], operation_id)
+        begin = next((record for record in records if record["t"] == "begin"), None)
+        if begin is None:
+            raise ValueError(f"Journal for operation {operation_id} has no begin record")
+        done = len(OperationJournal.completed_moves(records))
+        self.console.print(f"[blue]Resuming {operation_id}: {done} files already moved[/]")
+        return self.organize_files(Path(begin["source"]), begin["operation_type"], operation_id)
+    
+    @metrics.stage('undo')
+    def undo_operation(self, operation_id: str) -> int:
+        """Move every file of a journaled operation back, newest move first."""
+        from rich.progress import track
+        journal_dir = self.config.config['journal_dir']
+        records = OperationJournal.read(journal_dir, operation_id)
+        journal = OperationJournal(journal_dir, operation_id)
+        restored = 0
+        try:
+            records = journal.reconcile(records)
+            for source, target in track(
+                    list(reversed(list(OperationJournal.completed_moves(records).items()))),
+                    description="Restoring files"):
+                if os.path.exists(source):
+                    logging.warning(f"Cannot restore {target}: {source} exists again")
+                    continue
+                try:
+                    os.makedirs(os.path.dirname(source), exist_ok=True)
+                    shutil.move(target, source)
+                except OSError as e:
+                    logging.error(f"Failed to restore {target} → {source}: {e}")
+                    continue
+                journal.record("undone", src=source, dst=target)
+                restored += 1
+            journal.record("undo_end", restored=restored)
+        finally:
+            journal.close()
+            self._statistics.clear()  # Files have moved
+        return restored
+    
+    def watch(self, source_dir: Path, operation_type: str = 'category',
+              stop: Optional[threading.Event] = None) -> str:
+        """Organize files as they arrive in ``source_dir`` until stopped.
+        
+        The directories a scan would descend into are watched with inotify,
+        or polled where inotify is unavailable; the tree is never rescanned.
+        A file is moved once it was closed after writing (or moved in) and
+        has seen no event for ``debounce_seconds``, or, when no close is
+        seen, once its size has not changed for ``settle_seconds``. Moves are
+        journaled under the returned operation id like any organize run.
+        """
+        settings = self.config.config['watch']
+        debounce = settings['debounce_seconds']
+        settle = settings['settle_seconds']
+        min_file_size = self.config.config['min_file_size']
+        max_depth = self.config.config['max_depth']
+        matcher = self.skip_matcher
+        source_dir = source_dir.resolve()
         organized_dir = source_dir / 'organized_files'
         organized_dir.mkdir(exist_ok=True)
+        root, organized = str(source_dir), str(organized_dir)
+        
+        if settings['backend'] != 'poll' and InotifyWatcher.available():
+            watcher = InotifyWatcher()
+        else:
+            watcher = PollingWatcher(settings['poll_interval'])
+        # path -> [last event, last size, time of last size change, closed]
+        pending: Dict[str, list] = {}
+        
+        def relative(path: str) -> str:
+            return os.path.relpath(path, root).replace(os.sep, '/')
+        
+        def descend(path: str, depth: int) -> bool:
+            """Whether a scan would enter the directory ``path`` at ``depth``."""
+            rel_path = relative(path) if matcher.anchored else ''
+            return (depth <= max_depth and path != organized
+                    and not matcher.skip(os.path.basename(path), True, rel_path))
+        
+        def add_tree(directory: str, depth: int, arrived: bool) -> None:
+            """Watch ``directory`` and its subdirectories; queue their files if ``arrived``."""
+            try:
+                # The watch is added before listing so no file can fall in between
+                watcher.add(directory)
+                with os.scandir(directory) as entries:
+                    listing = [(entry.path, entry.is_dir(follow_symlinks=False)) for entry in entries]
+            except OSError as e:
+                logging.warning(f"Cannot watch {directory}: {e}")
+                return
+            now = time.monotonic()
+            for path, is_dir in listing:
+                if is_dir:
+                    if descend(path, depth + 1):
+                        add_tree(path, depth + 1, arrived)
+                elif arrived:
+                    pending.setdefault(path, [now, -1, now, False])
+        
+        def file_info_for(path: str, file_stat: os.stat_result) -> Optional[FileInfo]:
+            rel_path = relative(path)
+            name = os.path.basename(path)
+            if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size < min_file_size:
+                return None
+            if matcher.skip(name, False, rel_path if matcher.anchored else ''):
+                return None
+            return FileInfo(path=Path(path), size=file_stat.st_size, category='',
+                            depth=rel_path.count('/') + 1)
+        
+        operation_id = str(uuid.uuid4())
+        self.policy_counts.clear()
+        self.names = NameRegistry()
+        self.journal = OperationJournal(self.config.config['journal_dir'], operation_id)
+        self.journal.record("begin", source=root, operation_type=operation_type, watch=True)
+        self.journal.sync()
+        self.console.print(f"[blue]Watching {root} with {type(watcher).__name__} "
+                           f"(operation {operation_id}). Press Ctrl+C to stop.[/]")
+        try:
+            add_tree(root, 0, arrived=False)
+            with self._move_scheduler() as scheduler:
+                while stop is None or not stop.is_set():
+                    for kind, path in watcher.events(debounce if pending else 0.5):
+                        if kind == 'dir':
+                            depth = relative(path).count('/') + 1
+                            if descend(path, depth):
+                                add_tree(path, depth, arrived=True)
+                        elif kind == 'overflow':
+                            logging.warning("Watch events were lost; re-listing watched directories")
+                            add_tree(root, 0, arrived=True)
+                        else:
+                            entry = pending.setdefault(path, [0.0, -1, time.monotonic(), False])
+                            entry[0] = time.monotonic()
+                            entry[3] = kind == 'ready'
+                    
+                    for path, file_stat in self._settled(pending, debounce, settle):
+                        file_info = file_info_for(path, file_stat)
+                        if file_info is not None:
+                            self._statistics.clear()  # Files are moving
+                            dest_dir = organized_dir / self._category_for(file_info, operation_type)
+                            self._submit_move(scheduler, file_info, dest_dir)
+        except KeyboardInterrupt:
+            pass  # Ctrl+C ends the watch once running moves are journaled
+        finally:
+            self._interrupted = False
+            watcher.close()
+            if self.journal is not None:
+                self.journal.record("end")
+                self.journal.close()
+                self.journal = None
+            self._statistics.clear()
+        return operation_id
+    
+    @staticmethod
+    def _settled(pending: Dict[str, list], debounce: float, settle: float):
+        """Yield ``(path, stat)`` for pending files that are done being written."""
+        now = time.monotonic()
+        for path, entry in list(pending.items()):
+            last_event, size, size_changed, closed = entry
+            if now - last_event < debounce:
+                continue
+            try:
+                file_stat = os.lstat(path)
+            except OSError:
+                del pending[path]  # Removed or renamed before it settled
+                continue
+            if file_stat.st_size != size:
+                entry[1], entry[2] = file_stat.st_size, now
+                if not closed:
+                    continue
+            elif not closed and now - size_changed < settle:
+                continue
+            del pending[path]
+            yield path, file_stat
+    
+    def _files_to_organize(self, source_dir: Path, organized_dir: Path,
+                           completed: Set[str]) -> Generator[FileInfo, None, None]:
+        """Scanned files still to move: outside organized_dir and not in ``completed``."""
+        for file_info in self.scan_directory(source_dir, exclude={organized_dir}):
+            if str(file_info.path) not in completed:
+                yield file_info
+    
+    def _organize(self, source_dir: Path, organized_dir: Path, operation_type: str,
+                  completed: Set[str]) -> None:
+        """Move every scanned file into its category directory."""
+        handling = self.config.config['duplicate_handling']
+        # Hard-linking duplicates needs every file's size up front, so it
+        # always takes the batch path
+        if self.config.config['streaming'] and handling != 'hardlink':
+            self._organize_streaming(source_dir, organized_dir, operation_type, completed)
+            return
         
         # Collect files first
-        files_to_process = list(self.scan_directory(source_dir))
+        files_to_process = list(self._files_to_organize(source_dir, organized_dir, completed))
         if not files_to_process:
             self.console.print("[yellow]No files found to organize.[/]")
-            return operation_id
+            return
+        
+        canonical_for = {}
+        if handling == 'hardlink':
+            for group in DuplicateFinder().find(files_to_process):
+                for duplicate in group[1:]:
+                    canonical_for[str(duplicate.path)] = group[0]
         
         # Process files with progress tracking
-        with ThreadPoolExecutor() as executor:
+        with self._move_scheduler() as scheduler:
             futures = []
+            duplicates = []
             
             for file_info in files_to_process:
-                if operation_type == 'extension':
-                    category = file_info.path.suffix.lstrip('.') or 'others'
+                dest_dir = organized_dir / self._category_for(file_info, operation_type)
+                canonical = canonical_for.get(str(file_info.path))
+                if canonical is not None:
+                    duplicates.append((file_info, canonical, dest_dir))
+                    continue
+                futures.append(self._submit_move(scheduler, file_info, dest_dir))
+            self._wait_with_progress(futures, "Moving files")
+            
+            # Duplicates are linked once every canonical copy is in place
+            if duplicates:
+                futures = [
+                    scheduler.submit('rename', (), self.link_duplicate, file_info, canonical, dest_dir)
+                    for file_info, canonical, dest_dir in duplicates
+                ]
+                self._wait_with_progress(futures, "Linking duplicates")
+    
+    def _wait_with_progress(self, futures: List, description: str) -> None:
+        """Track progress of submitted file operations."""
+        from rich.progress import track
+        with self.console.status("[bold green]Processing files...") as status:
+            for future in track(as_completed(futures), 
+                             total=len(futures),
+                             description=description):
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Failed to process file: {e}")
+    
+    def _organize_streaming(self, source_dir: Path, organized_dir: Path,
+                            operation_type: str, completed: Set[str]) -> None:
+        """Feed scanned files straight into the move workers.
+
+        At most ``max_in_flight`` files are queued or moving at any time; the
+        scanner blocks until the scheduler frees a slot, so memory stays flat no
+        matter how large the tree is. The organized directory itself is
+        excluded from the scan so moved files are never picked up again.
+        """
+        from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+        counts = {'moved': 0, 'failed': 0}
+        counts_lock = threading.Lock()
+        progress = Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            TextColumn("[green]{task.completed} moved"),
+            TextColumn("[red]{task.fields[failed]} failed"),
+            TimeElapsedColumn(),
+            console=self.console
+        )
+        
+        with progress:
+            task = progress.add_task("Moving files", total=None, failed=0)
+            
+            def on_done(future):
+                try:
+                    moved = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to process file: {e}")
+                    moved = False
+                with counts_lock:
+                    counts['moved' if moved else 'failed'] += 1
+                    failed = counts['failed']
+                if moved:
+                    progress.advance(task)
                 else:
-                    file_info.category = self.get_file_category(file_info)
-                    category = file_info.category
-                
-                dest_dir = organized_dir / category
-                futures.append(
-                    executor.submit(self.move_file, file_info, dest_dir)
-                )
+                    progress.update(task, failed=failed)
             
-            # Track progress
-            with self.console.status("[bold green]Processing files...") as status:
-                for future in track(as_completed(futures), 
-                                 total=len(futures),
-                                 description="Moving files"):
-                    try:
-                        future.result()
-                    except Exception as e:
-                        logging.error(f"Failed to process file: {e}")
+            with self._move_scheduler() as scheduler:
+                scanned = 0
+                for file_info in self._files_to_organize(source_dir, organized_dir, completed):
+                    dest_dir = organized_dir / self._category_for(file_info, operation_type)
+                    self._submit_move(scheduler, file_info, dest_dir).add_done_callback(on_done)
+                    scanned += 1
+                    progress.update(task, description=f"Moving files ({scanned} scanned)")
         
-        return operation_id
+        if not scanned:
+            self.console.print("[yellow]No files found to organize.[/]")
+        logging.info(f"Streaming organize finished: {counts['moved']} moved, "
+                     f"{counts['failed']} failed")
     
-    def generate_report(self, directory: Path) -> None:
-        """Generate detailed analysis report."""
-        stats = defaultdict(lambda: {'count': 0, 'size': 0, 'extensions': set()})
-        total_size = 0
-        
-        # Collect statistics
-        for file_info in self.scan_directory(directory):
-            category = self.get_file_category(file_info)
-            stats[category]['count'] += 1
-            stats[category]['size'] += file_info.size
-            stats[category]['extensions'].add(file_info.path.suffix.lower())
-            total_size += file_info.size
+    @metrics.stage('report')
+    def generate_report(self, directory: Path) -> Path:
+        """Generate detailed analysis report and return its path."""
+        from rich.table import Table
+        stats = self.statistics(directory)
         
         # Generate report
         report_path = Path('file_analysis_report.md')
@@ -320,26 +1280,70 @@ class SmartFileOrganizer:
             table.add_column("Size", justify="right", style="green")
             table.add_column("Extensions", style="blue")
             
-            for category, data in sorted(stats.items()):
+            for category, count in sorted(stats.categories.items()):
                 table.add_row(
                     category,
-                    str(data['count']),
-                    self.format_size(data['size']),
-                    ", ".join(sorted(data['extensions']))
+                    str(count),
+                    self.format_size(stats.category_sizes[category]),
+                    ", ".join(sorted(stats.category_extensions[category]))
                 )
             
             # Add total
             table.add_row(
                 "Total",
-                str(sum(d['count'] for d in stats.values())),
-                self.format_size(total_size),
+                str(stats.total_files),
+                self.format_size(stats.total_size),
                 ""
             )
             
             self.console.print(table)
             f.write("\n```\n")
-            self.console.print(table, file=f)
+            Console(file=f, width=120).print(table)
             f.write("```\n")
+        return report_path
+    
+    @metrics.stage('duplicates')
+    def find_duplicates(self, directory: Path) -> List[List[FileInfo]]:
+        """Find files with identical content and write a duplicate report."""
+        from rich.table import Table
+        finder = DuplicateFinder()
+        groups = finder.find(self.scan_directory(directory))
+        stats = finder.stats
+        
+        table = Table(title="Duplicate Files")
+        table.add_column("Size", justify="right", style="green")
+        table.add_column("Copies", justify="right", style="magenta")
+        table.add_column("Reclaimable", justify="right", style="green")
+        table.add_column("Files", style="cyan")
+        for group in groups:
+            table.add_row(
+                self.format_size(group[0].size),
+                str(len(group)),
+                self.format_size(group[0].size * (len(group) - 1)),
+                "\n".join(str(file_info.path) for file_info in group)
+            )
+        
+        report_path = Path('duplicate_report.md')
+        with report_path.open('w') as f:
+            f.write("# Duplicate Files Report\n\n")
+            f.write(f"## Directory: {directory}\n\n")
+            f.write(f"- Files scanned: {stats['files']}\n")
+            f.write(f"- Same-size candidates: {stats['size_candidates']}\n")
+            f.write(f"- Fully hashed: {stats['full_hash_candidates']}\n")
+            f.write(f"- Bytes hashed: {self.format_size(stats['bytes_hashed'])}\n")
+            f.write(f"- Duplicate groups: {stats['groups']}\n")
+            f.write(f"- Reclaimable: {self.format_size(stats['reclaimable_bytes'])}\n")
+            f.write("\n```\n")
+            Console(file=f, width=120).print(table)
+            f.write("```\n")
+        
+        self.console.print(table)
+        self.console.print(
+            f"{stats['groups']} duplicate groups, "
+            f"{self.format_size(stats['reclaimable_bytes'])} reclaimable "
+            f"({self.format_size(stats['bytes_hashed'])} hashed)"
+        )
+        return groups
     
     @staticmethod
     def format_size(size: int) -> str:
@@ -349,12 +1353,214 @@ class SmartFileOrganizer:
                 return f"{size:.2f} {unit}"
             size /= 1024
         return f"{size:.2f} PB"
+    
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one ``{"command": ..., **arguments}`` request and return a JSON-ready result."""
+        command = request.get('command')
+        if command not in self.COMMANDS:
+            raise ValueError(f"Unknown command: {command!r}")
+        if command in ('resume', 'undo'):
+            operation_id = request['operation_id']
+            if command == 'resume':
+                return {'operation_id': self.resume_operation(operation_id)}
+            return {'operation_id': operation_id, 'restored': self.undo_operation(operation_id)}
+        if command == 'metrics':
+            return metrics.summary()
+        
+        directory = Path(request['directory']).resolve()
+        if not directory.is_dir():
+            raise NotADirectoryError(f"Not a directory: {directory}")
+        if command == 'organize':
+            operation_id = self.organize_files(directory, request.get('mode', 'category'))
+            return {'operation_id': operation_id, 'moves_by_policy': dict(self.policy_counts)}
+        if command == 'report':
+            report_path = self.generate_report(directory)
+            return {'directory': str(directory), 'report': str(report_path.resolve())}
+        if command == 'duplicates':
+            groups = self.find_duplicates(directory)
+            return {
+                'directory': str(directory),
+                'groups': [[str(file_info.path) for file_info in group] for group in groups],
+                'reclaimable_bytes': sum(group[0].size * (len(group) - 1) for group in groups)
+            }
+        stats = self.statistics(directory)
+        return {
+            'directory': str(directory),
+            'files': stats.total_files,
+            'total_size': stats.total_size,
+            'categories': dict(stats.categories),
+            'category_sizes': dict(stats.category_sizes),
+            'extensions': dict(stats.extensions.most_common()),
+            'size_distribution': stats.size_distribution()
+        }
+    
+    def respond(self, line: str) -> str:
+        """Answer one JSON request line with one JSON response line."""
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+            request_id = request.get('id')
+            response = {'ok': True, 'result': self.handle(request)}
+        except Exception as e:
+            logging.error(f"Request failed: {e}")
+            response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        if request_id is not None:
+            response['id'] = request_id
+        return json.dumps(response, ensure_ascii=False) + "\n"
+
+def serve(organizer: SmartFileOrganizer, socket_path: Optional[str] = None) -> None:
+    """Answer JSON-lines requests until stdin closes, or forever on a Unix socket.
+
+    The organizer, its config, scan index and compiled skip patterns stay
+    loaded between requests, which are handled one at a time.
+    """
+    if socket_path is None:
+        for line in sys.stdin:
+            if line.strip():
+                sys.stdout.write(organizer.respond(line))
+                sys.stdout.flush()
+        return
+    
+    import socketserver
+    
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write(organizer.respond(line.decode('utf-8')).encode('utf-8'))
+    
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with socketserver.UnixStreamServer(socket_path, RequestHandler) as server:
+        logging.info(f"Serving requests on {socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+def send_request(socket_path: str, request: Dict[str, Any]) -> Dict[str, Any]:
+    """Send one request to a running ``serve --socket`` daemon and return its response."""
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode('utf-8') + b"\n")
+        with sock.makefile('r', encoding='utf-8') as reader:
+            return json.loads(reader.readline())
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Smart File Organizer")
+    parser.add_argument("--resume", metavar="OPERATION_ID",
+                        help="Continue an interrupted organize operation")
+    parser.add_argument("--undo", metavar="OPERATION_ID",
+                        help="Move the files of an organize operation back")
+    parser.add_argument("--config", type=Path, default=Path('file_organizer_config.yaml'),
+                        help="Configuration file (default: file_organizer_config.yaml)")
+    parser.add_argument("--daemon", metavar="SOCKET",
+                        help="Send the command to a daemon started with 'serve --socket SOCKET'")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="Write stage timings, counters and gauges of the run as JSON")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="Write the same metrics in the Prometheus text format, e.g. for "
+                             "node_exporter's textfile collector")
+    parser.add_argument("--profile", action="append", default=[], metavar="STAGE",
+                        help="Run a stage (scan, organize, report, duplicates, undo or all) under "
+                             "cProfile and save the stats to --profile-dir; may be repeated")
+    parser.add_argument("--trace-memory", action="append", default=[], metavar="STAGE",
+                        help="Record the peak and top allocations of a stage with tracemalloc; "
+                             "may be repeated")
+    parser.add_argument("--profile-dir", type=Path, default=Path('profiles'),
+                        help="Directory for --profile output (default: profiles)")
+    
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND",
+                                     help="Run one operation without prompts and print the "
+                                          "result as JSON (default: interactive menu)")
+    for name, help_text in (('scan', "Print file statistics of a directory"),
+                            ('report', "Write the analysis report of a directory"),
+                            ('duplicates', "Find duplicate files in a directory")):
+        commands.add_parser(name, help=help_text).add_argument("directory")
+    organize = commands.add_parser('organize', help="Organize a directory")
+    organize.add_argument("directory")
+    organize.add_argument("--mode", choices=['category', 'extension'], default='category',
+                          help="Group files by category or by extension (default: category)")
+    watch = commands.add_parser('watch', help="Keep organizing files as they arrive in a "
+                                              "directory until interrupted")
+    watch.add_argument("directory")
+    watch.add_argument("--mode", choices=['category', 'extension'], default='category',
+                       help="Group files by category or by extension (default: category)")
+    serve_parser = commands.add_parser('serve', help="Answer JSON-lines requests on stdin, or on "
+                                                     "a Unix socket, keeping the organizer loaded")
+    serve_parser.add_argument("--socket", metavar="PATH",
+                              help="Listen on this Unix socket instead of stdin/stdout")
+    commands.add_parser('metrics', help="Print the stage timings and counters of a daemon "
+                                        "(use with --daemon)")
+    return parser.parse_args(argv)
+
+def run_command(args: argparse.Namespace) -> int:
+    """Run one non-interactive command, printing the JSON response."""
+    if args.command in ('serve', 'watch') or not args.daemon:
+        # Progress and tables go to stderr; stdout carries only JSON
+        organizer = SmartFileOrganizer(args.config, console=Console(stderr=True))
+        if args.command == 'serve':
+            serve(organizer, args.socket)
+            return 0
+        if args.command == 'watch':
+            organizer.watch(Path(args.directory), args.mode)
+            return 0
+    
+    request = {'command': args.command}
+    if args.command != 'metrics':
+        request['directory'] = os.path.abspath(args.directory)
+    if args.command == 'organize':
+        request['mode'] = args.mode
+    if args.daemon:
+        response = send_request(args.daemon, request)
+    else:
+        response = json.loads(organizer.respond(json.dumps(request)))
+    print(json.dumps(response, indent=2, ensure_ascii=False))
+    return 0 if response['ok'] else 1
+
+def write_metrics(args: argparse.Namespace) -> None:
+    """Write the run's metrics where the command line asked for them."""
+    try:
+        if args.metrics_json:
+            metrics.write_json(args.metrics_json)
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
+    except OSError as e:
+        logging.error(f"Could not write metrics: {e}")
 
 def main():
+    """Parse the command line and run it, writing metrics on the way out."""
+    args = parse_args()
+    metrics.namespace = 'file_organizer'
+    metrics.profile.update(args.profile)
+    metrics.trace_memory.update(args.trace_memory)
+    metrics.profile_dir = args.profile_dir
+    try:
+        return run_session(args)
+    finally:
+        write_metrics(args)
+
+def run_session(args: argparse.Namespace):
     """Main function with improved error handling and user interaction."""
-    organizer = SmartFileOrganizer()
+    from rich.prompt import Prompt, Confirm
+    if args.command:
+        return run_command(args)
+    organizer = SmartFileOrganizer(args.config)
     console = Console()
     
+    if args.resume:
+        op_id = organizer.resume_operation(args.resume)
+        console.print(f"[green]Operation complete. ID: {op_id}[/]")
+        return
+    if args.undo:
+        restored = organizer.undo_operation(args.undo)
+        console.print(f"[green]Restored {restored} files from operation {args.undo}.[/]")
+        return
+    
     console.rule("[bold blue]Smart File Organizer[/]")
     
     try:
@@ -375,12 +1581,13 @@ def main():
             console.print("1. Organize by category")
             console.print("2. Organize by extension")
             console.print("3. Generate report")
-            console.print("4. Exit")
+            console.print("4. Find duplicates")
+            console.print("5. Exit")
             
             choice = Prompt.ask(
                 "Enter choice",
-                choices=['1', '2', '3', '4'],
-                default='4'
+                choices=['1', '2', '3', '4', '5'],
+                default='5'
             )
             
             if choice == '1':
@@ -395,6 +1602,9 @@ def main():
                 organizer.generate_report(dir_path)
                 console.print("[green]Report generated successfully.[/]")
             elif choice == '4':
+                organizer.find_duplicates(dir_path)
+                console.print("[green]Duplicate report generated successfully.[/]")
+            elif choice == '5':
                 console.print("[blue]Exiting the program. Goodbye![/]")
                 break
     except Exception as e:
@@ -402,4 +1612,4 @@ def main():
         logging.error(f"Unexpected error: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
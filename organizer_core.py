@@ -0,0 +1,1017 @@
+"""Filesystem machinery shared by ai.py and new_fm/file_sort.py.
+
+Both entry points import the scan index and directory listing, the skip
+matcher, category index and scan statistics, the operation journal,
+collision-free naming, the transfer engine and the run metrics from here.
+"""
+import os
+import re
+import errno
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from array import array
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class RunMetrics:
+    """Per-run stage timings and counters, for telling where a run spent its time.
+
+    A stage records wall and CPU seconds; CPU time well below wall time
+    means the stage waited on the disk, the network or the LLM. Counters
+    (calls, bytes), observations (count, sum and max, e.g. latencies) and
+    gauges (with high-water marks for tracked levels) can be updated from
+    any thread. Stages named in ``profile`` run under cProfile (the calling
+    thread only) and those in ``trace_memory`` under tracemalloc; "all"
+    selects every stage. The summary is available as JSON or in the
+    Prometheus text format for node_exporter's textfile collector.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.started = time.time()
+        self.stages: Dict[str, Dict] = {}
+        self.counters = Counter()
+        self.observations: Dict[str, List[float]] = {}  # name -> [count, sum, max]
+        self.gauges: Dict[str, float] = {}
+        self.profile: set = set()
+        self.trace_memory: set = set()
+        self.profile_dir = Path("profiles")
+        self._lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            entry = self.observations.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += value
+            entry[2] = max(entry[2], value)
+
+    def gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def track(self, name: str, delta: float) -> None:
+        """Move a level such as a queue depth, keeping its maximum as ``<name>_max``."""
+        with self._lock:
+            level = self.gauges[name] = self.gauges.get(name, 0) + delta
+            if level > self.gauges.get(f"{name}_max", 0):
+                self.gauges[f"{name}_max"] = level
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the body as stage ``name``; repeated stages add up."""
+        selected = lambda names: name in names or "all" in names  # noqa: E731
+        profiler = None
+        if selected(self.profile):
+            import cProfile
+            profiler = cProfile.Profile()
+        tracing = False
+        if selected(self.trace_memory):
+            import tracemalloc
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            extra = {}
+            if profiler is not None:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                extra["profile"] = str(self.profile_dir / f"{self.namespace}_{name}.prof")
+                profiler.dump_stats(extra["profile"])
+            if tracing:
+                _, extra["memory_peak_bytes"] = tracemalloc.get_traced_memory()
+                top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+                extra["memory_top"] = [f"{stat.traceback}: {stat.size} bytes" for stat in top]
+                tracemalloc.stop()
+            with self._lock:
+                record = self.stages.setdefault(name, {"runs": 0, "seconds": 0.0, "cpu_seconds": 0.0})
+                record["runs"] += 1
+                record["seconds"] += wall
+                record["cpu_seconds"] += cpu
+                record.update(extra)
+            logger.debug(f"Stage {name}: {wall:.3f}s wall, {cpu:.3f}s CPU")
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {
+                "namespace": self.namespace,
+                "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "seconds": time.time() - self.started,
+                "stages": {name: dict(record) for name, record in self.stages.items()},
+                "counters": dict(self.counters),
+                "observations": {
+                    name: {"count": count, "sum": total, "max": peak,
+                           "mean": total / count if count else 0.0}
+                    for name, (count, total, peak) in self.observations.items()
+                },
+                "gauges": dict(self.gauges)
+            }
+
+    def write_json(self, path: str) -> None:
+        self._write(path, json.dumps(self.summary(), indent=2) + "\n")
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the summary in the text exposition format, replacing the file atomically."""
+        summary = self.summary()
+        prefix = self.namespace
+        clean = lambda name: re.sub(r"[^a-zA-Z0-9_]", "_", name)  # noqa: E731
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall time per stage, summed over the run.",
+            f"# TYPE {prefix}_stage_seconds gauge"
+        ]
+        lines += [f'{prefix}_stage_seconds{{stage="{clean(name)}"}} {record["seconds"]:.6f}'
+                  for name, record in summary["stages"].items()]
+        lines += [f"# TYPE {prefix}_stage_cpu_seconds gauge"]
+        lines += [f'{prefix}_stage_cpu_seconds{{stage="{clean(name)}"}} {record["cpu_seconds"]:.6f}'
+                  for name, record in summary["stages"].items()]
+        for name, value in sorted(summary["counters"].items()):
+            lines += [f"# TYPE {prefix}_{clean(name)}_total counter",
+                      f"{prefix}_{clean(name)}_total {value}"]
+        for name, values in sorted(summary["observations"].items()):
+            lines += [f"# TYPE {prefix}_{clean(name)} summary",
+                      f"{prefix}_{clean(name)}_count {values['count']}",
+                      f"{prefix}_{clean(name)}_sum {values['sum']:.6f}",
+                      f"# TYPE {prefix}_{clean(name)}_max gauge",
+                      f"{prefix}_{clean(name)}_max {values['max']:.6f}"]
+        for name, value in sorted(summary["gauges"].items()):
+            lines += [f"# TYPE {prefix}_{clean(name)} gauge", f"{prefix}_{clean(name)} {value}"]
+        lines += [f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+                  f"{prefix}_last_run_timestamp_seconds {time.time():.0f}"]
+        self._write(path, "\n".join(lines) + "\n")
+
+    @staticmethod
+    def _write(path: str, text: str) -> None:
+        # Readers such as node_exporter must never see a half-written file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+# Process-wide metrics; each entry point names them and writes them out with
+# --metrics-json / --metrics-prom
+metrics = RunMetrics("file_manager")
+
+class ScanIndex:
+    """Persistent per-directory listing cache keyed on directory mtime and inode.
+
+    A directory whose mtime and inode are unchanged since the last scan still
+    has the same entries, so its cached listing (file sizes and mtimes
+    included) is reused without calling scandir or stat on its files.
+    Subdirectories are still visited with one stat each, because a change deep
+    in the tree only touches the mtime of the directory it happened in. Edits
+    that rewrite a file in place without touching its directory are picked up
+    the next time that directory changes.
+
+    Like git's racily clean index entries, a directory whose mtime is within
+    RACY_WINDOW_NS of the time it was listed is stored without its mtime and
+    listed again on the next scan: an entry created later in the same
+    timestamp tick would leave the mtime unchanged and stay invisible.
+    """
+
+    FLUSH_THRESHOLD = 10000
+    # FAT stores mtimes in 2 s steps, SMB and NFS servers may round them and
+    # their clocks drift from ours
+    RACY_WINDOW_NS = 2 * 10**9
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY, mtime_ns INTEGER, inode INTEGER
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS entries (
+                dir TEXT, name TEXT, is_dir INTEGER, is_link INTEGER,
+                size INTEGER, mtime_ns INTEGER, PRIMARY KEY (dir, name)
+            ) WITHOUT ROWID;
+        """)
+        self._pending = []
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, path: str, dir_stat: os.stat_result) -> Optional[List[tuple]]:
+        """Return the cached listing of ``path`` if the directory is unchanged."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, inode FROM dirs WHERE path = ?", (path,)
+            ).fetchone()
+            if row is None or row != (dir_stat.st_mtime_ns, dir_stat.st_ino):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return [
+                (name, bool(is_dir), bool(is_link), size, mtime_ns)
+                for name, is_dir, is_link, size, mtime_ns in self._conn.execute(
+                    "SELECT name, is_dir, is_link, size, mtime_ns FROM entries WHERE dir = ?",
+                    (path,)
+                )
+            ]
+
+    def record(self, path: str, dir_stat: os.stat_result, listing: List[tuple]):
+        """Queue a fresh listing of ``path`` for writing."""
+        mtime_ns = dir_stat.st_mtime_ns
+        if time.time_ns() - mtime_ns < self.RACY_WINDOW_NS:
+            mtime_ns = None  # Racily clean; never matches, so it is listed again
+        with self._lock:
+            self._pending.append((path, mtime_ns, dir_stat.st_ino, listing))
+            if len(self._pending) >= self.FLUSH_THRESHOLD:
+                self._flush()
+
+    def _forget_subtree(self, path: str):
+        upper = path + chr(ord(os.sep) + 1)
+        lower = path + os.sep
+        self._conn.execute(
+            "DELETE FROM dirs WHERE path = ? OR (path > ? AND path < ?)", (path, lower, upper)
+        )
+        self._conn.execute(
+            "DELETE FROM entries WHERE dir = ? OR (dir > ? AND dir < ?)", (path, lower, upper)
+        )
+
+    def _flush(self):
+        """Write queued listings. Caller must hold the lock."""
+        for path, mtime_ns, inode, listing in self._pending:
+            current_dirs = {name for name, is_dir, *_ in listing if is_dir}
+            for (name,) in self._conn.execute(
+                "SELECT name FROM entries WHERE dir = ? AND is_dir = 1", (path,)
+            ).fetchall():
+                if name not in current_dirs:
+                    self._forget_subtree(os.path.join(path, name))
+            self._conn.execute("DELETE FROM entries WHERE dir = ?", (path,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO dirs (path, mtime_ns, inode) VALUES (?, ?, ?)",
+                (path, mtime_ns, inode)
+            )
+            self._conn.executemany(
+                "INSERT INTO entries (dir, name, is_dir, is_link, size, mtime_ns) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(path, *entry) for entry in listing]
+            )
+        self._pending = []
+
+    def commit(self):
+        """Flush queued listings and commit them to disk."""
+        with self._lock:
+            self._flush()
+            self._conn.commit()
+
+    def close(self):
+        self.commit()
+        self._conn.close()
+
+def list_directory(path: str, scan_index: Optional[ScanIndex] = None) -> List[tuple]:
+    """List a directory as ``(name, is_dir, is_link, size, mtime_ns)`` tuples.
+
+    Served from the scan index when the directory is unchanged since the
+    last run, otherwise read with os.scandir reusing each DirEntry's stat.
+    """
+    dir_stat = None
+    if scan_index is not None:
+        dir_stat = os.stat(path)
+        cached = scan_index.lookup(path, dir_stat)
+        if cached is not None:
+            metrics.count("scan_index_hits")
+            return cached
+
+    listing = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    entry_stat = entry.stat()
+                    listing.append((entry.name, False, entry.is_symlink(),
+                                    entry_stat.st_size, entry_stat.st_mtime_ns))
+                elif entry.is_dir():
+                    listing.append((entry.name, True, entry.is_symlink(), 0, 0))
+            except OSError as e:
+                logger.error(f"Error scanning {entry.path}: {e}")
+
+    # Counted per directory; a lock per entry would show up in the scan rate
+    metrics.count("scandir_calls")
+    metrics.count("stat_calls", len(listing) + (dir_stat is not None))
+    if scan_index is not None:
+        scan_index.record(path, dir_stat, listing)
+    return listing
+
+def glob_to_regex(glob: str) -> str:
+    """Translate a gitignore-style glob into a regex matching a whole path.
+
+    ``*`` and ``?`` stay within one path component, ``**`` spans components.
+    """
+    out = []
+    i = 0
+    while i < len(glob):
+        c = glob[i]
+        if glob.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif glob.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif c == '*':
+            out.append('[^/]*')
+            i += 1
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+        elif c == '[' and glob.find(']', i + 2) != -1:
+            end = glob.find(']', i + 2)
+            body = glob[i + 1:end].replace('\\', '\\\\')
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            out.append(f'[{body}]')
+            i = end + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return ''.join(out)
+
+class SkipMatcher:
+    """Decides which scanned entries to skip, one path component at a time.
+
+    All rules are compiled up front into a handful of merged expressions:
+
+    - ``names``: exact component names (``.git``), matched with a set lookup.
+    - ``patterns``: regexes searched in directory names only.
+    - ``globs``: gitignore-style globs. A glob without a slash matches the
+      component name at any depth; a glob with a slash is anchored to the
+      scan root and matched against the relative path. A trailing slash
+      limits the glob to directories. Negation (``!``) is not supported.
+    - ``extensions``: file suffixes such as ``.tmp``.
+
+    A skipped directory is pruned together with everything below it, so
+    rules never need to look at the full path of a file.
+    """
+
+    def __init__(self, names: Iterable[str] = (), patterns: Iterable[str] = (),
+                 globs: Iterable[str] = (), extensions: Iterable[str] = ()):
+        self.names = frozenset(names)
+        self.extensions = frozenset(ext.lower() for ext in extensions)
+
+        name_rules, dir_name_rules, path_rules, dir_path_rules = [], [], [], []
+        dir_name_rules.extend(f'(?:{pattern})' for pattern in patterns)
+        for glob in globs:
+            glob = glob.strip()
+            if not glob or glob.startswith('#'):
+                continue
+            dir_only = glob.endswith('/')
+            glob = glob.rstrip('/')
+            if '/' in glob:
+                rules = dir_path_rules if dir_only else path_rules
+                rules.append(f'(?:{glob_to_regex(glob.lstrip("/"))})')
+            else:
+                rules = dir_name_rules if dir_only else name_rules
+                rules.append(rf'\A(?:{glob_to_regex(glob)})\Z')
+
+        self._name = self._compile(name_rules, search=True)
+        self._dir_name = self._compile(dir_name_rules + name_rules, search=True)
+        self._path = self._compile(path_rules, search=False)
+        self._dir_path = self._compile(dir_path_rules + path_rules, search=False)
+        # Callers only need to track relative paths when an anchored glob exists
+        self.anchored = bool(path_rules or dir_path_rules)
+
+    @staticmethod
+    def _compile(rules: List[str], search: bool):
+        if not rules:
+            return None
+        regex = re.compile('|'.join(rules))
+        return regex.search if search else regex.fullmatch
+
+    def skip(self, name: str, is_dir: bool, rel_path: str = '') -> bool:
+        """Return True if the entry ``name`` should be skipped.
+
+        ``rel_path`` is the entry's path relative to the scan root with ``/``
+        separators; it is only consulted when :attr:`anchored` is set.
+        """
+        if name in self.names:
+            return True
+        if is_dir:
+            name_match, path_match = self._dir_name, self._dir_path
+        else:
+            if os.path.splitext(name)[1].lower() in self.extensions:
+                return True
+            name_match, path_match = self._name, self._path
+        if name_match is not None and name_match(name):
+            return True
+        return path_match is not None and rel_path != '' and path_match(rel_path) is not None
+
+# Leading bytes of common formats, checked when a name has no known suffix
+MAGIC_SIGNATURES = [
+    (0, b'%PDF-', '.pdf'),
+    (0, b'\x89PNG\r\n\x1a\n', '.png'),
+    (0, b'\xff\xd8\xff', '.jpg'),
+    (0, b'GIF8', '.gif'),
+    (0, b'PK\x03\x04', '.zip'),
+    (0, b'Rar!\x1a\x07', '.rar'),
+    (0, b"7z\xbc\xaf'\x1c", '.7z'),
+    (0, b'\x1f\x8b', '.gz'),
+    (257, b'ustar', '.tar'),
+    (0, b'\x1aE\xdf\xa3', '.mkv'),
+    (4, b'ftyp', '.mp4'),
+    (8, b'AVI ', '.avi'),
+    (0, b'MZ', '.exe'),
+]
+MAGIC_READ_SIZE = 262
+
+class CategoryIndex:
+    """Inverted suffix → category index compiled from a category mapping.
+
+    Lookups are a dict hit per candidate suffix, longest first, so multi-part
+    suffixes such as ``.tar.gz`` win over ``.gz``. When ``sniff`` is set, files
+    whose suffix is unknown are classified from their leading bytes.
+    """
+
+    def __init__(self, mapping: Dict[str, List[str]], default: str = 'others',
+                 sniff: bool = False):
+        self.default = default
+        self.sniff = sniff
+        self.by_suffix: Dict[str, str] = {}
+        for category, extensions in mapping.items():
+            for ext in extensions or ():
+                ext = ext.lower() if ext.startswith('.') else '.' + ext.lower()
+                # First category listing a suffix wins, as with the linear scan
+                self.by_suffix.setdefault(ext, category)
+        self.max_parts = max((ext.count('.') for ext in self.by_suffix), default=1)
+        self.categories = list(dict.fromkeys([*mapping, default]))
+        self._codes = {category: code for code, category in enumerate(self.categories)}
+
+    def classify_name(self, name: str) -> Optional[str]:
+        """Category for a file name, or None if no suffix is known."""
+        name = name.lower()
+        dot = name.rfind('.')
+        if self.max_parts == 1:
+            return self.by_suffix.get(name[dot:]) if dot > 0 else None
+        candidates = []
+        while dot > 0 and len(candidates) < self.max_parts:
+            candidates.append(dot)
+            dot = name.rfind('.', 0, dot)
+        for dot in reversed(candidates):
+            category = self.by_suffix.get(name[dot:])
+            if category is not None:
+                return category
+        return None
+
+    def sniff_file(self, path) -> Optional[str]:
+        """Category from the file's magic bytes, or None if unrecognised."""
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(MAGIC_READ_SIZE)
+        except OSError:
+            return None
+        for offset, signature, ext in MAGIC_SIGNATURES:
+            if head.startswith(signature, offset):
+                return self.by_suffix.get(ext)
+        return None
+
+    def classify(self, path) -> str:
+        """Category for a file path, sniffing the content if enabled."""
+        category = self.classify_name(os.path.basename(path))
+        if category is None and self.sniff:
+            category = self.sniff_file(path)
+        return category or self.default
+
+    def classify_table(self, table) -> array:
+        """Category code (an index into ``categories``) for every row of an ai.FileTable.
+
+        Without multi-part suffixes or sniffing, each distinct extension is
+        looked up once and rows are mapped through their extension id.
+        """
+        codes = self._codes
+        if self.max_parts == 1 and not self.sniff:
+            by_ext = [codes[self.by_suffix.get(ext, self.default)] for ext in table.extensions]
+            return array('I', (by_ext[code] for code in table.ext_id))
+        result = array('I')
+        for row, name in enumerate(table.names):
+            category = self.classify_name(name)
+            if category is None and self.sniff:
+                category = self.sniff_file(table.path(row))
+            result.append(codes[category or self.default])
+        return result
+
+class ScanStatistics:
+    """Running aggregates over scanned files, fed once per file by the scanner.
+
+    Holds file and byte totals, extension and category histograms (with
+    sizes) and size-bucket counts, so reports and prompts never walk the
+    tree again. With ``keep_rows`` the row index of every file is also
+    recorded per size bucket.
+    """
+
+    SIZE_BOUNDARIES = (1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+    SIZE_LABELS = ("< 1MB", "1-10MB", "10-100MB", "> 100MB")
+
+    def __init__(self, categories: Optional[CategoryIndex] = None, keep_rows: bool = False):
+        self.category_index = categories
+        self.total_files = 0
+        self.total_size = 0
+        self.extensions = Counter()
+        self.extension_sizes = Counter()
+        self.categories = Counter()
+        self.category_sizes = Counter()
+        self.category_extensions = defaultdict(set)
+        self.size_buckets = [0] * len(self.SIZE_LABELS)
+        self.bucket_rows = [array('I') for _ in self.SIZE_LABELS] if keep_rows else None
+        self._ext_category: Dict[str, str] = {}
+
+    def add(self, extension: str, size: int, category: Optional[str] = None,
+            row: Optional[int] = None) -> None:
+        """Record one file; the category defaults to the one of its extension."""
+        if category is None:
+            category = self._ext_category.get(extension)
+            if category is None:
+                index = self.category_index
+                category = ((index.by_suffix.get(extension) or index.default)
+                            if index is not None else 'others')
+                self._ext_category[extension] = category
+        self.total_files += 1
+        self.total_size += size
+        self.extensions[extension] += 1
+        self.extension_sizes[extension] += size
+        self.categories[category] += 1
+        self.category_sizes[category] += size
+        self.category_extensions[category].add(extension)
+        bucket = bisect_right(self.SIZE_BOUNDARIES, size)
+        self.size_buckets[bucket] += 1
+        if self.bucket_rows is not None and row is not None:
+            self.bucket_rows[bucket].append(row)
+
+    def size_distribution(self) -> Dict[str, int]:
+        """Non-empty size buckets by label."""
+        return {label: count for label, count in zip(self.SIZE_LABELS, self.size_buckets) if count}
+
+    @classmethod
+    def from_table(cls, table, categories: Optional[CategoryIndex] = None) -> 'ScanStatistics':
+        """Aggregate an already built ai.FileTable, for callers that did not scan."""
+        stats = cls(categories, keep_rows=True)
+        for row, (ext_code, size) in enumerate(zip(table.ext_id, table.size)):
+            stats.add(table.extensions[ext_code], size, row=row)
+        return stats
+
+class OperationJournal:
+    """Append-only write-ahead journal of one reorganization run.
+
+    Each run gets ``<journal_dir>/<operation_id>.jsonl``. Records are JSON
+    lines buffered in memory and written with a single fsync per batch
+    (every SYNC_EVERY records or SYNC_INTERVAL seconds), so journaling costs
+    little per move. A record made with ``durable=True`` is on disk before
+    the call returns; callers journal a move's intent that way before moving
+    and its completion in the batch. After a crash, at most the last
+    unsynced batch of completions is lost, and ``reconcile`` settles the
+    moves left unfinished against the disk. A torn final line is ignored when
+    the journal is read back.
+    """
+
+    SYNC_EVERY = 256
+    SYNC_INTERVAL = 1.0
+
+    def __init__(self, journal_dir: str, operation_id: Optional[str] = None):
+        self.operation_id = operation_id or str(uuid.uuid4())
+        self.path = self.journal_path(journal_dir, self.operation_id)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._fsync_lock = threading.Lock()  # Taken before _lock, never after
+        self._buffer: List[str] = []
+        self._queued = 0  # Records queued so far
+        self._synced = 0  # Records known to be on disk
+        self._last_sync = time.monotonic()
+
+    @staticmethod
+    def journal_path(journal_dir: str, operation_id: str) -> Path:
+        return Path(journal_dir) / f"{operation_id}.jsonl"
+
+    def record(self, kind: str, durable: bool = False, **fields) -> None:
+        """Queue a record; fsync once the batch is full or old enough.
+
+        With ``durable`` the record is on disk when the call returns. Records
+        other threads queue in the meantime share its fsync.
+        """
+        line = json.dumps({"t": kind, **fields}, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._buffer.append(line)
+            self._queued += 1
+            sequence = self._queued
+            if not durable and (len(self._buffer) >= self.SYNC_EVERY or
+                                time.monotonic() - self._last_sync >= self.SYNC_INTERVAL):
+                self._sync()
+        if durable:
+            self._sync_through(sequence)
+
+    def intend(self, source, target, identity: os.stat_result) -> None:
+        """Durably journal that ``source`` is being placed at ``target``.
+
+        ``identity`` is the stat of the file ``target`` will be: the source
+        for a rename or hard link, the new file for a copy (journal it once
+        the exclusive create has succeeded). ``reconcile`` relies on it to
+        tell the operation's own files from anything else at that path.
+        """
+        self.record("intent", durable=True, src=str(source), dst=str(target),
+                    dev=identity.st_dev, ino=identity.st_ino)
+
+    def _write_buffer(self) -> int:
+        """Write buffered records; returns how many were queued. Caller must hold the lock."""
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer = []
+        self._file.flush()
+        return self._queued
+
+    def _sync(self) -> None:
+        """Write and fsync buffered records. Caller must hold the lock."""
+        written = self._write_buffer()
+        os.fsync(self._file.fileno())
+        self._synced = max(self._synced, written)
+        self._last_sync = time.monotonic()
+
+    def _sync_through(self, sequence: int) -> None:
+        """Return once the first ``sequence`` records are on disk.
+
+        The fsync runs outside the record lock, so other threads keep
+        queueing and the next fsync covers all of their records at once.
+        """
+        with self._fsync_lock:
+            if self._synced >= sequence:
+                return
+            with self._lock:
+                if self._file is None:
+                    return  # close() synced everything
+                written = self._write_buffer()
+                fd = self._file.fileno()
+            os.fsync(fd)
+            self._synced = max(self._synced, written)
+            self._last_sync = time.monotonic()
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+
+    def close(self) -> None:
+        with self._fsync_lock, self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+    @classmethod
+    def read(cls, journal_dir: str, operation_id: str) -> List[Dict]:
+        """Load every complete record of a journal."""
+        path = cls.journal_path(journal_dir, operation_id)
+        if not path.exists():
+            raise FileNotFoundError(f"No journal for operation {operation_id} in {journal_dir}")
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring torn journal record in {path}")
+        return records
+
+    @staticmethod
+    def completed_moves(records: List[Dict]) -> Dict[str, str]:
+        """Map source → target for moves that are done and not undone, in order."""
+        moves = {}
+        for record in records:
+            if record["t"] == "done":
+                moves[record["src"]] = record["dst"]
+            elif record["t"] == "undone":
+                moves.pop(record["src"], None)
+        return moves
+
+    @staticmethod
+    def unfinished_moves(records: List[Dict]) -> Dict[str, Dict]:
+        """Map source → latest intent record for moves never journaled as done."""
+        moves = {}
+        for record in records:
+            if record["t"] == "intent":
+                moves[record["src"]] = record
+            elif record["t"] == "done":
+                moves.pop(record["src"], None)
+        return moves
+
+    def reconcile(self, records: List[Dict]) -> List[Dict]:
+        """Settle the moves ``records`` intended but never recorded as done.
+
+        Only a target that is still the file the intent named (same device
+        and inode) belongs to the operation; anything else at that path is
+        left alone. Such a target whose source is gone was moved, and the
+        move is journaled as done. One next to a source that still exists is
+        a placement that never finished and is removed. Returns ``records``
+        with the new ones.
+        """
+        settled = []
+        for source, intent in self.unfinished_moves(records).items():
+            target = intent["dst"]
+            try:
+                target_stat = os.lstat(target)
+            except FileNotFoundError:
+                continue
+            if (target_stat.st_dev, target_stat.st_ino) != (intent["dev"], intent["ino"]):
+                logger.warning(f"Not reconciling {target}: it is not the file this operation placed")
+                continue
+            if not os.path.lexists(source):
+                record = {"t": "done", "src": source, "dst": target, "recovered": True}
+                self.record("done", src=source, dst=target, recovered=True)
+                settled.append(record)
+                continue
+            try:
+                os.unlink(target)
+                logger.info(f"Removed unfinished move target {target}")
+            except OSError as e:
+                logger.error(f"Failed to remove unfinished move target {target}: {e}")
+        return records + settled
+
+class NameRegistry:
+    """Hands out unique file names per target directory without probing the disk.
+
+    Each directory is listed once with os.scandir the first time it is used;
+    after that names are reserved in memory under a lock. A counter per
+    requested name means the n-th ``IMG_0001.jpg`` gets ``IMG_0001_n.jpg``
+    directly instead of testing ``_1`` .. ``_n`` one by one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names: Dict[str, set] = {}
+        self._counters: Dict[tuple, int] = {}
+
+    def _directory_names(self, directory: str) -> set:
+        """Names present in ``directory``. Caller must hold the lock."""
+        names = self._names.get(directory)
+        if names is None:
+            try:
+                with os.scandir(directory) as entries:
+                    names = {entry.name for entry in entries}
+            except FileNotFoundError:
+                names = set()
+            self._names[directory] = names
+        return names
+
+    def reserve(self, directory: str, name: str, unique: bool = True) -> Optional[str]:
+        """Reserve ``name`` in ``directory``.
+
+        If the name is taken, return the next free ``stem_N.ext`` variant, or
+        None when ``unique`` is False.
+        """
+        with self._lock:
+            names = self._directory_names(directory)
+            if name not in names:
+                names.add(name)
+                return name
+            if not unique:
+                return None
+            stem, suffix = os.path.splitext(name)
+            counter = self._counters.get((directory, name), 0)
+            while True:
+                counter += 1
+                candidate = f"{stem}_{counter}{suffix}"
+                if candidate not in names:
+                    break
+            self._counters[(directory, name)] = counter
+            names.add(candidate)
+            return candidate
+
+    def release(self, directory: str, name: str) -> None:
+        """Give back a reserved name whose move did not happen."""
+        with self._lock:
+            names = self._names.get(directory)
+            if names is not None:
+                names.discard(name)
+
+def place_no_clobber(source: str, dest: str) -> None:
+    """Rename ``source`` to ``dest`` on the same device, never overwriting.
+
+    Uses link + unlink so an existing ``dest`` raises FileExistsError
+    atomically; file systems without hard links fall back to a checked rename.
+    A symlink is moved as the link itself, never the file it points to.
+    """
+    try:
+        os.link(source, dest, follow_symlinks=False)
+    except FileExistsError:
+        raise
+    except OSError:
+        # No hard-link support (FAT, some network shares)
+        if os.path.lexists(dest):
+            raise FileExistsError(errno.EEXIST, "File exists", dest)
+        os.rename(source, dest)
+        return
+    os.unlink(source)
+
+class TokenBucket:
+    """Rate limiter shared by worker threads.
+
+    ``consume(n)`` takes ``n`` tokens and sleeps the calling thread for as
+    long as the bucket is in debt, so callers together stay at ``rate``
+    tokens per second with bursts of at most ``burst`` tokens.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, count: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= count
+            delay = -self._tokens / self.rate
+        if delay > 0:
+            time.sleep(delay)
+
+# Transfer methods in the order transfer_file tries them. Methods that fail
+# with one of TRANSFER_FALLBACK_ERRNOS are not tried again between the same
+# pair of devices.
+TRANSFER_METHODS = ('reflink', 'copy_file_range', 'sendfile', 'buffered')
+TRANSFER_FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTTY,
+    errno.EBADF, errno.EPERM, errno.ENOTSUP
+}
+KERNEL_COPY_CHUNK = 64 * 1024 * 1024
+TRANSFER_BUFFER_SIZE = 1024 * 1024
+FICLONE = 0x40049409  # Linux ioctl: share all extents of a file (reflink)
+_ZEROS = bytes(TRANSFER_BUFFER_SIZE)
+_unsupported_methods: Dict[tuple, set] = {}
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    """Clone the source's extents into the destination on CoW filesystems."""
+    try:
+        import fcntl
+    except ImportError:  # Not a Unix
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError as e:
+        if e.errno not in TRANSFER_FALLBACK_ERRNOS:
+            raise
+        return False
+
+def _data_segments(fd: int, size: int):
+    """Yield ``(start, end)`` of the data in a file, skipping holes the filesystem reports."""
+    if not hasattr(os, 'SEEK_DATA'):
+        yield 0, size
+        return
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:  # Only a hole is left
+                return
+            yield offset, size  # SEEK_DATA unsupported here
+            return
+        end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+        yield start, end
+        offset = end
+
+def _hash_zeros(hasher, count: int) -> None:
+    """Feed ``count`` zero bytes, the content of a hole, to the hasher."""
+    zeros = memoryview(_ZEROS)
+    while count > 0:
+        chunk = min(count, len(zeros))
+        hasher.update(zeros[:chunk])
+        count -= chunk
+
+def _copy_range(method: str, src, dst, view: memoryview, offset: int, count: int) -> int:
+    """Copy up to ``count`` bytes at ``offset`` with one call; returns the bytes written.
+
+    ``view`` holds the same bytes already read from the source when the
+    data also has to pass through userspace (buffered copy or hashing).
+    """
+    if method == 'copy_file_range':
+        return os.copy_file_range(src.fileno(), dst.fileno(), count, offset, offset)
+    dst.seek(offset)
+    if method == 'sendfile':
+        return os.sendfile(dst.fileno(), src.fileno(), offset, count)
+    return dst.write(view[:count])
+
+def transfer_file(source: Path, dest: Path, exclusive: bool = False, hasher=None,
+                  methods: Iterable[str] = TRANSFER_METHODS,
+                  throttle: Optional[TokenBucket] = None,
+                  on_create: Optional[Callable[[os.stat_result], None]] = None) -> str:
+    """Copy a file's data and metadata with the cheapest method the filesystems allow.
+
+    Tries a reflink first (no data is copied at all), then copy_file_range
+    and sendfile, which copy inside the kernel, and only then a buffered
+    copy. Holes in sparse files are skipped and stay holes. With a
+    ``hasher`` the content is hashed on the way, reading the source once
+    (a buffered copy already has the bytes in hand). A partial destination
+    is removed on failure; with ``exclusive`` the destination is created
+    with O_EXCL. ``methods`` restricts the methods tried; a buffered copy
+    is always the last resort. With a ``throttle`` every copied chunk is
+    paid for in bytes before the next one starts. ``on_create`` is called
+    with the destination's stat once it exists and before any data is
+    written, so a caller can journal the file as its own. Returns the method
+    used; the bytes copied and the method are counted in ``metrics``.
+    """
+    buffer = bytearray(TRANSFER_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(source, 'rb', buffering=0) as src:
+        dst = open(dest, 'xb' if exclusive else 'wb', buffering=0)
+        try:
+            with dst:
+                dst_stat = os.fstat(dst.fileno())
+                if on_create is not None:
+                    on_create(dst_stat)
+                size = os.fstat(src.fileno()).st_size
+                devices = (os.fstat(src.fileno()).st_dev, dst_stat.st_dev)
+                unsupported = _unsupported_methods.setdefault(devices, set())
+                methods = [method for method in TRANSFER_METHODS
+                           if method in methods and method not in unsupported
+                           and (method in ('reflink', 'buffered') or hasattr(os, method))]
+                if methods[-1:] != ['buffered']:
+                    methods.append('buffered')
+                if methods[0] == 'reflink':
+                    if _reflink(src.fileno(), dst.fileno()):
+                        copying = False
+                    else:
+                        unsupported.add(methods.pop(0))
+                        copying = True
+                else:
+                    copying = True
+                method = methods[0]
+                
+                position = copied = 0
+                for start, end in _data_segments(src.fileno(), size):
+                    if hasher is not None:
+                        _hash_zeros(hasher, start - position)
+                    offset = start
+                    while offset < end:
+                        in_userspace = hasher is not None or method == 'buffered'
+                        small_chunks = in_userspace or throttle is not None
+                        count = min(end - offset, TRANSFER_BUFFER_SIZE if small_chunks else KERNEL_COPY_CHUNK)
+                        if in_userspace:
+                            src.seek(offset)
+                            count = src.readinto(view[:count])
+                            if not count:
+                                raise ValueError("File verification failed: source shrank during copy")
+                        if copying:
+                            try:
+                                count = _copy_range(method, src, dst, view, offset, count)
+                            except OSError as e:
+                                if method == 'buffered' or e.errno not in TRANSFER_FALLBACK_ERRNOS:
+                                    raise
+                                count = 0
+                            if not count:
+                                # Not supported between these files; retry the range with the next method
+                                if method == 'buffered':
+                                    raise ValueError("File verification failed: short write")
+                                unsupported.add(methods.pop(0))
+                                method = methods[0]
+                                continue
+                        if hasher is not None:
+                            hasher.update(view[:count])
+                        if throttle is not None and copying:
+                            throttle.consume(count)
+                        offset += count
+                        copied += count
+                    position = end
+                if hasher is not None:
+                    _hash_zeros(hasher, size - position)
+                if copying:
+                    os.ftruncate(dst.fileno(), size)  # Restores a trailing hole
+                
+                if os.fstat(dst.fileno()).st_size != size:
+                    raise ValueError("File verification failed: size mismatch after copy")
+                os.fsync(dst.fileno())
+            shutil.copystat(source, dest)
+        except BaseException:
+            dest.unlink(missing_ok=True)
+            raise
+    method = method if copying else 'reflink'
+    metrics.count(f'transfers_{method}')
+    metrics.count('bytes_transferred', size)
+    metrics.count('bytes_copied', copied if copying else 0)
+    if hasher is not None:
+        metrics.count('bytes_hashed', size)
+    return method
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# ai.py and organizer_core.py live at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,150 @@
+"""LLMClient against a local OpenAI-compatible stub server."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("openai")
+
+from ai import LLMClient, LLMResponseCache
+
+
+class StubServer(ThreadingHTTPServer):
+    """Streams chat completions; ``failures`` maps a prompt to the number of
+    500s to send before answering it, ``bad_json`` to the number of
+    unparseable replies."""
+
+    daemon_threads = True
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.delay = delay
+        self.failures = {}
+        self.bad_json = {}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = body["messages"][-1]["content"]
+        with server.lock:
+            server.requests.append(prompt)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.failures.get(prompt, 0) > 0
+            if fail:
+                server.failures[prompt] -= 1
+            bad = not fail and server.bad_json.get(prompt, 0) > 0
+            if bad:
+                server.bad_json[prompt] -= 1
+        try:
+            time.sleep(server.delay)
+            if fail:
+                self._send(500, "application/json", json.dumps({"error": {"message": "boom"}}).encode())
+                return
+            content = "not json" if bad else json.dumps({"prompt": prompt})
+            chunks = [content[:4], content[4:]]
+            events = "".join(
+                "data: " + json.dumps({
+                    "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}]
+                }) + "\n\n"
+                for part in chunks
+            ) + "data: [DONE]\n\n"
+            self._send(200, "text/event-stream", events.encode())
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _send(self, status: int, content_type: str, payload: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(stub, **kwargs) -> LLMClient:
+    kwargs.setdefault("backoff", 0.01)
+    return LLMClient("test-key", base_url=stub.base_url, **kwargs)
+
+
+def test_requests_are_limited_to_max_concurrency(stub):
+    stub.delay = 0.2
+    client = make_client(stub, max_concurrency=2)
+    try:
+        prompts = [f"prompt {i}" for i in range(6)]
+        results = client.run(client.complete_many(prompts))
+    finally:
+        client.close()
+    assert results == [{"prompt": prompt} for prompt in prompts]
+    assert stub.max_in_flight == 2
+    assert client.requests_sent == 6
+
+
+def test_server_errors_and_bad_json_are_retried(stub):
+    stub.failures["flaky"] = 2
+    stub.bad_json["garbled"] = 1
+    client = make_client(stub)
+    try:
+        assert client.run(client.complete_json("flaky")) == {"prompt": "flaky"}
+        assert client.run(client.complete_json("garbled")) == {"prompt": "garbled"}
+    finally:
+        client.close()
+    assert stub.requests == ["flaky"] * 3 + ["garbled"] * 2
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.failures["down"] = 10
+    client = make_client(stub, max_retries=2)
+    try:
+        assert client.run(client.complete_json("down")) is None
+    finally:
+        client.close()
+    assert stub.requests == ["down"] * 3
+
+
+def test_cached_responses_skip_the_server(stub, tmp_path):
+    cache_path = str(tmp_path / "llm_cache.db")
+    client = make_client(stub, cache=LLMResponseCache(cache_path))
+    try:
+        first = client.run(client.complete_json("cached"))
+        second = client.run(client.complete_json("cached"))
+        assert client.cache.hits == 1
+    finally:
+        client.close()
+    assert first == second == {"prompt": "cached"}
+    assert stub.requests == ["cached"]
+
+    # The cache persists across clients
+    client = make_client(stub, cache=LLMResponseCache(cache_path))
+    try:
+        assert client.run(client.complete_json("cached")) == {"prompt": "cached"}
+    finally:
+        client.close()
+    assert stub.requests == ["cached"]
@@ -0,0 +1,149 @@
+"""transfer_file's fallback chain: each method is forced by making the
+ones before it fail, and the copy must still be byte-identical."""
+import errno
+import hashlib
+import os
+
+import pytest
+
+import organizer_core
+from organizer_core import transfer_file
+
+CHUNK = 256 * 1024
+
+
+def fail_with(code):
+    def fail(*args, **kwargs):
+        raise OSError(code, os.strerror(code))
+    return fail
+
+
+@pytest.fixture(autouse=True)
+def fresh_support_cache(monkeypatch):
+    # Support is remembered per device pair; every test starts unprobed
+    monkeypatch.setattr(organizer_core, "_unsupported_methods", {})
+    # Several chunks per file, so a fallback can also happen mid-file
+    monkeypatch.setattr(organizer_core, "KERNEL_COPY_CHUNK", CHUNK)
+    monkeypatch.setattr(organizer_core, "TRANSFER_BUFFER_SIZE", CHUNK)
+
+
+@pytest.fixture
+def no_reflink(monkeypatch):
+    fcntl = pytest.importorskip("fcntl")
+    monkeypatch.setattr(fcntl, "ioctl", fail_with(errno.EOPNOTSUPP))
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.bin"
+    path.write_bytes(os.urandom(CHUNK * 3 + 12345))
+    return path
+
+
+def force(monkeypatch, method):
+    """Make every kernel copy method before ``method`` unsupported."""
+    for earlier in ("copy_file_range", "sendfile"):
+        if earlier == method:
+            break
+        if hasattr(os, earlier):
+            monkeypatch.setattr(os, earlier, fail_with(errno.ENOSYS))
+
+
+@pytest.mark.parametrize("method", ["copy_file_range", "sendfile", "buffered"])
+@pytest.mark.parametrize("hashed", [False, True])
+def test_each_method_copies_the_bytes(monkeypatch, no_reflink, source, tmp_path, method, hashed):
+    if method != "buffered" and not hasattr(os, method):
+        pytest.skip(f"os.{method} is not available")
+    force(monkeypatch, method)
+    dest = tmp_path / "dest.bin"
+    hasher = hashlib.sha256() if hashed else None
+
+    assert transfer_file(source, dest, exclusive=True, hasher=hasher) == method
+    assert dest.read_bytes() == source.read_bytes()
+    if hashed:
+        assert hasher.hexdigest() == hashlib.sha256(source.read_bytes()).hexdigest()
+
+
+def test_zero_count_falls_back(monkeypatch, no_reflink, source, tmp_path):
+    if not hasattr(os, "copy_file_range"):
+        pytest.skip("os.copy_file_range is not available")
+    monkeypatch.setattr(os, "copy_file_range", lambda *args: 0)
+    dest = tmp_path / "dest.bin"
+
+    assert transfer_file(source, dest) in ("sendfile", "buffered")
+    assert dest.read_bytes() == source.read_bytes()
+
+
+def test_fallback_mid_file_resumes_at_the_failed_range(monkeypatch, no_reflink, source, tmp_path):
+    if not hasattr(os, "copy_file_range"):
+        pytest.skip("os.copy_file_range is not available")
+    real = os.copy_file_range
+    calls = []
+
+    def first_chunk_only(*args):
+        calls.append(args)
+        if len(calls) > 1:
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+        return real(*args)
+
+    monkeypatch.setattr(os, "copy_file_range", first_chunk_only)
+    if hasattr(os, "sendfile"):
+        monkeypatch.setattr(os, "sendfile", fail_with(errno.ENOSYS))
+    dest = tmp_path / "dest.bin"
+
+    assert transfer_file(source, dest) == "buffered"
+    assert dest.read_bytes() == source.read_bytes()
+    assert len(calls) == 2
+
+
+def test_unsupported_methods_are_remembered(monkeypatch, no_reflink, source, tmp_path):
+    if not hasattr(os, "copy_file_range"):
+        pytest.skip("os.copy_file_range is not available")
+    calls = []
+
+    def unsupported(*args):
+        calls.append(args)
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(os, "copy_file_range", unsupported)
+    for name in ("first.bin", "second.bin"):
+        transfer_file(source, tmp_path / name)
+        assert (tmp_path / name).read_bytes() == source.read_bytes()
+    assert len(calls) == 1
+
+
+def test_sparse_file_keeps_its_holes(monkeypatch, no_reflink, tmp_path):
+    source = tmp_path / "sparse.bin"
+    data = os.urandom(CHUNK)
+    with open(source, "wb") as f:
+        f.write(data)
+        f.seek(CHUNK * 8)
+        f.write(data)
+    force(monkeypatch, "buffered")
+    dest = tmp_path / "dest.bin"
+    hasher = hashlib.sha256()
+
+    transfer_file(source, dest, hasher=hasher)
+    assert dest.read_bytes() == source.read_bytes()
+    assert dest.stat().st_blocks <= source.stat().st_blocks
+    assert hasher.hexdigest() == hashlib.sha256(source.read_bytes()).hexdigest()
+
+
+def test_hard_error_removes_the_partial_destination(monkeypatch, no_reflink, source, tmp_path):
+    if not hasattr(os, "copy_file_range"):
+        pytest.skip("os.copy_file_range is not available")
+    monkeypatch.setattr(os, "copy_file_range", fail_with(errno.EIO))
+    dest = tmp_path / "dest.bin"
+
+    with pytest.raises(OSError):
+        transfer_file(source, dest)
+    assert not dest.exists()
+
+
+def test_exclusive_never_overwrites(no_reflink, source, tmp_path):
+    dest = tmp_path / "dest.bin"
+    dest.write_bytes(b"existing")
+
+    with pytest.raises(FileExistsError):
+        transfer_file(source, dest, exclusive=True)
+    assert dest.read_bytes() == b"existing"